@@ -1,7 +1,8 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, make_response
+from flask import Flask, Response, jsonify, render_template, stream_template, stream_with_context, redirect, url_for, flash, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_bcrypt import Bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
 from models.user_model import db, User
 import config
 from models.staff_model import Staff
@@ -16,26 +17,42 @@ from models.investment_model import Investment
 from models.withdrawal_model import Withdrawal
 from models.expense_model import Expense
 from models.message_model import Message
+from models.report_job_model import ReportJob
+from models.money import to_money, percent
+from services.report_service import day_scoped, member_collections, monthly_report_context, profit_loss_context, profit_loss_range
+from services import ledger_service, query_service, export_service, cash_service, collection_service, dashboard_service, statement_service, report_job_service, schedule_service, loan_service, search_service, reconcile_service, engine_service, metrics_service, seed_service, identity_service, auth_service, sync_service
+from services.pagination import paginate_request
+from services.migration_service import run_migrations
 from datetime import datetime, timedelta
+import click
 import csv
-import io
+import hmac
+import itertools
 
 
 app = Flask(__name__)
 app.config.from_object(config)
+if config.PROXY_COUNT:
+    # Client IPs for login throttling come from the proxies' X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.PROXY_COUNT, x_proto=config.PROXY_COUNT)
 
 db.init_app(app)
+metrics_service.init_app(app)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+# Process-local caches shown on /admin/cache_stats and /admin/metrics
+CACHES = {'dashboard': dashboard_service.stats_cache, 'statement': statement_service.statement_cache,
+          'identity': identity_service.identity_cache}
+
 @app.context_processor
 def inject_now():
     return {'now': datetime.now()}
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_service.load(user_id)
 
 # ----------- Routes -----------
 
@@ -49,9 +66,16 @@ def login():
         email = request.form['email']
         password = request.form['password']
 
-        user = User.query.filter_by(email=email).first()
-        if user and bcrypt.check_password_hash(user.password, password):
-            login_user(user)
+        try:
+            user = auth_service.check_login(email, password, request.remote_addr)
+        except auth_service.Throttled as error:
+            flash(f'Too many login attempts. Try again in {error.retry_after // 60 + 1} minute(s).', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(error.retry_after)}
+        except auth_service.Busy:
+            flash('Server is busy, please try again in a moment.', 'warning')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        if user:
+            login_user(identity_service.remember(user))
             flash('Login Successful!', 'success')
             return redirect(url_for('dashboard'))
         else:
@@ -63,32 +87,15 @@ def login():
 @login_required
 def dashboard():
     if current_user.role == 'admin':
-        staff_count = User.query.filter_by(role='staff').count()
-        total_loans = db.session.query(db.func.sum(Customer.total_loan)).scalar() or 0
-        pending_loans = db.session.query(db.func.sum(Customer.remaining_loan)).scalar() or 0
-        total_savings = db.session.query(db.func.sum(Customer.savings_balance)).scalar() or 0
-        total_customers = Customer.query.count()
-        
-        cash_balance_record = CashBalance.query.first()
-        cash_balance = cash_balance_record.balance if cash_balance_record else 0
+        stats = dashboard_service.get_admin_stats()
         
         period = request.args.get('period', 'all')
         fee_period = request.args.get('fee_period', 'all')
         
-        admission_fees = db.session.query(db.func.sum(Customer.admission_fee)).scalar() or 0
-        service_charges = db.session.query(db.func.sum(Loan.service_charge)).scalar() or 0
-        total_fees = admission_fees + service_charges
-        
-        return render_template('admin_dashboard.html', name=current_user.name, staff_count=staff_count, total_loans=total_loans, pending_loans=pending_loans, total_savings=total_savings, total_customers=total_customers, cash_balance=cash_balance, period=period, fee_period=fee_period, total_fees=total_fees)
+        return render_template('admin_dashboard.html', name=current_user.name, staff_count=stats['staff_count'], total_loans=stats['total_loans'], pending_loans=stats['pending_loans'], total_savings=stats['total_savings'], total_customers=stats['total_customers'], cash_balance=stats['cash_balance'], period=period, fee_period=fee_period, total_fees=stats['total_fees'])
     elif current_user.role == 'staff':
-        my_customers = Customer.query.filter_by(staff_id=current_user.id).count()
-        total_remaining = db.session.query(db.func.sum(Customer.remaining_loan)).filter_by(staff_id=current_user.id).scalar() or 0
-        today = datetime.now().replace(hour=0, minute=0, second=0)
-        today_loan_collections = LoanCollection.query.filter_by(staff_id=current_user.id).filter(LoanCollection.collection_date >= today).count()
-        today_saving_collections = SavingCollection.query.filter_by(staff_id=current_user.id).filter(SavingCollection.collection_date >= today).count()
-        today_collections = today_loan_collections + today_saving_collections
-        unread_messages = Message.query.filter_by(staff_id=current_user.id, is_read=False).count()
-        return render_template('staff_dashboard.html', name=current_user.name, my_customers=my_customers, total_remaining=total_remaining, today_collections=today_collections, unread_messages=unread_messages)
+        stats = dashboard_service.get_staff_stats(current_user.id)
+        return render_template('staff_dashboard.html', name=current_user.name, my_customers=stats['my_customers'], total_remaining=stats['total_remaining'], today_collections=stats['today_collections'], unread_messages=stats['unread_messages'])
     else:
         flash('Invalid role!', 'danger')
         return redirect(url_for('logout'))
@@ -119,7 +126,11 @@ def add_staff():
             flash('Email already exists!', 'danger')
             return redirect(url_for('add_staff'))
         
-        hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+        try:
+            hashed_pw = auth_service.hash_password(password)
+        except auth_service.Busy:
+            flash('Server is busy, please try again in a moment.', 'warning')
+            return redirect(url_for('add_staff'))
         new_staff = User(name=name, email=email, password=hashed_pw, role='staff')
         db.session.add(new_staff)
         db.session.commit()
@@ -141,13 +152,18 @@ def edit_staff(id):
         return redirect(url_for('manage_staff'))
     
     if request.method == 'POST':
+        if request.form.get('password'):
+            # Hashed before any change, so a busy server leaves the staff untouched
+            try:
+                staff.password = auth_service.hash_password(request.form['password'])
+            except auth_service.Busy:
+                flash('Server is busy, please try again in a moment.', 'warning')
+                return redirect(url_for('edit_staff', id=id))
         staff.name = request.form['name']
         staff.email = request.form['email']
         
-        if request.form.get('password'):
-            staff.password = bcrypt.generate_password_hash(request.form['password']).decode('utf-8')
-        
         db.session.commit()
+        identity_service.forget(staff.id)
         flash('Staff updated successfully!', 'success')
         return redirect(url_for('manage_staff'))
     
@@ -167,6 +183,7 @@ def delete_staff(id):
     
     db.session.delete(staff)
     db.session.commit()
+    identity_service.forget(id)
     flash('Staff deleted successfully!', 'success')
     return redirect(url_for('manage_staff'))
 
@@ -179,15 +196,15 @@ def manage_loans():
     staff_filter = request.args.get('staff_id', type=int)
     customer_filter = request.args.get('customer', '')
     
-    query = Loan.query
+    query = query_service.loan_query()
     if staff_filter:
         query = query.filter_by(staff_id=staff_filter)
     if customer_filter:
-        query = query.filter(Loan.customer_name.contains(customer_filter))
+        query = query.filter(Loan.customer_id.in_(search_service.matching_ids(customer_filter)))
     
-    loans = query.all()
+    page = paginate_request(query, Loan.loan_date, Loan.id)
     staffs = User.query.filter_by(role='staff').all()
-    return render_template('manage_loans.html', loans=loans, staffs=staffs)
+    return render_template('manage_loans.html', loans=page.items, page=page, staffs=staffs)
 
 @app.route('/loan_collections_history')
 @login_required
@@ -196,20 +213,20 @@ def loan_collections_history():
     customer_filter = request.args.get('customer', '')
     
     if current_user.role == 'staff':
-        query = LoanCollection.query.filter_by(staff_id=current_user.id)
+        query = query_service.loan_collection_query().filter_by(staff_id=current_user.id)
         total = db.session.query(db.func.sum(LoanCollection.amount)).filter_by(staff_id=current_user.id).scalar() or 0
     else:
-        query = LoanCollection.query
+        query = query_service.loan_collection_query()
         if staff_filter:
             query = query.filter_by(staff_id=staff_filter)
         total = db.session.query(db.func.sum(LoanCollection.amount)).scalar() or 0
     
     if customer_filter:
-        query = query.join(Customer).filter(Customer.name.contains(customer_filter))
+        query = query.filter(LoanCollection.customer_id.in_(search_service.matching_ids(customer_filter)))
     
-    loan_collections = query.order_by(LoanCollection.collection_date.desc()).all()
+    page = paginate_request(query, LoanCollection.collection_date, LoanCollection.id)
     staffs = User.query.filter_by(role='staff').all()
-    return render_template('loan_collections_history.html', loan_collections=loan_collections, staffs=staffs, total=total)
+    return render_template('loan_collections_history.html', loan_collections=page.items, page=page, staffs=staffs, total=total)
 
 @app.route('/loan/add', methods=['GET', 'POST'])
 @login_required
@@ -220,65 +237,69 @@ def add_loan():
     
     if request.method == 'POST':
         customer_id = int(request.form['customer_id'])
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         interest_rate = float(request.form['interest'])
         customer = Customer.query.get_or_404(customer_id)
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
-        
-        if cash_balance_record.balance < amount:
-            flash(f'পর্যাপ্ত টাকা নেই! বর্তমান ব্যালেন্স: ৳{cash_balance_record.balance}', 'danger')
+        cash_balance = cash_service.current_balance()
+        if cash_balance < amount:
+            flash(f'পর্যাপ্ত টাকা নেই! বর্তমান ব্যালেন্স: ৳{cash_balance}', 'danger')
             return redirect(url_for('add_loan'))
         
-        interest_amount = (amount * interest_rate) / 100
-        service_charge = float(request.form.get('service_charge', 0))
-        welfare_fee = float(request.form.get('welfare_fee', 0))
+        interest_amount = percent(amount, interest_rate)
+        service_charge = to_money(request.form.get('service_charge'))
+        welfare_fee = to_money(request.form.get('welfare_fee'))
         total_with_interest = amount + interest_amount + service_charge
         
         loan_date_str = request.form.get('loan_date')
         loan_date = datetime.strptime(loan_date_str, '%Y-%m-%d') if loan_date_str else datetime.now()
         
         loan = Loan(
+            customer_id=customer.id,
             customer_name=customer.name,
             amount=amount,
             interest=interest_rate,
             loan_date=loan_date,
             due_date=datetime.strptime(request.form['due_date'], '%Y-%m-%d'),
             installment_count=int(request.form.get('installment_count', 0)),
-            installment_amount=float(request.form.get('installment_amount', 0)),
+            installment_amount=to_money(request.form.get('installment_amount')),
             service_charge=service_charge,
+            welfare_fee=welfare_fee,
             installment_type=request.form.get('installment_type', ''),
-            staff_id=customer.staff_id
+            staff_id=customer.staff_id,
+            outstanding=total_with_interest
         )
         
         customer.total_loan += total_with_interest
         customer.remaining_loan += total_with_interest
-        cash_balance_record.balance -= amount
-        cash_balance_record.balance += service_charge + welfare_fee
+        cash_service.record(-amount, 'loan_disbursement', staff_id=customer.staff_id, note=customer.name)
+        cash_service.record(service_charge + welfare_fee, 'loan_fees', staff_id=customer.staff_id, note=customer.name)
+        ledger_service.record(customer.staff_id, when=loan_date, loan_given=amount, interest=interest_amount, service_charge=service_charge)
         
         db.session.add(loan)
+        schedule_service.generate(loan, customer, total_with_interest)
         db.session.commit()
         flash(f'ঋণ যোগ সফল! পরিমাণ: ৳{amount}, সুদ: ৳{interest_amount}, আবেদন ফি: ৳{service_charge}, মোট: ৳{total_with_interest}', 'success')
         return redirect(url_for('manage_loans'))
     
-    cash_balance_record = CashBalance.query.first()
-    cash_balance = cash_balance_record.balance if cash_balance_record else 0
-    customers = Customer.query.all()
-    return render_template('add_loan.html', customers=customers, cash_balance=cash_balance)
+    cash_balance = cash_service.current_balance()
+    return render_template('add_loan.html', cash_balance=cash_balance)
 
 @app.route('/loan/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_loan(id):
+    if current_user.role != 'admin':
+        flash('Access denied!', 'danger')
+        return redirect(url_for('dashboard'))
+    
     loan = Loan.query.get_or_404(id)
     
     if request.method == 'POST':
         loan.customer_name = request.form['customer_name']
-        loan.amount = float(request.form['amount'])
-        loan.interest = float(request.form['interest'])
+        loan_service.update_terms(loan, to_money(request.form['amount']), float(request.form['interest']))
         loan.due_date = datetime.strptime(request.form['due_date'], '%Y-%m-%d')
+        if request.form['status'] == 'Paid' and loan.status != 'Paid':
+            loan_service.settle(loan)
         loan.status = request.form['status']
         db.session.commit()
         flash('Loan updated successfully!', 'success')
@@ -290,7 +311,7 @@ def edit_loan(id):
 @login_required
 def mark_paid(id):
     loan = Loan.query.get_or_404(id)
-    loan.status = 'Paid'
+    loan_service.settle(loan)
     db.session.commit()
     flash('Loan marked as paid!', 'success')
     return redirect(url_for('manage_loans'))
@@ -301,23 +322,23 @@ def manage_savings():
     staff_filter = request.args.get('staff_id', type=int)
     customer_filter = request.args.get('customer', '')
     
-    query = SavingCollection.query
+    query = query_service.saving_collection_query()
     if staff_filter:
         query = query.filter_by(staff_id=staff_filter)
     if customer_filter:
-        query = query.join(Customer).filter(Customer.name.contains(customer_filter))
+        query = query.filter(SavingCollection.customer_id.in_(search_service.matching_ids(customer_filter)))
     
-    savings = query.all()
+    page = paginate_request(query, SavingCollection.collection_date, SavingCollection.id)
     staffs = User.query.filter_by(role='staff').all()
     total = db.session.query(db.func.sum(SavingCollection.amount)).scalar() or 0
-    return render_template('manage_savings.html', savings=savings, staffs=staffs, total=total)
+    return render_template('manage_savings.html', savings=page.items, page=page, staffs=staffs, total=total)
 
 @app.route('/saving/add', methods=['GET', 'POST'])
 @login_required
 def add_saving():
     if request.method == 'POST':
         customer_id = int(request.form['customer_id'])
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         customer = Customer.query.get_or_404(customer_id)
         
         saving = Saving(
@@ -333,11 +354,7 @@ def add_saving():
         flash('Saving added successfully!', 'success')
         return redirect(url_for('manage_savings'))
     
-    if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).all()
-    else:
-        customers = Customer.query.all()
-    return render_template('add_saving.html', customers=customers)
+    return render_template('add_saving.html')
 
 @app.route('/reports')
 @login_required
@@ -353,8 +370,8 @@ def reports():
     else:  # monthly
         start_date = today - timedelta(days=30)
     
-    loan_collection_query = LoanCollection.query.filter(LoanCollection.collection_date >= start_date)
-    saving_collection_query = SavingCollection.query.filter(SavingCollection.collection_date >= start_date)
+    loan_collection_query = query_service.loan_collection_query().filter(LoanCollection.collection_date >= start_date)
+    saving_collection_query = query_service.saving_collection_query().filter(SavingCollection.collection_date >= start_date)
     
     if staff_id:
         loan_collection_query = loan_collection_query.filter_by(staff_id=staff_id)
@@ -388,55 +405,161 @@ def export_csv():
     else:
         start_date = today - timedelta(days=30)
     
-    loan_collection_query = LoanCollection.query.filter(LoanCollection.collection_date >= start_date)
-    saving_collection_query = SavingCollection.query.filter(SavingCollection.collection_date >= start_date)
-    
-    if staff_id:
-        loan_collection_query = loan_collection_query.filter_by(staff_id=staff_id)
-        saving_collection_query = saving_collection_query.filter_by(staff_id=staff_id)
+    loan_dataset = export_service.DATASETS['loan_collections']
+    saving_dataset = export_service.DATASETS['saving_collections']
+    rows = itertools.chain(
+        [['LOAN COLLECTIONS REPORT'], loan_dataset.header], loan_dataset.rows(start_date, staff_id=staff_id),
+        [[], ['SAVINGS COLLECTIONS REPORT'], saving_dataset.header], saving_dataset.rows(start_date, staff_id=staff_id))
     
-    loan_collections = loan_collection_query.all()
-    saving_collections = saving_collection_query.all()
+    response = Response(stream_with_context(export_service.csv_stream(rows)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename=report_{period}.csv'
+    return response
+
+@app.route('/export')
+@login_required
+def export_data():
+    dataset = request.args.get('dataset', '')
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export_service.EXPORT_MIMETYPES:
+        flash('Unsupported export format!', 'danger')
+        return redirect(url_for('reports'))
+    
+    if dataset == 'monthly_report':
+        if current_user.role != 'admin':
+            flash('Access denied!', 'danger')
+            return redirect(url_for('dashboard'))
+        today = datetime.now()
+        year = request.args.get('year', today.year, type=int)
+        month = request.args.get('month', today.month, type=int)
+        title = f'Monthly Report {year}-{month:02d}'
+        header, rows = export_service.MONTHLY_REPORT_HEADER, export_service.monthly_report_rows(year, month)
+    elif dataset in export_service.DATASETS:
+        export = export_service.DATASETS[dataset]
+        if export.admin_only and current_user.role != 'admin':
+            flash('Access denied!', 'danger')
+            return redirect(url_for('dashboard'))
+        from_date = request.args.get('from')
+        to_date = request.args.get('to')
+        try:
+            start = datetime.strptime(from_date, '%Y-%m-%d') if from_date else None
+            end = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1) if to_date else None
+        except ValueError:
+            flash('Invalid date range!', 'danger')
+            return redirect(url_for('reports'))
+        staff_id = current_user.id if current_user.role == 'staff' else request.args.get('staff_id', type=int)
+        title = export.title
+        header, rows = export.header, export.rows(start, end, staff_id)
+    else:
+        flash('Unknown export!', 'danger')
+        return redirect(url_for('reports'))
     
-    output = io.StringIO()
-    writer = csv.writer(output)
+    chunks = export_service.stream_rows(fmt, title, header, rows)
+    response = Response(stream_with_context(chunks), mimetype=export_service.EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={dataset}.{fmt}'
+    return response
+
+@app.route('/reports/jobs', methods=['GET', 'POST'])
+@login_required
+def report_jobs():
+    if request.method == 'POST':
+        report = request.form.get('dataset', '')
+        fmt = request.form.get('format', 'csv')
+        if not report_job_service.is_known(report) or fmt not in report_job_service.report_formats(report):
+            flash('Unsupported report!', 'danger')
+            return redirect(url_for('reports'))
+        if report_job_service.is_admin_only(report) and current_user.role != 'admin':
+            flash('Access denied!', 'danger')
+            return redirect(url_for('dashboard'))
+        
+        today = datetime.now()
+        if report == 'monthly_report':
+            params = {'year': request.form.get('year', today.year, type=int), 'month': request.form.get('month', today.month, type=int)}
+        elif report == 'profit_loss':
+            # The key names the dates covered, so a new month never hits last month's result
+            try:
+                from_date = datetime.strptime(request.form['from'], '%Y-%m-%d').date() if request.form.get('from') else None
+                to_date = datetime.strptime(request.form['to'], '%Y-%m-%d').date() if request.form.get('to') else None
+            except ValueError:
+                flash('Invalid date range!', 'danger')
+                return redirect(url_for('reports'))
+            if from_date and to_date and to_date < from_date:
+                from_date, to_date = to_date, from_date
+            period = 'custom' if from_date or to_date else request.form.get('period', 'monthly')
+            start, end, _, _ = profit_loss_range(period, from_date, to_date)
+            params = {'period': period, 'from': start.strftime('%Y-%m-%d'), 'to': (end - timedelta(days=1)).strftime('%Y-%m-%d')}
+        elif report == 'reconciliation':
+            params = {}
+        else:
+            staff_id = current_user.id if current_user.role == 'staff' else request.form.get('staff_id', type=int)
+            params = {'from': request.form.get('from'), 'to': request.form.get('to'), 'staff_id': staff_id}
+            try:
+                for value in (params['from'], params['to']):
+                    if value:
+                        datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                flash('Invalid date range!', 'danger')
+                return redirect(url_for('reports'))
+        
+        job = report_job_service.enqueue(report, fmt, params, current_user)
+        if job.status == 'done':
+            flash('Report is ready (served from cache).', 'success')
+        else:
+            flash('Report queued. It will be ready for download shortly.', 'info')
+        return redirect(url_for('report_jobs'))
     
-    writer.writerow(['LOAN COLLECTIONS REPORT'])
-    writer.writerow(['Customer', 'Amount', 'Date', 'Staff'])
-    for lc in loan_collections:
-        writer.writerow([lc.customer.name, lc.amount, 
-                        lc.collection_date.strftime('%Y-%m-%d %H:%M'), 
-                        lc.staff.name if lc.staff else 'N/A'])
-    
-    writer.writerow([])
-    writer.writerow(['SAVINGS COLLECTIONS REPORT'])
-    writer.writerow(['Customer', 'Amount', 'Date', 'Staff'])
-    for sc in saving_collections:
-        writer.writerow([sc.customer.name, sc.amount, 
-                        sc.collection_date.strftime('%Y-%m-%d %H:%M'), 
-                        sc.staff.name if sc.staff else 'N/A'])
-    
-    response = make_response(output.getvalue())
-    response.headers['Content-Disposition'] = f'attachment; filename=report_{period}.csv'
-    response.headers['Content-Type'] = 'text/csv'
+    query = ReportJob.query if current_user.role == 'admin' else ReportJob.query.filter_by(requested_by=current_user.id)
+    jobs = query.order_by(ReportJob.id.desc()).limit(50).all()
+    pending = any(job.status in report_job_service.PENDING for job in jobs)
+    return render_template('report_jobs.html', jobs=jobs, pending=pending, report_title=report_job_service.report_title)
+
+@app.route('/reports/jobs/<int:id>')
+@login_required
+def report_job_status(id):
+    job = ReportJob.query.get_or_404(id)
+    if not report_job_service.can_access(job, current_user):
+        return jsonify({'error': 'Access denied'}), 403
+    return jsonify({
+        'id': job.id,
+        'report': job.report,
+        'format': job.format,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'download_url': url_for('download_report_job', id=job.id) if job.status == 'done' else None,
+    })
+
+@app.route('/reports/jobs/<int:id>/download')
+@login_required
+def download_report_job(id):
+    job = ReportJob.query.get_or_404(id)
+    if not report_job_service.can_access(job, current_user):
+        flash('Access denied!', 'danger')
+        return redirect(url_for('dashboard'))
+    if job.status != 'done':
+        flash('Report is not ready yet.', 'warning')
+        return redirect(url_for('report_jobs'))
+    response = Response(job.artifact, mimetype=report_job_service.mimetype(job))
+    if job.format != 'html':
+        response.headers['Content-Disposition'] = f'attachment; filename={report_job_service.filename(job)}'
     return response
 
 @app.route('/customers')
 @login_required
 def manage_customers():
     if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).all()
+        query = query_service.customer_query().filter_by(staff_id=current_user.id)
     else:
-        customers = Customer.query.all()
-    return render_template('manage_customers.html', customers=customers)
+        query = query_service.customer_query()
+    page = paginate_request(query, Customer.created_date, Customer.id)
+    return render_template('manage_customers.html', customers=page.items, page=page)
 
 @app.route('/loan_customers')
 @login_required
 def loan_customers():
     if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).filter(Customer.total_loan > 0).all()
+        customers = query_service.customer_query().filter_by(staff_id=current_user.id).filter(Customer.total_loan > 0).all()
     else:
-        customers = Customer.query.filter(Customer.total_loan > 0).all()
+        customers = query_service.customer_query().filter(Customer.total_loan > 0).all()
     return render_template('loan_customers.html', customers=customers)
 
 @app.route('/customer_details/<int:id>')
@@ -448,39 +571,28 @@ def customer_details(id):
         flash('Access denied!', 'danger')
         return redirect(url_for('dashboard'))
     
-    loan_collections = LoanCollection.query.filter_by(customer_id=id).order_by(LoanCollection.collection_date.desc()).all()
-    saving_collections = SavingCollection.query.filter_by(customer_id=id).order_by(SavingCollection.collection_date.desc()).all()
-    withdrawals = Withdrawal.query.filter_by(customer_id=id).order_by(Withdrawal.date.desc()).all() if hasattr(Withdrawal, 'customer_id') else []
-    
-    total_collected = sum(lc.amount for lc in loan_collections)
-    total_withdrawn = sum(w.amount for w in withdrawals)
+    statement = statement_service.get_statement(customer)
+    pages = statement_service.request_pages(statement)
     
-    return render_template('customer_details.html', customer=customer, loan_collections=loan_collections, saving_collections=saving_collections, total_collected=total_collected, withdrawals=withdrawals, total_withdrawn=total_withdrawn)
+    return render_template('customer_details.html', customer=customer, statement=statement, loan_page=pages['loan_collections'], saving_page=pages['saving_collections'], withdrawal_page=pages['withdrawals'])
 
 @app.route('/customer_details_print/<int:id>')
 @login_required
 def customer_details_print(id):
     customer = Customer.query.get_or_404(id)
-    loan_collections = LoanCollection.query.filter_by(customer_id=id).order_by(LoanCollection.collection_date.desc()).all()
-    saving_collections = SavingCollection.query.filter_by(customer_id=id).order_by(SavingCollection.collection_date.desc()).all()
-    withdrawals = Withdrawal.query.filter_by(customer_id=id).order_by(Withdrawal.date.desc()).all() if hasattr(Withdrawal, 'customer_id') else []
-    total_loan_collected = sum(lc.amount for lc in loan_collections)
-    total_saving_collected = sum(sc.amount for sc in saving_collections)
-    total_withdrawn = sum(w.amount for w in withdrawals)
-    return render_template('customer_details_print.html', customer=customer, loan_collections=loan_collections, saving_collections=saving_collections, withdrawals=withdrawals, total_loan_collected=total_loan_collected, total_saving_collected=total_saving_collected, total_withdrawn=total_withdrawn)
+    statement = statement_service.get_statement(customer)
+    loan_collections = statement_service.history('loan_collections', id)
+    saving_collections = statement_service.history('saving_collections', id)
+    withdrawals = statement_service.history('withdrawals', id)
+    return render_template('customer_details_print.html', customer=customer, loan_collections=loan_collections, saving_collections=saving_collections, withdrawals=withdrawals, total_loan_collected=statement.total_loan_collected, total_saving_collected=statement.total_saving_collected, total_withdrawn=statement.total_withdrawn)
 
 @app.route('/customer/add', methods=['GET', 'POST'])
 @login_required
 def add_customer():
     if request.method == 'POST':
-        admission_fee = float(request.form.get('admission_fee', 0))
+        admission_fee = to_money(request.form.get('admission_fee'))
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
-        
-        cash_balance_record.balance += admission_fee
+        cash_service.record(admission_fee, 'admission_fee', staff_id=current_user.id, note=request.form['name'])
         
         customer = Customer(
             name=request.form['name'],
@@ -498,6 +610,7 @@ def add_customer():
             address=request.form.get('address', ''),
             staff_id=current_user.id
         )
+        ledger_service.record(current_user.id, admission_fee=admission_fee)
         db.session.add(customer)
         db.session.commit()
         flash(f'সদস্য সফলভাবে যোগ হয়েছে! ভর্তি ফি: ৳{admission_fee}', 'success')
@@ -508,12 +621,14 @@ def add_customer():
 @login_required
 def manage_collections():
     if current_user.role == 'staff':
-        loan_collections = LoanCollection.query.filter_by(staff_id=current_user.id).all()
-        saving_collections = SavingCollection.query.filter_by(staff_id=current_user.id).all()
+        loan_query = query_service.loan_collection_query().filter_by(staff_id=current_user.id)
+        saving_query = query_service.saving_collection_query().filter_by(staff_id=current_user.id)
     else:
-        loan_collections = LoanCollection.query.all()
-        saving_collections = SavingCollection.query.all()
-    return render_template('manage_collections.html', loan_collections=loan_collections, saving_collections=saving_collections)
+        loan_query = query_service.loan_collection_query()
+        saving_query = query_service.saving_collection_query()
+    loan_page = paginate_request(loan_query, LoanCollection.collection_date, LoanCollection.id, cursor_arg='loan_cursor')
+    saving_page = paginate_request(saving_query, SavingCollection.collection_date, SavingCollection.id, cursor_arg='saving_cursor')
+    return render_template('manage_collections.html', loan_collections=loan_page.items, saving_collections=saving_page.items, loan_page=loan_page, saving_page=saving_page)
 
 @app.route('/collection/add', methods=['GET', 'POST'])
 @login_required
@@ -521,7 +636,7 @@ def add_collection():
     if request.method == 'POST':
         collection = Collection(
             loan_id=int(request.form['loan_id']),
-            amount=float(request.form['amount']),
+            amount=to_money(request.form['amount']),
             staff_id=current_user.id
         )
         db.session.add(collection)
@@ -541,7 +656,7 @@ def collection():
     if request.method == 'POST':
         collection_type = request.form['collection_type']
         customer_id = int(request.form['customer_id'])
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         customer = Customer.query.get_or_404(customer_id)
         
         if collection_type == 'loan':
@@ -559,6 +674,8 @@ def collection():
                 staff_id=current_user.id
             )
             customer.remaining_loan -= amount
+            ledger_service.record(current_user.id, loan_collected=amount)
+            loan_collection.loan_id = loan_service.apply_collection(customer_id, amount)
             db.session.add(loan_collection)
             flash(f'সফলভাবে ৳{amount} লোন কালেকশন সম্পন্ন হয়েছে! বাকি: ৳{customer.remaining_loan}', 'success')
         else:  # saving
@@ -568,48 +685,54 @@ def collection():
                 staff_id=current_user.id
             )
             customer.savings_balance += amount
+            ledger_service.record(current_user.id, saving_collected=amount)
             db.session.add(saving_collection)
             flash(f'সফলভাবে ৳{amount} সেভিংস জমা হয়েছে!', 'success')
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
-        cash_balance_record.balance += amount
+        cash_service.record(amount, 'loan_collection' if collection_type == 'loan' else 'saving_collection', staff_id=current_user.id, note=customer.name)
         
         db.session.commit()
         return redirect(url_for('collection'))
     
+    return render_template('collection.html')
+
+def customer_cards(*filters):
+    """One page of the collection cards, narrowed by the ``q`` search term."""
+    query = Customer.query.filter(*filters)
     if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).all()
-    else:
-        customers = Customer.query.all()
-    return render_template('collection.html', customers=customers)
+        query = query.filter_by(staff_id=current_user.id)
+    term = request.args.get('q', '').strip()
+    if term:
+        query = query.filter(Customer.id.in_(search_service.matching_ids(term)))
+    return paginate_request(query, Customer.created_date, Customer.id)
 
 @app.route('/loan_collection', methods=['GET'])
 @login_required
 def loan_collection():
-    if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).filter(Customer.remaining_loan > 0).all()
-    else:
-        customers = Customer.query.filter(Customer.remaining_loan > 0).all()
-    return render_template('loan_collection.html', customers=customers)
+    page = customer_cards(Customer.remaining_loan > 0)
+    return render_template('loan_collection.html', customers=page.items, page=page)
 
 @app.route('/saving_collection', methods=['GET'])
 @login_required
 def saving_collection():
-    if current_user.role == 'staff':
-        customers = Customer.query.filter_by(staff_id=current_user.id).all()
-    else:
-        customers = Customer.query.all()
-    return render_template('saving_collection.html', customers=customers)
+    page = customer_cards()
+    return render_template('saving_collection.html', customers=page.items, page=page)
+
+@app.route('/customers/search')
+@login_required
+def search_customers():
+    """Typeahead for the member pickers: the top matches as JSON."""
+    staff_id = current_user.id if current_user.role == 'staff' else None
+    customers = search_service.search(request.args.get('q', ''), limit=request.args.get('limit', type=int),
+                                      staff_id=staff_id, with_loan=bool(request.args.get('loan_only')))
+    return jsonify([search_service.as_dict(customer) for customer in customers])
 
 @app.route('/loan_collection/collect', methods=['POST'])
 @login_required
 def collect_loan():
     try:
         customer_id = int(request.form['customer_id'])
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         
         customer = Customer.query.get_or_404(customer_id)
         
@@ -628,12 +751,10 @@ def collect_loan():
         )
         
         customer.remaining_loan -= amount
+        ledger_service.record(current_user.id, loan_collected=amount)
+        collection.loan_id = loan_service.apply_collection(customer_id, amount)
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
-        cash_balance_record.balance += amount
+        cash_service.record(amount, 'loan_collection', staff_id=current_user.id, note=customer.name)
         
         db.session.add(collection)
         db.session.commit()
@@ -649,7 +770,11 @@ def collect_loan():
 @login_required
 def collect_saving():
     customer_id = int(request.form['customer_id'])
-    amount = float(request.form['amount'])
+    try:
+        amount = to_money(request.form['amount'])
+    except ValueError:
+        flash('টাকার পরিমাণ সঠিক নয়!', 'danger')
+        return redirect(url_for('saving_collection'))
     
     customer = Customer.query.get_or_404(customer_id)
     
@@ -660,12 +785,9 @@ def collect_saving():
     )
     
     customer.savings_balance += amount
+    ledger_service.record(current_user.id, saving_collected=amount)
     
-    cash_balance_record = CashBalance.query.first()
-    if not cash_balance_record:
-        cash_balance_record = CashBalance(balance=0)
-        db.session.add(cash_balance_record)
-    cash_balance_record.balance += amount
+    cash_service.record(amount, 'saving_collection', staff_id=current_user.id, note=customer.name)
     
     db.session.add(collection)
     db.session.commit()
@@ -673,6 +795,69 @@ def collect_saving():
     flash(f'সফলভাবে ৳{amount} সেভিংস জমা হয়েছে!', 'success')
     return redirect(url_for('saving_collection'))
 
+@app.route('/collection/batch', methods=['GET', 'POST'])
+@login_required
+def batch_collection():
+    if request.method == 'POST':
+        if request.is_json:
+            rows = (request.get_json(silent=True) or {}).get('rows', [])
+        else:
+            customer_ids = request.form.getlist('customer_id')
+            rows = [{'customer_id': customer_id,
+                     'loan_amount': request.form.get(f'loan_{customer_id}'),
+                     'saving_amount': request.form.get(f'saving_{customer_id}')} for customer_id in customer_ids]
+        results = collection_service.apply_batch(rows, current_user)
+        
+        if request.is_json:
+            return jsonify({'accepted': sum(1 for r in results if r.ok), 'rejected': sum(1 for r in results if r.error),
+                            'skipped': sum(1 for r in results if r.skipped), 'rows': [r.to_dict() for r in results]})
+        accepted = [r for r in results if r.ok]
+        rejected = [r for r in results if r.error]
+        flash(f'{len(accepted)} জন সদস্যের কালেকশন সম্পন্ন হয়েছে! লোন: ৳{sum(r.loan_amount for r in accepted)}, সেভিংস: ৳{sum(r.saving_amount for r in accepted)}', 'success')
+        if rejected:
+            flash(f'{len(rejected)} টি সারি বাতিল হয়েছে।', 'danger')
+        return render_template('batch_collection.html', customers=[], results=results)
+    
+    if current_user.role == 'staff':
+        customers = Customer.query.filter_by(staff_id=current_user.id).order_by(Customer.member_no).all()
+    else:
+        customers = Customer.query.order_by(Customer.member_no).all()
+    return render_template('batch_collection.html', customers=customers, results=None)
+
+@app.route('/sync/collections', methods=['POST'])
+@login_required
+def sync_collections():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    try:
+        since = sync_service.parse_timestamp(payload.get('since'))
+        results = sync_service.apply(payload.get('records') or [], current_user)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify({'results': results, 'customers': sync_service.balance_delta(current_user, since)})
+
+@app.route('/arrears')
+@login_required
+def arrears():
+    as_of_str = request.args.get('as_of', '')
+    try:
+        as_of = datetime.strptime(as_of_str, '%Y-%m-%d').date() if as_of_str else datetime.now().date()
+    except ValueError:
+        flash('Invalid date!', 'danger')
+        return redirect(url_for('arrears'))
+    
+    if current_user.role == 'staff':
+        staff_id = current_user.id
+        staffs = []
+    else:
+        staff_id = request.args.get('staff_id', type=int)
+        staffs = User.query.filter_by(role='staff').all()
+    
+    rows = schedule_service.arrears_by_customer(as_of, staff_id).all()
+    total_outstanding = sum(row.outstanding for row in rows)
+    return render_template('arrears.html', rows=rows, as_of=as_of, staff_id=staff_id, staffs=staffs, total_outstanding=total_outstanding)
+
 @app.route('/daily_collections')
 @login_required
 def daily_collections():
@@ -680,22 +865,17 @@ def daily_collections():
     today_date = date.today()
     
     if current_user.role == 'staff':
-        # Get all collections for this staff (for testing)
-        all_loan = LoanCollection.query.filter_by(staff_id=current_user.id).all()
-        all_saving = SavingCollection.query.filter_by(staff_id=current_user.id).all()
-        
-        # Get today's collections
-        loan_collections = [lc for lc in all_loan if lc.collection_date.date() == today_date]
-        saving_collections = [sc for sc in all_saving if sc.collection_date.date() == today_date]
+        loan_filters = day_scoped(LoanCollection.collection_date, today_date, LoanCollection.staff_id == current_user.id)
+        saving_filters = day_scoped(SavingCollection.collection_date, today_date, SavingCollection.staff_id == current_user.id)
     else:
-        all_loan = LoanCollection.query.all()
-        all_saving = SavingCollection.query.all()
-        
-        loan_collections = [lc for lc in all_loan if lc.collection_date.date() == today_date]
-        saving_collections = [sc for sc in all_saving if sc.collection_date.date() == today_date]
+        loan_filters = day_scoped(LoanCollection.collection_date, today_date)
+        saving_filters = day_scoped(SavingCollection.collection_date, today_date)
+    
+    loan_collections = query_service.loan_collection_query().filter(*loan_filters).order_by(LoanCollection.collection_date).all()
+    saving_collections = query_service.saving_collection_query().filter(*saving_filters).order_by(SavingCollection.collection_date).all()
     
-    total_loan = sum(lc.amount for lc in loan_collections)
-    total_saving = sum(sc.amount for sc in saving_collections)
+    total_loan = db.session.query(db.func.sum(LoanCollection.amount)).filter(*loan_filters).scalar() or 0
+    total_saving = db.session.query(db.func.sum(SavingCollection.amount)).filter(*saving_filters).scalar() or 0
     
     return render_template('daily_collections.html', loan_collections=loan_collections, saving_collections=saving_collections, total_loan=total_loan, total_saving=total_saving)
 
@@ -708,12 +888,9 @@ def manage_cash_balance():
     
     if request.method == 'POST':
         action = request.form['action']
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
+        cash_balance = cash_service.current_balance()
         
         if action == 'add':
             investor_name = request.form.get('investor_name', '')
@@ -724,12 +901,13 @@ def manage_cash_balance():
                 amount=amount,
                 note=note
             )
-            cash_balance_record.balance += amount
+            cash_service.record(amount, 'investment', staff_id=current_user.id, note=investor_name)
+            ledger_service.record(investments=amount)
             db.session.add(investment)
             flash(f'৳{amount} যোগ করা হয়েছে!', 'success')
         elif action == 'subtract':
-            if cash_balance_record.balance >= amount:
-                cash_balance_record.balance -= amount
+            if cash_balance >= amount:
+                cash_service.record(-amount, 'adjustment', staff_id=current_user.id)
                 flash(f'৳{amount} বিয়োগ করা হয়েছে!', 'success')
             else:
                 flash('পর্যাপ্ত টাকা নেই!', 'danger')
@@ -737,13 +915,14 @@ def manage_cash_balance():
             investor_name = request.form.get('investor_name', '')
             note = request.form.get('note', '')
             
-            if cash_balance_record.balance >= amount:
+            if cash_balance >= amount:
                 withdrawal = Withdrawal(
                     investor_name=investor_name,
                     amount=amount,
                     note=note
                 )
-                cash_balance_record.balance -= amount
+                cash_service.record(-amount, 'withdrawal', staff_id=current_user.id, note=investor_name)
+                ledger_service.record(withdrawals=amount)
                 db.session.add(withdrawal)
                 flash(f'৳{amount} Withdrawal সফল হয়েছে!', 'success')
             else:
@@ -752,8 +931,7 @@ def manage_cash_balance():
         db.session.commit()
         return redirect(url_for('manage_cash_balance'))
     
-    cash_balance_record = CashBalance.query.first()
-    cash_balance = cash_balance_record.balance if cash_balance_record else 0
+    cash_balance = cash_service.current_balance()
     investments = Investment.query.order_by(Investment.date.desc()).all()
     withdrawals = Withdrawal.query.order_by(Withdrawal.date.desc()).all()
     total_investment = db.session.query(db.func.sum(Investment.amount)).scalar() or 0
@@ -769,21 +947,17 @@ def manage_expenses():
     
     if request.method == 'POST':
         category = request.form['category']
-        amount = float(request.form['amount'])
+        amount = to_money(request.form['amount'])
         description = request.form.get('description', '')
         
-        cash_balance_record = CashBalance.query.first()
-        if not cash_balance_record:
-            cash_balance_record = CashBalance(balance=0)
-            db.session.add(cash_balance_record)
-        
-        if cash_balance_record.balance >= amount:
+        if cash_service.current_balance() >= amount:
             expense = Expense(
                 category=category,
                 amount=amount,
                 description=description
             )
-            cash_balance_record.balance -= amount
+            cash_service.record(-amount, 'expense', staff_id=current_user.id, note=category)
+            ledger_service.record(expenses=amount)
             db.session.add(expense)
             db.session.commit()
             flash(f'{category} - ৳{amount} ব্যয় সফল হয়েছে!', 'success')
@@ -792,7 +966,7 @@ def manage_expenses():
         
         return redirect(url_for('manage_expenses'))
     
-    expenses = Expense.query.order_by(Expense.date.desc()).all()
+    page = paginate_request(Expense.query, Expense.date, Expense.id)
     total_expenses = db.session.query(db.func.sum(Expense.amount)).scalar() or 0
     
     salary_total = db.session.query(db.func.sum(Expense.amount)).filter_by(category='Salary').scalar() or 0
@@ -800,10 +974,9 @@ def manage_expenses():
     transport_total = db.session.query(db.func.sum(Expense.amount)).filter_by(category='Transport').scalar() or 0
     other_total = db.session.query(db.func.sum(Expense.amount)).filter_by(category='Other').scalar() or 0
     
-    cash_balance_record = CashBalance.query.first()
-    cash_balance = cash_balance_record.balance if cash_balance_record else 0
+    cash_balance = cash_service.current_balance()
     
-    return render_template('manage_expenses.html', expenses=expenses, total_expenses=total_expenses, salary_total=salary_total, office_total=office_total, transport_total=transport_total, other_total=other_total, cash_balance=cash_balance)
+    return render_template('manage_expenses.html', expenses=page.items, page=page, total_expenses=total_expenses, salary_total=salary_total, office_total=office_total, transport_total=transport_total, other_total=other_total, cash_balance=cash_balance)
 
 @app.route('/profit_loss')
 @login_required
@@ -812,58 +985,18 @@ def profit_loss():
         flash('Access denied!', 'danger')
         return redirect(url_for('dashboard'))
     
-    from datetime import datetime
-    
     period = request.args.get('period', 'monthly')
-    
-    today = datetime.now()
-    if period == 'monthly':
-        start_date = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:  # yearly
-        start_date = today.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    # Income: Loan Collections + Savings Collections
-    loan_collections = LoanCollection.query.filter(LoanCollection.collection_date >= start_date).all()
-    saving_collections = SavingCollection.query.filter(SavingCollection.collection_date >= start_date).all()
-    
-    total_loan_collected = sum(lc.amount for lc in loan_collections)
-    total_savings_collected = sum(sc.amount for sc in saving_collections)
-    total_income = total_loan_collected + total_savings_collected
-    
-    # Expenses
-    expenses = Expense.query.filter(Expense.date >= start_date).all()
-    total_expenses = sum(exp.amount for exp in expenses)
-    
-    # Withdrawals
-    withdrawals = Withdrawal.query.filter(Withdrawal.date >= start_date).all()
-    total_withdrawals = sum(wd.amount for wd in withdrawals)
-    
-    # Loans Given (money out)
-    loans_given = Loan.query.filter(Loan.loan_date >= start_date).all()
-    total_loans_given = sum(loan.amount for loan in loans_given)
-    
-    # Net Profit/Loss = Income - (Expenses + Withdrawals + Loans Given)
-    net_profit = total_income - (total_expenses + total_withdrawals + total_loans_given)
-    
-    # Category-wise expenses
-    salary_exp = sum(exp.amount for exp in expenses if exp.category == 'Salary')
-    office_exp = sum(exp.amount for exp in expenses if exp.category == 'Office')
-    transport_exp = sum(exp.amount for exp in expenses if exp.category == 'Transport')
-    other_exp = sum(exp.amount for exp in expenses if exp.category == 'Other')
-    
-    return render_template('profit_loss.html', 
-                         period=period,
-                         total_income=total_income,
-                         total_loan_collected=total_loan_collected,
-                         total_savings_collected=total_savings_collected,
-                         total_expenses=total_expenses,
-                         total_withdrawals=total_withdrawals,
-                         total_loans_given=total_loans_given,
-                         net_profit=net_profit,
-                         salary_exp=salary_exp,
-                         office_exp=office_exp,
-                         transport_exp=transport_exp,
-                         other_exp=other_exp)
+    from_date = request.args.get('from', '')
+    to_date = request.args.get('to', '')
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d').date() if from_date else None
+        end = datetime.strptime(to_date, '%Y-%m-%d').date() if to_date else None
+    except ValueError:
+        flash('Invalid date range!', 'danger')
+        return redirect(url_for('profit_loss'))
+    if start and end and end < start:
+        start, end = end, start
+    return render_template('profit_loss.html', **profit_loss_context(period, start, end))
 
 @app.route('/messages')
 @login_required
@@ -902,14 +1035,17 @@ def manage_withdrawals():
     if current_user.role != 'admin':
         flash('Access denied!', 'danger')
         return redirect(url_for('dashboard'))
-    withdrawals = Withdrawal.query.order_by(Withdrawal.date.desc()).all()
-    customers = Customer.query.all()
-    cash_balance_record = CashBalance.query.first()
-    cash_balance = cash_balance_record.balance if cash_balance_record else 0
-    total_withdrawal = sum(w.amount for w in withdrawals)
-    savings_withdrawal = sum(w.amount for w in withdrawals if hasattr(w, 'withdrawal_type') and w.withdrawal_type == 'savings')
+    page = paginate_request(query_service.withdrawal_query(), Withdrawal.date, Withdrawal.id)
+    cash_balance = cash_service.current_balance()
+    total_withdrawal, savings_withdrawal = withdrawal_totals()
     investment_withdrawal = total_withdrawal - savings_withdrawal
-    return render_template('manage_withdrawals.html', withdrawals=withdrawals, customers=customers, cash_balance=cash_balance, total_withdrawal=total_withdrawal, savings_withdrawal=savings_withdrawal, investment_withdrawal=investment_withdrawal)
+    return render_template('manage_withdrawals.html', withdrawals=page.items, page=page, cash_balance=cash_balance, total_withdrawal=total_withdrawal, savings_withdrawal=savings_withdrawal, investment_withdrawal=investment_withdrawal)
+
+def withdrawal_totals(*filters):
+    """Return (total, savings total) of the withdrawals matching ``filters``."""
+    savings_amount = db.case((Withdrawal.withdrawal_type == 'savings', Withdrawal.amount), else_=0)
+    return db.session.query(db.func.coalesce(db.func.sum(Withdrawal.amount), 0),
+                            db.func.coalesce(db.func.sum(savings_amount), 0)).filter(*filters).one()
 
 @app.route('/daily_report')
 @login_required
@@ -920,33 +1056,24 @@ def daily_report():
     
     from datetime import date
     today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-    
-    loan_collections = LoanCollection.query.filter(LoanCollection.collection_date >= today_start).all()
-    saving_collections = SavingCollection.query.filter(SavingCollection.collection_date >= today_start).all()
-    loans_given = Loan.query.filter(Loan.loan_date >= today_start).all()
-    withdrawals = Withdrawal.query.filter(Withdrawal.date >= today_start).all()
-    expenses = Expense.query.filter(Expense.date >= today_start).all()
-    customers_added_today = Customer.query.filter(Customer.created_date >= today_start).all()
-    
-    total_installment = sum(lc.amount for lc in loan_collections)
-    total_saving = sum(sc.amount for sc in saving_collections)
-    total_loan_distributed = sum(l.amount for l in loans_given)
-    total_withdrawal = sum(w.amount for w in withdrawals)
-    total_expense = sum(e.amount for e in expenses)
-    total_application_fee = sum(l.service_charge for l in loans_given)
+    totals = ledger_service.period_totals(today, today + timedelta(days=1))
+    
+    total_installment = totals['loan_collected']
+    total_saving = totals['saving_collected']
+    total_loan_distributed = totals['loan_given']
+    total_withdrawal = totals['withdrawals']
+    total_expense = totals['expenses']
+    total_application_fee = totals['service_charge']
     total_welfare_fee = 0
-    total_admission_fee = sum(c.admission_fee for c in customers_added_today)
+    total_admission_fee = totals['admission_fee']
     total_outflow = total_loan_distributed + total_withdrawal + total_expense
     
-    customers = Customer.query.order_by(Customer.member_no).all()
-    collections = []
-    for customer in customers:
-        loan_amount = sum(lc.amount for lc in loan_collections if lc.customer_id == customer.id)
-        saving_amount = sum(sc.amount for sc in saving_collections if sc.customer_id == customer.id)
-        collections.append({'customer': customer, 'loan_amount': loan_amount, 'saving_amount': saving_amount})
+    context = dict(report_date=today.strftime('%d-%m-%Y'), total_installment=total_installment, total_saving=total_saving, total_welfare_fee=total_welfare_fee, total_admission_fee=total_admission_fee, total_application_fee=total_application_fee, total_expense=total_expense, total_loan_distributed=total_loan_distributed, total_withdrawal=total_withdrawal, total_outflow=total_outflow)
     
-    return render_template('daily_report.html', report_date=today.strftime('%d-%m-%Y'), total_installment=total_installment, total_saving=total_saving, total_welfare_fee=total_welfare_fee, total_admission_fee=total_admission_fee, total_application_fee=total_application_fee, total_expense=total_expense, collections=collections, total_loan_distributed=total_loan_distributed, total_withdrawal=total_withdrawal, total_outflow=total_outflow)
+    # ?stream=1 renders the member table while rows arrive from a server-side cursor
+    if request.args.get('stream'):
+        return stream_template('daily_report.html', collections=member_collections(today).yield_per(1000), **context)
+    return render_template('daily_report.html', collections=member_collections(today).all(), **context)
 
 @app.route('/monthly_report')
 @login_required
@@ -955,72 +1082,11 @@ def monthly_report():
         flash('Access denied!', 'danger')
         return redirect(url_for('dashboard'))
     
-    import calendar
     today = datetime.now()
     month = int(request.args.get('month', today.month))
     year = int(request.args.get('year', today.year))
     
-    month_names = ['', 'জানুয়ারি', 'ফেব্রুয়ারি', 'মার্চ', 'এপ্রিল', 'মে', 'জুন', 'জুলাই', 'আগস্ট', 'সেপ্টেম্বর', 'অক্টোবর', 'নভেম্বর', 'ডিসেম্বর']
-    month_name = month_names[month]
-    last_day = calendar.monthrange(year, month)[1]
-    
-    month_start = datetime(year, month, 1)
-    month_end = datetime(year, month, last_day, 23, 59, 59)
-    
-    daily_data = {}
-    running_balance = 0
-    
-    for day in range(1, last_day + 1):
-        day_start = datetime(year, month, day)
-        day_end = datetime(year, month, day, 23, 59, 59)
-        
-        loan_collections = LoanCollection.query.filter(LoanCollection.collection_date >= day_start, LoanCollection.collection_date <= day_end).all()
-        saving_collections = SavingCollection.query.filter(SavingCollection.collection_date >= day_start, SavingCollection.collection_date <= day_end).all()
-        loans_given = Loan.query.filter(Loan.loan_date >= day_start, Loan.loan_date <= day_end).all()
-        withdrawals = Withdrawal.query.filter(Withdrawal.date >= day_start, Withdrawal.date <= day_end).all()
-        expenses = Expense.query.filter(Expense.date >= day_start, Expense.date <= day_end).all()
-        customers_added = Customer.query.filter(Customer.created_date >= day_start, Customer.created_date <= day_end).all()
-        
-        installments = sum(lc.amount for lc in loan_collections)
-        savings = sum(sc.amount for sc in saving_collections)
-        loan_given = sum(l.amount for l in loans_given)
-        interest = sum((l.amount * l.interest / 100) for l in loans_given)
-        service_charge = sum(l.service_charge for l in loans_given)
-        admission_fee = sum(c.admission_fee for c in customers_added)
-        welfare_fee = 0
-        loan_with_interest = loan_given + interest
-        savings_return = sum(w.amount for w in withdrawals)
-        expenses_total = sum(e.amount for e in expenses)
-        
-        total_income = installments + savings + service_charge + admission_fee + welfare_fee
-        total_expense = loan_given + savings_return + expenses_total
-        day_balance = total_income - total_expense
-        running_balance += day_balance
-        
-        daily_data[day] = {
-            'savings': savings,
-            'installments': installments,
-            'welfare_fee': welfare_fee,
-            'admission_fee': admission_fee,
-            'service_charge': service_charge,
-            'capital_savings': installments + savings,
-            'loan_given': loan_given,
-            'interest': interest,
-            'loan_with_interest': loan_with_interest,
-            'savings_return': savings_return,
-            'expenses': expenses_total,
-            'total_expense': total_expense,
-            'balance': running_balance
-        }
-    
-    total_capital_savings = sum(d['capital_savings'] for d in daily_data.values())
-    total_loan_distributed = sum(d['loan_given'] for d in daily_data.values())
-    total_interest = sum(d['interest'] for d in daily_data.values())
-    current_remaining = db.session.query(db.func.sum(Customer.remaining_loan)).scalar() or 0
-    prev_remaining = current_remaining + total_capital_savings - total_loan_distributed
-    total_monthly_expenses = sum(d['expenses'] for d in daily_data.values())
-    
-    return render_template('monthly_report.html', month_name=month_name, year=year, daily_data=daily_data, last_day=last_day, total_capital_savings=total_capital_savings, total_loan_distributed=total_loan_distributed, total_interest=total_interest, prev_remaining=prev_remaining, current_remaining=current_remaining, total_monthly_expenses=total_monthly_expenses)
+    return render_template('monthly_report.html', **monthly_report_context(year, month))
 
 @app.route('/withdrawal_report')
 @login_required
@@ -1028,24 +1094,132 @@ def withdrawal_report():
     if current_user.role != 'admin':
         flash('Access denied!', 'danger')
         return redirect(url_for('dashboard'))
-    withdrawals = Withdrawal.query.order_by(Withdrawal.date.desc()).all()
-    total = sum(w.amount for w in withdrawals)
-    savings_total = sum(w.amount for w in withdrawals if hasattr(w, 'withdrawal_type') and w.withdrawal_type == 'savings')
-    investment_total = total - savings_total
     from_date = request.args.get('from_date', '')
     to_date = request.args.get('to_date', '')
-    return render_template('withdrawal_report.html', withdrawals=withdrawals, total=total, savings_total=savings_total, investment_total=investment_total, from_date=from_date, to_date=to_date)
+    
+    filters = []
+    try:
+        if from_date:
+            filters.append(Withdrawal.date >= datetime.strptime(from_date, '%Y-%m-%d'))
+        if to_date:
+            filters.append(Withdrawal.date < datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        flash('Invalid date range!', 'danger')
+        return redirect(url_for('withdrawal_report'))
+    
+    page = paginate_request(query_service.withdrawal_query().filter(*filters), Withdrawal.date, Withdrawal.id)
+    total, savings_total = withdrawal_totals(*filters)
+    investment_total = total - savings_total
+    return render_template('withdrawal_report.html', withdrawals=page.items, page=page, total=total, savings_total=savings_total, investment_total=investment_total, from_date=from_date, to_date=to_date)
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = run_migrations(echo=click.echo)
+    click.echo(f'Applied {len(applied)} migration(s); schema is up to date.')
+
+@app.cli.command('report-worker')
+@click.option('--once', is_flag=True, help='Process the jobs queued now and exit.')
+@click.option('--interval', default=2.0, show_default=True, help='Seconds to wait when the queue is empty.')
+def report_worker_command(once, interval):
+    """Run queued background report jobs."""
+    report_job_service.work(interval=interval, once=once, echo=click.echo)
+
+@app.cli.command('reconcile')
+@click.option('--repair', is_flag=True, help='Overwrite drifted balances with the recomputed ones.')
+@click.option('--output', type=click.File('w'), default='-', help='File for the CSV diff report (default: stdout).')
+def reconcile_command(repair, output):
+    """Recompute customer and cash balances from the transactions and report drift."""
+    writer = csv.writer(output)
+    writer.writerow(reconcile_service.DIFF_HEADER)
+    count = 0
+    for row in reconcile_service.diff_rows():
+        writer.writerow(row)
+        count += 1
+    output.flush()
+    click.echo(f'{count} balance(s) differ from the transactions.', err=True)
+    if repair:
+        updated, correction = reconcile_service.repair()
+        click.echo(f'Repaired {updated} customer(s); cash corrected by ৳{correction}.', err=True)
+
+@app.cli.command('seed-demo')
+@click.option('--customers', default=50000, show_default=True, help='Number of members.')
+@click.option('--staff', default=20, show_default=True, help='Number of field officers.')
+@click.option('--years', default=2.0, show_default=True, help='Years of history up to today.')
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed_demo_command(customers, staff, years, seed):
+    """Fill an empty database with synthetic members and history for benchmarks."""
+    try:
+        counts = seed_service.generate(customers, staff, years, auth_service.hash_password, seed=seed, echo=click.echo)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for table, count in counts.items():
+        click.echo(f'{table}: {count}')
+
+@app.cli.command('cash-checkpoint')
+def cash_checkpoint_command():
+    """Fold settled cash ledger entries into the cash balance checkpoint."""
+    count = cash_service.checkpoint()
+    click.echo(f'Checkpointed {count} cash ledger entries; balance is ৳{cash_service.current_balance()}.')
+
+@app.cli.command('rebuild-ledger')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day to rebuild (YYYY-MM-DD); defaults to the whole history.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Day after the last one to rebuild (YYYY-MM-DD).')
+def rebuild_ledger_command(start, end):
+    """Rebuild the daily ledger summary from the transaction tables."""
+    rows = ledger_service.rebuild(start.date() if start else None, end.date() if end else None)
+    click.echo(f'Rebuilt {rows} daily ledger summary rows.')
+
+@app.route('/admin/cache_stats')
+@login_required
+def cache_stats():
+    if current_user.role != 'admin':
+        flash('Access denied!', 'danger')
+        return redirect(url_for('dashboard'))
+    return jsonify({name: cache.stats() for name, cache in CACHES.items()})
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.role != 'admin':
+        flash('Access denied!', 'danger')
+        return redirect(url_for('dashboard'))
+    return render_template('admin_metrics.html', endpoints=metrics_service.endpoint_stats(),
+                           slow_requests=metrics_service.slow_requests(), profiles=metrics_service.profiles(),
+                           caches={name: cache.stats() for name, cache in CACHES.items()},
+                           since=metrics_service.started(), slow_ms=config.METRICS_SLOW_REQUEST_MS,
+                           profile_endpoints=config.METRICS_PROFILE_ENDPOINTS)
+
+@app.route('/admin/metrics/reset', methods=['POST'])
+@login_required
+def reset_metrics():
+    if current_user.role != 'admin':
+        flash('Access denied!', 'danger')
+        return redirect(url_for('dashboard'))
+    metrics_service.reset()
+    flash('Metrics reset.', 'success')
+    return redirect(url_for('admin_metrics'))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Scrapers send the METRICS_TOKEN; people can read it while logged in as admin
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not (config.METRICS_TOKEN and hmac.compare_digest(token, config.METRICS_TOKEN)):
+        if not (current_user.is_authenticated and current_user.role == 'admin'):
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics_service.prometheus_text(CACHES), mimetype='text/plain; version=0.0.4')
 
 @app.route('/logout')
 @login_required
 def logout():
     logout_user()
+    identity_service.clear()
     flash('Logged out successfully.', 'info')
     return redirect(url_for('login'))
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        run_migrations()
 
         # Add admin
         if not User.query.filter_by(email='admin@example.com').first():
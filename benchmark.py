@@ -0,0 +1,122 @@
+"""Latency and query count of every report and listing route.
+
+Runs the routes in-process through Flask's test client against the database
+in ``DATABASE_URL`` (fill one with ``flask --app app seed-demo`` first) and
+prints, per route, the median and worst latency over ``--repeat`` requests
+and the SQL statements a request ran on average. ``--save`` keeps the
+results as JSON; ``--compare`` prints the change against such a file, so a
+performance change can be measured against the routes it targets:
+
+    DATABASE_URL=sqlite:///bench.db flask --app app seed-demo --customers 50000
+    DATABASE_URL=sqlite:///bench.db python benchmark.py --save before.json
+    DATABASE_URL=sqlite:///bench.db python benchmark.py --compare before.json
+"""
+from app import app, User, Customer
+from services import metrics_service
+from datetime import datetime
+import argparse
+import json
+import statistics
+import time
+
+# (role, path); {customer} is a member with a loan history
+ROUTES = [
+    ('admin', '/dashboard'),
+    ('admin', '/daily_report'),
+    ('admin', '/monthly_report'),
+    ('admin', '/profit_loss'),
+    ('admin', '/profit_loss?period=yearly'),
+    ('admin', '/withdrawal_report'),
+    ('admin', '/reports'),
+    ('admin', '/reports/export/csv?period=monthly'),
+    ('admin', '/export?dataset=loans&format=csv'),
+    ('admin', '/loans'),
+    ('admin', '/loan_collections_history'),
+    ('admin', '/savings'),
+    ('admin', '/customers'),
+    ('admin', '/loan_customers'),
+    ('admin', '/collections'),
+    ('admin', '/daily_collections'),
+    ('admin', '/arrears'),
+    ('admin', '/manage_withdrawals'),
+    ('admin', '/cash_balance'),
+    ('admin', '/expenses'),
+    ('admin', '/customer_details/{customer}'),
+    ('staff', '/dashboard'),
+    ('staff', '/loan_collection'),
+    ('staff', '/saving_collection'),
+    ('staff', '/customers/search?q=Begum'),
+    ('staff', '/arrears'),
+    ('staff', '/daily_collections'),
+]
+
+
+def client_for(user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
+
+
+def measure(client, path, repeat):
+    metrics_service.reset()
+    timings, status = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        status = response.status_code
+        response.close()
+    stats = metrics_service.endpoint_stats()
+    # Per request on average: cached pages only query on a miss
+    queries = sum(row['queries'] for row in stats) / repeat
+    return {'status': status, 'median_ms': statistics.median(timings), 'max_ms': max(timings), 'queries': queries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='requests per route')
+    parser.add_argument('--only', help='comma-separated substrings; run only the routes whose path contains one')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        staff = User.query.filter(User.role == 'staff', User.customers.any()).first()
+        customer = Customer.query.filter(Customer.total_loan > 0).order_by(Customer.id).first()
+        if not (admin and staff and customer):
+            raise SystemExit('Needs an admin, a staff member with customers and a customer with a loan; run seed-demo first.')
+        clients = {'admin': client_for(admin), 'staff': client_for(staff)}
+        customer_id = customer.id
+
+    earlier = {}
+    if args.compare:
+        with open(args.compare) as f:
+            earlier = json.load(f)['routes']
+
+    only = [part for part in (args.only or '').split(',') if part]
+    results = {}
+    print(f'{"route":<45} {"status":>6} {"median ms":>10} {"max ms":>9} {"queries":>8}' + ('  change' if earlier else ''))
+    for role, path in ROUTES:
+        path = path.format(customer=customer_id)
+        if only and not any(part in path for part in only):
+            continue
+        key = f'{role} {path}'
+        result = results[key] = measure(clients[role], path, args.repeat)
+        line = f'{key:<45} {result["status"]:>6} {result["median_ms"]:>10.1f} {result["max_ms"]:>9.1f} {result["queries"]:>8.1f}'
+        if key in earlier:
+            before = earlier[key]
+            change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+            line += f'  {change:+.0f}% time, {result["queries"] - before["queries"]:+.1f} queries'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'run_at': datetime.now().isoformat(timespec='seconds'), 'repeat': args.repeat, 'routes': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,3 +5,73 @@ SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///loan.db')
 if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
     SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace('postgres://', 'postgresql://', 1)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool of each process (gunicorn worker). Keep pool size + overflow
+# times the number of workers below the server's max_connections.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 4)))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 4))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Seconds after which a pooled connection is replaced (before server/proxy idle cut-offs)
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Milliseconds a single Postgres statement may run; 0 disables (e.g. behind PgBouncer)
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+# Milliseconds a SQLite writer waits for the lock before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+
+if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT / 1000}}
+else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+    if DB_STATEMENT_TIMEOUT and SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'}
+
+# Seconds a computed dashboard stays cached; writes invalidate it earlier
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+
+# Seconds a customer statement stays cached; it is keyed on the customer's updated_at,
+# so a collection made through any worker replaces it
+STATEMENT_CACHE_TTL = int(os.environ.get('STATEMENT_CACHE_TTL', 300))
+
+# Background report jobs: seconds before a running job is presumed dead, days finished artifacts are kept
+REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT', 900))
+REPORT_JOB_RETENTION_DAYS = int(os.environ.get('REPORT_JOB_RETENTION_DAYS', 7))
+
+# Request metrics (/admin/metrics): requests slower than this many ms go to the slow log
+# with their METRICS_TOP_STATEMENTS most expensive statements
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 1000))
+METRICS_SLOW_LOG_SIZE = int(os.environ.get('METRICS_SLOW_LOG_SIZE', 50))
+METRICS_TOP_STATEMENTS = int(os.environ.get('METRICS_TOP_STATEMENTS', 5))
+# Comma-separated endpoints to run under cProfile, for this fraction of their requests
+METRICS_PROFILE_ENDPOINTS = [e.strip() for e in os.environ.get('METRICS_PROFILE_ENDPOINTS', '').split(',') if e.strip()]
+METRICS_PROFILE_SAMPLE_RATE = float(os.environ.get('METRICS_PROFILE_SAMPLE_RATE', 0.1))
+# Bearer token that lets a Prometheus scraper read /metrics without logging in
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Seconds the logged-in user's id, name and role are trusted from the session and the
+# process cache before they are checked against the database again
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+
+# Password hashing: bcrypt work factor (existing hashes are upgraded at their next login),
+# threads per process that may hash at once and how many logins may wait for them
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+
+# Login throttling per process: attempts per client IP, and failed attempts per email,
+# within LOGIN_WINDOW seconds
+LOGIN_WINDOW = int(os.environ.get('LOGIN_WINDOW', 300))
+LOGIN_IP_LIMIT = int(os.environ.get('LOGIN_IP_LIMIT', 60))
+LOGIN_EMAIL_LIMIT = int(os.environ.get('LOGIN_EMAIL_LIMIT', 5))
+# Number of reverse proxies in front of the app whose X-Forwarded-For is trusted (1 on Render)
+PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
+
+# Offline collection sync: records accepted per upload, and seconds the returned version
+# lags behind, so balances changed by transactions still committing are sent again
+SYNC_MAX_RECORDS = int(os.environ.get('SYNC_MAX_RECORDS', 1000))
+SYNC_OVERLAP = int(os.environ.get('SYNC_OVERLAP', 60))
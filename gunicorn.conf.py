@@ -0,0 +1,30 @@
+# Gunicorn settings for the web service: gunicorn -c gunicorn.conf.py app:app
+#
+# Each worker process has its own connection pool of DB_POOL_SIZE (+ DB_MAX_OVERFLOW)
+# connections, which defaults to one per thread. Size WEB_CONCURRENCY * (pool + overflow)
+# below the database's connection limit.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+# Threads let one worker serve other staff while a request waits on the database
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# Import the app once in the master; workers fork with it already loaded
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so a slow leak cannot grow without bound
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while preloading must not be shared with the workers
+    from app import app
+    from services import engine_service
+    with app.app_context():
+        engine_service.dispose_pool()
@@ -0,0 +1,87 @@
+"""Throughput of a running server under 1, 4 and 16 concurrent staff.
+
+Each simulated staff member logs in with its own session and walks the
+pages a field officer uses all day (dashboard, collection sheets, member
+search, today's collections) for ``--duration`` seconds. Read-only, so it
+can be pointed at a copy of production:
+
+    python loadtest.py --url http://localhost:8000
+    python loadtest.py --url https://ngo.example.com --user staff1@x.org:secret --user staff2@x.org:secret
+
+``--pages`` replaces the page list, e.g. to put the reports under load with
+an admin login:
+
+    python loadtest.py --user admin@example.com:admin123 --pages /daily_report,/monthly_report,/profit_loss
+"""
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener
+import argparse
+import itertools
+import threading
+import time
+
+PAGES = ['/dashboard', '/loan_collection', '/customers/search?q=a', '/saving_collection', '/daily_collections']
+
+
+def login(url, email, password):
+    opener = build_opener(HTTPCookieProcessor(CookieJar()))
+    with opener.open(url + '/login', urlencode({'email': email, 'password': password}).encode()) as response:
+        if response.url.rstrip('/').endswith('/login'):
+            raise SystemExit(f'Login failed for {email}')
+    return opener
+
+
+def staff_member(opener, url, pages, deadline, latencies, errors):
+    for page in itertools.cycle(pages):
+        if time.perf_counter() >= deadline:
+            return
+        started = time.perf_counter()
+        try:
+            with opener.open(url + page) as response:
+                response.read()
+            latencies.append(time.perf_counter() - started)
+        except (HTTPError, URLError):
+            errors.append(page)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def run(url, users, pages, concurrency, duration):
+    openers = [login(url, *users[i % len(users)]) for i in range(concurrency)]
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=staff_member, args=(opener, url, pages, deadline, latencies, errors)) for opener in openers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f'{concurrency:>5} {len(latencies) / elapsed:>9.1f} {percentile(latencies, 0.5) * 1000:>8.0f} '
+          f'{percentile(latencies, 0.95) * 1000:>8.0f} {percentile(latencies, 0.99) * 1000:>8.0f} {len(errors):>7}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--user', action='append', help='email:password of a staff login (repeatable)')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated numbers of concurrent staff')
+    parser.add_argument('--pages', help='comma-separated paths to request instead of the field officer pages')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per concurrency level')
+    args = parser.parse_args()
+
+    users = [tuple(user.split(':', 1)) for user in args.user or ['staff@example.com:staff123']]
+    url = args.url.rstrip('/')
+    pages = args.pages.split(',') if args.pages else PAGES
+    print(f'{"staff":>5} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for concurrency in (int(n) for n in args.concurrency.split(',')):
+        run(url, users, pages, concurrency, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class CashBalance(db.Model):
+    # Checkpoint of the cash ledger: balance of every entry marked checkpointed.
+    # last_entry_id is the id-based checkpoint of migration 2, unused since migration 10.
     __tablename__ = 'cash_balance'
     id = db.Column(db.Integer, primary_key=True)
-    balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(Money, default=0.0)
+    last_entry_id = db.Column(db.Integer, default=0)
     updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
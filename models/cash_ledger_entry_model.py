@@ -0,0 +1,17 @@
+from models.user_model import db
+from models.money import Money
+from datetime import datetime
+
+class CashLedgerEntry(db.Model):
+    __tablename__ = 'cash_ledger_entries'
+    __table_args__ = (
+        # The entries current_balance() still has to add up
+        db.Index('ix_cash_ledger_entries_checkpointed_id', 'checkpointed', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    amount = db.Column(Money, nullable=False)  # positive = cash in, negative = cash out
+    entry_type = db.Column(db.String(30), nullable=False)  # loan_collection, saving_collection, loan_disbursement, loan_fees, admission_fee, investment, adjustment, withdrawal, expense
+    note = db.Column(db.String(200))
+    staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    checkpointed = db.Column(db.Boolean, nullable=False, default=False)  # folded into the CashBalance checkpoint
@@ -1,8 +1,19 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        db.Index('ix_customers_staff_remaining', 'staff_id', 'remaining_loan'),
+        db.Index('ix_customers_remaining_loan', 'remaining_loan'),
+        db.Index('ix_customers_created_date_id', 'created_date', 'id'),
+        db.Index('ix_customers_name', 'name'),
+        db.Index('ix_customers_member_no', 'member_no'),
+        db.Index('ix_customers_phone', 'phone'),
+        db.Index('ix_customers_nid_no', 'nid_no'),
+        db.Index('ix_customers_staff_updated', 'staff_id', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     member_no = db.Column(db.String(50))
@@ -15,11 +26,12 @@ class Customer(db.Model):
     granter = db.Column(db.String(100))
     profession = db.Column(db.String(100))
     nid_no = db.Column(db.String(50))
-    admission_fee = db.Column(db.Float, default=0.0)
+    admission_fee = db.Column(Money, default=0.0)
     address = db.Column(db.String(200))
     staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    total_loan = db.Column(db.Float, default=0.0)
-    remaining_loan = db.Column(db.Float, default=0.0)
-    savings_balance = db.Column(db.Float, default=0.0)
+    total_loan = db.Column(Money, default=0.0)
+    remaining_loan = db.Column(Money, default=0.0)
+    savings_balance = db.Column(Money, default=0.0)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # drives the sync delta
     staff = db.relationship('User', backref='customers')
@@ -0,0 +1,25 @@
+from models.user_model import db
+from models.money import Money
+from datetime import datetime
+
+class DailyLedgerSummary(db.Model):
+    __tablename__ = 'daily_ledger_summary'
+    __table_args__ = (
+        db.UniqueConstraint('date', 'staff_id', name='uq_daily_ledger_date_staff'),
+        # NULLs never conflict in the constraint above; one office row per day
+        db.Index('ux_daily_ledger_office_date', 'date', unique=True,
+                 sqlite_where=db.text('staff_id IS NULL'), postgresql_where=db.text('staff_id IS NULL')),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # NULL for office-level entries (expenses, withdrawals, investments)
+    loan_collected = db.Column(Money, default=0.0)
+    saving_collected = db.Column(Money, default=0.0)
+    loan_given = db.Column(Money, default=0.0)
+    interest = db.Column(Money, default=0.0)
+    service_charge = db.Column(Money, default=0.0)
+    admission_fee = db.Column(Money, default=0.0)
+    expenses = db.Column(Money, default=0.0)
+    withdrawals = db.Column(Money, default=0.0)
+    investments = db.Column(Money, default=0.0)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,10 +1,15 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class Expense(db.Model):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_category_date', 'category', 'date'),
+        db.Index('ix_expenses_date_id', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(50), nullable=False)  # Salary, Office, Transport, Other
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     description = db.Column(db.String(200))
     date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,10 +1,14 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class Investment(db.Model):
     __tablename__ = 'investments'
+    __table_args__ = (
+        db.Index('ix_investments_date', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     investor_name = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     note = db.Column(db.String(200))
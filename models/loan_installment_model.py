@@ -0,0 +1,25 @@
+from models.user_model import db
+from models.money import Money
+from datetime import datetime
+
+class LoanInstallment(db.Model):
+    __tablename__ = 'loan_installments'
+    __table_args__ = (
+        db.UniqueConstraint('loan_id', 'number', name='uq_loan_installments_loan_number'),
+        db.Index('ix_loan_installments_staff_status_due', 'staff_id', 'status', 'due_date'),
+        db.Index('ix_loan_installments_status_due', 'status', 'due_date'),
+        db.Index('ix_loan_installments_customer_status_due', 'customer_id', 'status', 'due_date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
+    staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    number = db.Column(db.Integer, nullable=False)  # 1-based position in the schedule
+    due_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(Money, nullable=False)
+    paid_amount = db.Column(Money, default=0.0)
+    status = db.Column(db.String(10), default='open')  # open or paid
+    paid_date = db.Column(db.DateTime)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    loan = db.relationship('Loan', backref='installments')
+    customer = db.relationship('Customer', backref='installments')
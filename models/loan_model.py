@@ -1,19 +1,29 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class Loan(db.Model):
     __tablename__ = 'loans'
+    __table_args__ = (
+        db.Index('ix_loans_loan_date_id', 'loan_date', 'id'),
+        db.Index('ix_loans_staff_status', 'staff_id', 'status'),
+        db.Index('ix_loans_customer_status', 'customer_id', 'status'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'))
     customer_name = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     interest = db.Column(db.Float, default=0.0)
     loan_date = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime, nullable=False)
     installment_count = db.Column(db.Integer, default=0)
-    installment_amount = db.Column(db.Float, default=0.0)
-    service_charge = db.Column(db.Float, default=0.0)
-    welfare_fee = db.Column(db.Float, default=0.0)
+    installment_amount = db.Column(Money, default=0.0)
+    service_charge = db.Column(Money, default=0.0)
+    welfare_fee = db.Column(Money, default=0.0)
     installment_type = db.Column(db.String(50))
     status = db.Column(db.String(20), default='Pending')  # Pending or Paid
+    outstanding = db.Column(Money, default=0.0)  # amount + interest + service charge still to collect
     staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # part of the report data version
     staff = db.relationship('User', backref='loans')
+    customer = db.relationship('Customer', backref='loans')
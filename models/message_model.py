@@ -3,6 +3,9 @@ from datetime import datetime
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_staff_read', 'staff_id', 'is_read'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     staff_id = db.Column(db.Integer, db.ForeignKey('user.id'))
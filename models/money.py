@@ -0,0 +1,67 @@
+"""Money amounts: stored as whole paisa, handled in Python as Decimal taka.
+
+Every amount column is a ``Money`` column. The database keeps an exact
+integer number of paisa (so sums and comparisons never drift) and the ORM
+hands out ``Decimal`` values with two places, which add and compare exactly.
+Use ``to_money()`` to turn form input or any other number into an amount.
+"""
+from sqlalchemy import BigInteger, types
+from sqlalchemy.sql import operators
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+PAISA = Decimal('0.01')
+ZERO = Decimal('0.00')
+# Largest amount accepted, in taka (one lakh crore). Far below the BIGINT
+# paisa columns' limit, so sums of many amounts still fit.
+MAX_AMOUNT = Decimal('1000000000000')
+
+
+def to_money(value):
+    """Parse ``value`` (str, int, float or Decimal) into a Decimal rounded to
+    the paisa; blank values are zero. Raises ValueError on anything else,
+    including amounts above MAX_AMOUNT either way."""
+    if value is None or value == '':
+        return ZERO
+    try:
+        # str() first, so 0.1 is read as written rather than as its binary approximation
+        amount = Decimal(value if isinstance(value, (Decimal, int)) else str(value).strip())
+        if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+            raise ValueError(f'Invalid amount: {value!r}')
+        return amount.quantize(PAISA, ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+
+
+def percent(amount, rate):
+    """``rate`` percent of ``amount``, rounded to the paisa."""
+    return to_money(to_money(amount) * Decimal(str(rate or 0)) / 100)
+
+
+class Money(types.TypeDecorator):
+    """Decimal taka in Python, BIGINT paisa in the database."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    class comparator_factory(BigInteger.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            # money +-*/ number is still money (in paisa), so results such as
+            # SUM(amount * interest / 100) are read back as taka, not paisa
+            return op, self.type
+
+    def coerce_compared_value(self, op, value):
+        # The 100 of amount / 100 or the rate of amount * rate is a plain number
+        if op in (operators.mul, operators.truediv, operators.floordiv, operators.mod):
+            return types.Integer() if isinstance(value, int) else types.Float()
+        return self
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(to_money(value) / PAISA)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        # Arithmetic in SQL (e.g. amount * rate) can return fractional paisa
+        return (Decimal(value).quantize(Decimal(1), ROUND_HALF_UP) * PAISA).quantize(PAISA)
@@ -0,0 +1,25 @@
+from models.user_model import db
+from datetime import datetime
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        db.Index('ix_report_jobs_status_id', 'status', 'id'),
+        db.Index('ix_report_jobs_lookup', 'report', 'format', 'params'),
+        db.Index('ix_report_jobs_requested', 'requested_by', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    report = db.Column(db.String(50), nullable=False)  # monthly_report, profit_loss or an export dataset
+    format = db.Column(db.String(10), nullable=False)  # html, csv, xlsx
+    params = db.Column(db.String(500), nullable=False, default='{}')  # canonical JSON, part of the cache key
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, default=0)  # percent
+    data_version = db.Column(db.String(40))  # fingerprint of the data the artifact was built from
+    artifact = db.deferred(db.Column(db.LargeBinary))
+    artifact_size = db.Column(db.Integer)
+    error = db.Column(db.String(500))
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    started_date = db.Column(db.DateTime)
+    finished_date = db.Column(db.DateTime)
+    requester = db.relationship('User', backref='report_jobs')
@@ -1,12 +1,20 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class SavingCollection(db.Model):
     __tablename__ = 'saving_collections'
+    __table_args__ = (
+        db.Index('ix_saving_collections_customer_date', 'customer_id', 'collection_date'),
+        db.Index('ix_saving_collections_staff_date', 'staff_id', 'collection_date'),
+        db.Index('ix_saving_collections_date_id', 'collection_date', 'id'),
+        db.Index('ux_saving_collections_client_ref', 'client_ref', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     collection_date = db.Column(db.DateTime, default=datetime.utcnow)
     staff_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    client_ref = db.Column(db.String(36))  # idempotency key (UUID) of a record uploaded by /sync/collections
     customer = db.relationship('Customer', backref='saving_collections')
     staff = db.relationship('User', backref='saving_collections')
@@ -0,0 +1,8 @@
+from models.user_model import db
+from datetime import datetime
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200))
+    applied_date = db.Column(db.DateTime, default=datetime.utcnow)
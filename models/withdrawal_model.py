@@ -1,12 +1,17 @@
 from models.user_model import db
+from models.money import Money
 from datetime import datetime
 
 class Withdrawal(db.Model):
     __tablename__ = 'withdrawals'
+    __table_args__ = (
+        db.Index('ix_withdrawals_date_id', 'date', 'id'),
+        db.Index('ix_withdrawals_customer_date', 'customer_id', 'date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'))
     investor_name = db.Column(db.String(100))
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
     note = db.Column(db.String(200))
     withdrawal_type = db.Column(db.String(20), default='savings')
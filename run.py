@@ -1,9 +1,9 @@
 import socket
-from app import app, db, bcrypt, User, CashBalance
+from app import app, db, bcrypt, User, CashBalance, run_migrations
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        run_migrations()
         
         if not User.query.filter_by(email='admin@example.com').first():
             hashed_pw = bcrypt.generate_password_hash('admin123').decode('utf-8')
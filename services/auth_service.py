@@ -0,0 +1,139 @@
+"""Password hashing off the request threads, and login throttling.
+
+bcrypt is deliberately slow CPU work. When a whole shift of field staff
+logs in at once, hashing inline lets logins take every core and stall the
+other requests of the process. Hashes are computed on a small thread pool
+instead (bcrypt releases the GIL): at most ``PASSWORD_HASH_THREADS`` at a
+time, with at most ``PASSWORD_HASH_QUEUE`` logins waiting - past that the
+login is refused with ``Busy`` rather than queued.
+
+Before any hashing, ``check_login`` counts attempts per client IP and
+failed attempts per email in fixed windows and refuses bursts with
+``Throttled``, so guessing passwords cannot be used to burn CPU. The
+counters are per process.
+
+Hashes carry their work factor; one made with a cost other than
+``BCRYPT_LOG_ROUNDS`` is replaced at the user's next successful login.
+"""
+from models.user_model import db, User
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import bcrypt
+import config
+
+_executor = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_THREADS, thread_name_prefix='bcrypt')
+# Hashes running or waiting on the executor
+_slots = threading.BoundedSemaphore(config.PASSWORD_HASH_THREADS + config.PASSWORD_HASH_QUEUE)
+
+
+class Busy(Exception):
+    """Too many passwords are being hashed; try again shortly."""
+
+
+class Throttled(Exception):
+    """Too many login attempts; ``retry_after`` seconds until the window resets."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Too many login attempts; retry in {retry_after} seconds')
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Fixed-window counters: at most ``limit`` hits per key every ``window`` seconds."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _current(self, key, now):
+        count, started = self._counts.get(key, (0, now))
+        if now - started >= self.window:
+            count, started = 0, now
+        return count, started
+
+    def retry_after(self, key):
+        """Seconds until ``key`` may try again, or 0 if it is under the limit."""
+        now = time.monotonic()
+        with self._lock:
+            count, started = self._current(key, now)
+            return int(started + self.window - now) + 1 if count >= self.limit else 0
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            count, started = self._current(key, now)
+            self._counts[key] = (count + 1, started)
+            if len(self._counts) > 10000:
+                # Drop expired windows so random keys cannot grow the table forever
+                self._counts = {k: v for k, v in self._counts.items() if now - v[1] < self.window}
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+attempts_by_ip = RateLimiter(config.LOGIN_IP_LIMIT, config.LOGIN_WINDOW)
+failures_by_email = RateLimiter(config.LOGIN_EMAIL_LIMIT, config.LOGIN_WINDOW)
+
+
+def _run(function, *args):
+    if not _slots.acquire(blocking=False):
+        raise Busy()
+    try:
+        return _executor.submit(function, *args).result()
+    finally:
+        _slots.release()
+
+
+def _hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(config.BCRYPT_LOG_ROUNDS)).decode('utf-8')
+
+
+def _check(password_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Not a bcrypt hash
+        return False
+
+
+def hash_password(password):
+    """bcrypt hash of ``password`` at the configured work factor."""
+    return _run(_hash, password)
+
+
+def check_password(password_hash, password):
+    return bool(password_hash) and _run(_check, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    # $2b$<cost>$<salt and hash>
+    parts = (password_hash or '').split('$')
+    return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != config.BCRYPT_LOG_ROUNDS
+
+
+def check_login(email, password, ip):
+    """The user with ``email`` and ``password``, or None.
+
+    Raises ``Throttled`` before hashing when ``ip`` or ``email`` is over its
+    limit and ``Busy`` when the hashing queue is full. Upgrades the stored
+    hash if its work factor is out of date (and commits).
+    """
+    email_key = (email or '').strip().lower()
+    retry_after = max(attempts_by_ip.retry_after(ip), failures_by_email.retry_after(email_key))
+    if retry_after:
+        raise Throttled(retry_after)
+    attempts_by_ip.hit(ip)
+
+    user = User.query.filter_by(email=email).first()
+    if not user or not check_password(user.password, password):
+        failures_by_email.hit(email_key)
+        return None
+    failures_by_email.reset(email_key)
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+    return user
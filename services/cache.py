@@ -0,0 +1,85 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+import threading
+import time
+
+_PENDING = '_pending_cache_invalidations'
+
+
+class TTLCache:
+    """Process-local LRU cache whose entries expire after ``ttl`` seconds.
+
+    Keys are tuples so related entries can be dropped together with
+    ``invalidate_prefix``. Hit/miss counters are kept for the metrics pages.
+    """
+
+    def __init__(self, ttl=30, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self.invalidations += 1
+            self._data.pop(key, None)
+
+    def invalidate_prefix(self, prefix=()):
+        with self._lock:
+            self.invalidations += 1
+            for key in [k for k in self._data if k[:len(prefix)] == prefix]:
+                del self._data[key]
+
+    def invalidate_on_commit(self, session, prefix=()):
+        """Drop ``prefix`` entries once ``session`` commits (nothing on rollback).
+
+        Invalidating before the commit would let a concurrent request cache
+        the pre-commit values again.
+        """
+        session.info.setdefault(_PENDING, []).append((self, prefix))
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses,
+                    'invalidations': self.invalidations, 'ttl': self.ttl}
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_pending_invalidations(session):
+    for cache, prefix in session.info.pop(_PENDING, []):
+        cache.invalidate_prefix(prefix)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_invalidations(session):
+    session.info.pop(_PENDING, None)
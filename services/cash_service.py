@@ -0,0 +1,71 @@
+from models.user_model import db
+from models.cash_balance_model import CashBalance
+from models.cash_ledger_entry_model import CashLedgerEntry
+from datetime import datetime
+
+# Entries folded per checkpoint transaction
+CHECKPOINT_BATCH = 1000
+
+
+def record(amount, entry_type, staff_id=None, note=None):
+    """Append a cash movement to the ledger in the current transaction.
+
+    Positive amounts are cash in, negative amounts cash out. This is a plain
+    INSERT, so concurrent collections never contend on a shared row. The
+    caller is responsible for committing.
+    """
+    if not amount:
+        return None
+    entry = CashLedgerEntry(amount=amount, entry_type=entry_type, staff_id=staff_id, note=note)
+    db.session.add(entry)
+    return entry
+
+
+def balance_expression():
+    """SQL expression for the cash in hand, usable inside a larger SELECT."""
+    checkpoint_balance = db.select(CashBalance.balance).order_by(CashBalance.id).limit(1).scalar_subquery()
+    tail = db.select(db.func.sum(CashLedgerEntry.amount)).where(db.not_(CashLedgerEntry.checkpointed)).scalar_subquery()
+    return db.func.coalesce(checkpoint_balance, 0) + db.func.coalesce(tail, 0)
+
+
+def current_balance():
+    """Cash in hand: the checkpoint balance plus the entries not folded into it."""
+    return db.session.query(balance_expression()).scalar() or 0
+
+
+def checkpoint():
+    """Fold committed ledger entries into the CashBalance checkpoint row.
+
+    Keeps current_balance() a short scan of the unfolded entries. Each batch
+    marks its entries ``checkpointed`` in the transaction that adds them to
+    the balance, so an entry whose transaction commits late is folded by a
+    later run rather than skipped. Safe to run from several processes: a
+    batch some entries of which were folded meanwhile rolls back. Returns
+    the number of entries folded in.
+    """
+    record_row = CashBalance.query.order_by(CashBalance.id).first()
+    if not record_row:
+        record_row = CashBalance(balance=0, last_entry_id=0)
+        db.session.add(record_row)
+        db.session.commit()
+
+    folded = 0
+    while True:
+        entries = db.session.query(CashLedgerEntry.id, CashLedgerEntry.amount).filter(
+            db.not_(CashLedgerEntry.checkpointed)).order_by(CashLedgerEntry.id).limit(CHECKPOINT_BATCH).all()
+        if not entries:
+            return folded
+        ids = [entry_id for entry_id, _ in entries]
+        marked = CashLedgerEntry.query.filter(CashLedgerEntry.id.in_(ids), db.not_(CashLedgerEntry.checkpointed)).update(
+            {CashLedgerEntry.checkpointed: True}, synchronize_session=False)
+        if marked != len(ids):
+            db.session.rollback()
+            return folded
+        CashBalance.query.filter_by(id=record_row.id).update({
+            CashBalance.balance: CashBalance.balance + sum(amount for _, amount in entries),
+            CashBalance.updated_date: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.commit()
+        folded += len(ids)
+        if len(ids) < CHECKPOINT_BATCH:
+            return folded
@@ -0,0 +1,141 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.money import to_money
+from services import ledger_service, cash_service, statement_service, loan_service
+from datetime import datetime
+
+
+class BatchRowResult:
+    """Outcome of one sheet row: accepted amounts, the reason it was rejected,
+    or ``skipped`` when it collected nothing."""
+
+    def __init__(self, customer_id, loan_amount=0, saving_amount=0, error=None, customer_name=None, remaining_loan=None,
+                 skipped=False):
+        self.customer_id = customer_id
+        self.loan_amount = loan_amount
+        self.saving_amount = saving_amount
+        self.error = error
+        self.customer_name = customer_name
+        self.remaining_loan = remaining_loan
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None and not self.skipped
+
+    @property
+    def status(self):
+        if self.error is not None:
+            return 'rejected'
+        return 'skipped' if self.skipped else 'ok'
+
+    def to_dict(self):
+        return {
+            'customer_id': self.customer_id,
+            'customer_name': self.customer_name,
+            'loan_amount': self.loan_amount,
+            'saving_amount': self.saving_amount,
+            'remaining_loan': self.remaining_loan,
+            'status': self.status,
+            'error': self.error,
+        }
+
+
+def apply_batch(rows, user):
+    """Record a whole meeting sheet of loan and saving collections at once.
+
+    ``rows`` is a list of dicts with ``customer_id``, ``loan_amount`` and
+    ``saving_amount``. Every customer is loaded with one query, each row is
+    validated against ``remaining_loan``, the accepted rows are written with
+    bulk INSERTs and everything is committed in a single transaction.
+    Returns one BatchRowResult per input row, in input order; rows with
+    nothing to collect come back skipped.
+    """
+    parsed = []
+    for row in rows:
+        try:
+            parsed.append((int(row['customer_id']), to_money(row.get('loan_amount')), to_money(row.get('saving_amount'))))
+        except (KeyError, TypeError, ValueError):
+            parsed.append((row.get('customer_id') if isinstance(row, dict) else None, None, None))
+
+    ids = {customer_id for customer_id, _, _ in parsed if isinstance(customer_id, int)}
+    customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids)).all()} if ids else {}
+
+    now = datetime.utcnow()
+    results, loan_rows, saving_rows = [], [], []
+    for customer_id, loan_amount, saving_amount in parsed:
+        customer = customers.get(customer_id)
+        if loan_amount is None:
+            results.append(BatchRowResult(customer_id, error='Invalid row'))
+            continue
+        if not customer:
+            results.append(BatchRowResult(customer_id, error='Customer not found'))
+            continue
+        if user.role == 'staff' and customer.staff_id != user.id:
+            results.append(BatchRowResult(customer_id, customer_name=customer.name, error='Access denied'))
+            continue
+        if loan_amount < 0 or saving_amount < 0:
+            results.append(BatchRowResult(customer_id, customer_name=customer.name, error='Amounts cannot be negative'))
+            continue
+        if loan_amount > customer.remaining_loan:
+            results.append(BatchRowResult(customer_id, customer_name=customer.name, remaining_loan=customer.remaining_loan,
+                                          error=f'Loan amount exceeds remaining loan ({customer.remaining_loan})'))
+            continue
+        if not loan_amount and not saving_amount:
+            results.append(BatchRowResult(customer_id, customer_name=customer.name, remaining_loan=customer.remaining_loan,
+                                          skipped=True))
+            continue
+
+        if loan_amount:
+            customer.remaining_loan -= loan_amount
+            loan_rows.append({'customer_id': customer_id, 'amount': loan_amount, 'staff_id': user.id, 'collection_date': now})
+        if saving_amount:
+            customer.savings_balance += saving_amount
+            saving_rows.append({'customer_id': customer_id, 'amount': saving_amount, 'staff_id': user.id, 'collection_date': now})
+        results.append(BatchRowResult(customer_id, loan_amount, saving_amount, customer_name=customer.name,
+                                      remaining_loan=customer.remaining_loan))
+
+    record_collections(loan_rows, saving_rows, user)
+    db.session.commit()
+    return results
+
+
+def record_collections(loan_rows, saving_rows, user):
+    """Write accepted loan and saving collection rows (dicts of LoanCollection /
+    SavingCollection columns) whose amounts the caller has already applied to
+    the customers' balances: allocates the loan amounts to loans and
+    installments as of their collection time, oldest first, inserts the rows
+    in bulk and books the ledger summary (per collection day) and the cash
+    ledger. The caller commits.
+    """
+    # One allocation per collection time; a sheet has one, a sync upload of
+    # backdated records several
+    by_time = {}
+    for r in loan_rows:
+        collected = by_time.setdefault(r['collection_date'], {})
+        collected[r['customer_id']] = collected.get(r['customer_id'], 0) + r['amount']
+    loan_ids = {when: loan_service.apply_collections(by_time[when], when=when) for when in sorted(by_time)}
+    for r in loan_rows:
+        r['loan_id'] = loan_ids[r['collection_date']].get(r['customer_id'])
+
+    if loan_rows:
+        db.session.execute(db.insert(LoanCollection), loan_rows)
+    if saving_rows:
+        db.session.execute(db.insert(SavingCollection), saving_rows)
+    # Bulk INSERTs bypass the flush hooks, so drop the cached statements here
+    statement_service.invalidate_on_commit(db.session, {r['customer_id'] for r in loan_rows + saving_rows})
+
+    days = {}
+    for field, rows in (('loan_collected', loan_rows), ('saving_collected', saving_rows)):
+        for r in rows:
+            when, totals = days.setdefault(r['collection_date'].date(), (r['collection_date'], {}))
+            totals[field] = totals.get(field, 0) + r['amount']
+    for when, totals in days.values():
+        ledger_service.record(user.id, when=when, **totals)
+
+    loan_total = sum(r['amount'] for r in loan_rows)
+    saving_total = sum(r['amount'] for r in saving_rows)
+    cash_service.record(loan_total, 'loan_collection', staff_id=user.id, note=f'Batch of {len(loan_rows)}')
+    cash_service.record(saving_total, 'saving_collection', staff_id=user.id, note=f'Batch of {len(saving_rows)}')
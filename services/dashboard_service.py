@@ -0,0 +1,76 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.user_model import db, User
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.message_model import Message
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from services import cash_service
+from services.cache import TTLCache
+from services.report_service import day_scoped
+from datetime import datetime
+import config
+
+stats_cache = TTLCache(ttl=config.DASHBOARD_CACHE_TTL)
+
+# Writing any of these changes a number on some dashboard
+_WATCHED_MODELS = (Customer, User, Loan, LoanCollection, SavingCollection, Message, CashLedgerEntry, DailyLedgerSummary)
+
+
+def _scalar(statement):
+    return statement.scalar_subquery()
+
+
+def admin_stats():
+    """All admin dashboard numbers in one SELECT."""
+    sum_ = lambda column: db.func.coalesce(db.func.sum(column), 0)
+    row = db.session.query(
+        _scalar(db.select(db.func.count(User.id)).where(User.role == 'staff')).label('staff_count'),
+        sum_(Customer.total_loan).label('total_loans'),
+        sum_(Customer.remaining_loan).label('pending_loans'),
+        sum_(Customer.savings_balance).label('total_savings'),
+        db.func.count(Customer.id).label('total_customers'),
+        sum_(Customer.admission_fee).label('admission_fees'),
+        _scalar(db.select(sum_(Loan.service_charge))).label('service_charges'),
+        cash_service.balance_expression().label('cash_balance'),
+    ).select_from(Customer).one()
+    stats = dict(row._mapping)
+    stats['total_fees'] = stats['admission_fees'] + stats['service_charges']
+    return stats
+
+
+def staff_stats(staff_id):
+    """All staff dashboard numbers in one SELECT."""
+    today = datetime.now().date()
+    count_ = lambda model, *filters: _scalar(db.select(db.func.count(model.id)).where(*filters))
+    row = db.session.query(
+        db.func.count(Customer.id).label('my_customers'),
+        db.func.coalesce(db.func.sum(Customer.remaining_loan), 0).label('total_remaining'),
+        count_(LoanCollection, *day_scoped(LoanCollection.collection_date, today, LoanCollection.staff_id == staff_id)).label('today_loan_collections'),
+        count_(SavingCollection, *day_scoped(SavingCollection.collection_date, today, SavingCollection.staff_id == staff_id)).label('today_saving_collections'),
+        count_(Message, Message.staff_id == staff_id, Message.is_read == False).label('unread_messages'),
+    ).select_from(Customer).filter(Customer.staff_id == staff_id).one()
+    stats = dict(row._mapping)
+    stats['today_collections'] = stats['today_loan_collections'] + stats['today_saving_collections']
+    return stats
+
+
+def get_admin_stats():
+    return stats_cache.get_or_compute(('admin',), admin_stats)
+
+
+def get_staff_stats(staff_id):
+    return stats_cache.get_or_compute(('staff', staff_id), lambda: staff_stats(staff_id))
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_on_money_writes(session, flush_context):
+    # Write-driven invalidation: any flushed change to a watched model drops
+    # the cached dashboards once the transaction commits.
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _WATCHED_MODELS):
+            stats_cache.invalidate_on_commit(session)
+            return
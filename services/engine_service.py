@@ -0,0 +1,31 @@
+"""Per-connection database settings that cannot go in the engine options.
+
+SQLite (the local ``run.py`` mode, served by a threaded dev server) is
+switched to write-ahead logging so readers no longer block on a writer,
+and told to wait ``SQLITE_BUSY_TIMEOUT`` ms for the write lock instead of
+failing at once with "database is locked". Postgres settings (pool,
+pre-ping, statement timeout) are plain engine options in ``config.py``.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import sqlite3
+import config
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f'PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT)}')
+    # Safe with WAL: a power cut can lose the last commits but not corrupt the file
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def dispose_pool():
+    """Drop the pooled connections inherited from a parent process (gunicorn
+    ``preload_app``) without closing them under the parent's feet."""
+    from models.user_model import db
+    db.engine.dispose(close=False)
@@ -0,0 +1,213 @@
+from models.user_model import db, User
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from services.report_service import monthly_daily_totals
+from datetime import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+import csv
+import io
+import itertools
+import zipfile
+
+BATCH_SIZE = 1000
+
+
+class ExportDataset:
+    """A column projection of one table that can be streamed as rows."""
+
+    def __init__(self, title, model, date_column, columns, joins=(), staff_column=None, admin_only=False):
+        self.title = title
+        self.model = model
+        self.date_column = date_column
+        self.columns = columns
+        self.joins = joins
+        self.staff_column = staff_column
+        self.admin_only = admin_only
+
+    @property
+    def header(self):
+        return [label for label, _ in self.columns]
+
+    def query(self, start=None, end=None, staff_id=None):
+        query = db.session.query(*[column for _, column in self.columns]).select_from(self.model)
+        for target, condition in self.joins:
+            query = query.outerjoin(target, condition)
+        if start:
+            query = query.filter(self.date_column >= start)
+        if end:
+            query = query.filter(self.date_column < end)
+        if staff_id and self.staff_column is not None:
+            query = query.filter(self.staff_column == staff_id)
+        return query.order_by(self.date_column, self.model.id)
+
+    def rows(self, start=None, end=None, staff_id=None):
+        # yield_per streams from a server-side cursor in fixed-size batches
+        for row in self.query(start, end, staff_id).yield_per(BATCH_SIZE):
+            yield [_cell(value) for value in row]
+
+
+DATASETS = {
+    'customers': ExportDataset('Customers', Customer, Customer.created_date, [
+        ('Member No', Customer.member_no), ('Name', Customer.name), ('Phone', Customer.phone),
+        ('Village', Customer.village), ('NID', Customer.nid_no), ('Staff', User.name),
+        ('Total Loan', Customer.total_loan), ('Remaining Loan', Customer.remaining_loan),
+        ('Savings', Customer.savings_balance), ('Admission Fee', Customer.admission_fee),
+        ('Added', Customer.created_date),
+    ], joins=[(User, Customer.staff_id == User.id)], staff_column=Customer.staff_id),
+    'loans': ExportDataset('Loans', Loan, Loan.loan_date, [
+        ('Customer', Loan.customer_name), ('Amount', Loan.amount), ('Interest %', Loan.interest),
+        ('Service Charge', Loan.service_charge), ('Installments', Loan.installment_count),
+        ('Installment Amount', Loan.installment_amount), ('Type', Loan.installment_type),
+        ('Loan Date', Loan.loan_date), ('Due Date', Loan.due_date), ('Status', Loan.status), ('Staff', User.name),
+    ], joins=[(User, Loan.staff_id == User.id)], staff_column=Loan.staff_id),
+    'loan_collections': ExportDataset('Loan Collections', LoanCollection, LoanCollection.collection_date, [
+        ('Customer', Customer.name), ('Amount', LoanCollection.amount),
+        ('Date', LoanCollection.collection_date), ('Staff', User.name),
+    ], joins=[(Customer, LoanCollection.customer_id == Customer.id), (User, LoanCollection.staff_id == User.id)],
+        staff_column=LoanCollection.staff_id),
+    'saving_collections': ExportDataset('Savings Collections', SavingCollection, SavingCollection.collection_date, [
+        ('Customer', Customer.name), ('Amount', SavingCollection.amount),
+        ('Date', SavingCollection.collection_date), ('Staff', User.name),
+    ], joins=[(Customer, SavingCollection.customer_id == Customer.id), (User, SavingCollection.staff_id == User.id)],
+        staff_column=SavingCollection.staff_id),
+    'withdrawals': ExportDataset('Withdrawals', Withdrawal, Withdrawal.date, [
+        ('Date', Withdrawal.date), ('Type', Withdrawal.withdrawal_type), ('Customer', Customer.name),
+        ('Member No', Customer.member_no), ('Investor', Withdrawal.investor_name),
+        ('Amount', Withdrawal.amount), ('Note', Withdrawal.note),
+    ], joins=[(Customer, Withdrawal.customer_id == Customer.id)], admin_only=True),
+    'expenses': ExportDataset('Expenses', Expense, Expense.date, [
+        ('Date', Expense.date), ('Category', Expense.category),
+        ('Amount', Expense.amount), ('Description', Expense.description),
+    ], admin_only=True),
+}
+
+MONTHLY_REPORT_HEADER = ['Day', 'Savings', 'Installments', 'Admission Fee', 'Service Charge', 'Capital + Savings',
+                         'Loan Given', 'Interest', 'Loan With Interest', 'Savings Return', 'Expenses',
+                         'Total Expense', 'Balance']
+
+
+def monthly_report_rows(year, month):
+    daily_data, last_day = monthly_daily_totals(year, month)
+    for day in range(1, last_day + 1):
+        d = daily_data[day]
+        yield [day, d['savings'], d['installments'], d['admission_fee'], d['service_charge'], d['capital_savings'],
+               d['loan_given'], d['interest'], d['loan_with_interest'], d['savings_return'], d['expenses'],
+               d['total_expense'], d['balance']]
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return value
+
+
+def csv_stream(rows):
+    """Encode ``rows`` as CSV, yielding one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkSink:
+    # Write-only file object: zipfile falls back to streaming mode (data
+    # descriptors, no seeking) and we hand out whatever it wrote so far.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def _xlsx_row(row):
+    cells = []
+    for value in row:
+        if value is None:
+            cells.append('<c/>')
+        elif isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def xlsx_stream(sheet_name, rows):
+    """Encode ``rows`` as a single-sheet XLSX workbook, streamed batch by batch.
+
+    Memory stays bounded by one batch of rows plus the deflate window.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in _XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets></workbook>'))
+        yield sink.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if count % BATCH_SIZE == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def stream_rows(fmt, title, header, rows):
+    """Return a chunk generator for ``header`` + ``rows`` in CSV or XLSX."""
+    all_rows = itertools.chain([header], rows)
+    if fmt == 'xlsx':
+        return xlsx_stream(title, all_rows)
+    return csv_stream(all_rows)
@@ -0,0 +1,90 @@
+"""The logged-in user without a ``user`` table lookup per request.
+
+Routes only read ``current_user.id``, ``.name`` and ``.role``, so the user
+loader hands out a small ``Identity`` instead of the ``User`` row. It comes
+from a process-local LRU/TTL cache, or else from a copy of those fields
+kept in the signed session cookie. Either source is trusted for
+``IDENTITY_CACHE_TTL`` seconds after the database was last checked; then
+the next request reads the user again (so a deleted user is logged out).
+
+``forget()`` drops a user from this process's cache and rejects the
+session copies checked before it, for when a staff member is edited or
+deleted. Other gunicorn workers notice within the TTL.
+"""
+from flask import session
+from flask_login import UserMixin
+from models.user_model import db, User
+from services.cache import TTLCache
+import time
+import config
+
+SESSION_KEY = '_identity'
+
+identity_cache = TTLCache(ttl=config.IDENTITY_CACHE_TTL, maxsize=4096)
+
+
+class Identity(UserMixin):
+    """The fields of a ``User`` the routes and templates use."""
+
+    def __init__(self, id, name, email, role):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+
+    @classmethod
+    def of(cls, user):
+        return cls(user.id, user.name, user.email, user.role)
+
+
+def remember(user):
+    """Store ``user``'s identity in the session (call on login)."""
+    identity = Identity.of(user)
+    session[SESSION_KEY] = {'id': identity.id, 'name': identity.name, 'email': identity.email,
+                            'role': identity.role, 'checked': time.time()}
+    identity_cache.set(('identity', identity.id), identity)
+    return identity
+
+
+def _from_session(user_id):
+    """``(identity, seconds it stays trusted)`` from the session copy, or None."""
+    stamp = session.get(SESSION_KEY)
+    if not stamp or stamp.get('id') != user_id:
+        return None
+    checked = stamp.get('checked', 0)
+    revoked = identity_cache.get(('revoked', user_id))
+    remaining = config.IDENTITY_CACHE_TTL - (time.time() - checked)
+    if remaining <= 0 or (revoked and checked <= revoked):
+        return None
+    return Identity(stamp['id'], stamp['name'], stamp.get('email'), stamp['role']), remaining
+
+
+def load(user_id):
+    """Identity of ``user_id`` for Flask-Login's user loader; None if the
+    user no longer exists."""
+    user_id = int(user_id)
+    identity = identity_cache.get(('identity', user_id))
+    if identity is not None:
+        return identity
+    cached = _from_session(user_id)
+    if cached is not None:
+        identity, remaining = cached
+        # Only for what is left of the TTL, so the database is still checked in time
+        identity_cache.set(('identity', user_id), identity, ttl=remaining)
+        return identity
+    user = db.session.get(User, user_id)
+    if user is None:
+        session.pop(SESSION_KEY, None)
+        return None
+    return remember(user)
+
+
+def clear():
+    """Drop the session copy (call on logout)."""
+    session.pop(SESSION_KEY, None)
+
+
+def forget(user_id):
+    """Make the next request of ``user_id`` re-read the user."""
+    identity_cache.invalidate(('identity', user_id))
+    identity_cache.set(('revoked', user_id), time.time())
@@ -0,0 +1,134 @@
+from models.user_model import db
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from models.investment_model import Investment
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from models.money import Money
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, date
+
+LEDGER_FIELDS = ('loan_collected', 'saving_collected', 'loan_given', 'interest', 'service_charge',
+                 'admission_fee', 'expenses', 'withdrawals', 'investments')
+
+# (date column, staff column, {summary field: amount expression}) for every money-moving table.
+# Tables without a staff column are booked against the office row (staff_id NULL).
+LEDGER_SOURCES = [
+    (LoanCollection.collection_date, LoanCollection.staff_id, {'loan_collected': LoanCollection.amount}),
+    (SavingCollection.collection_date, SavingCollection.staff_id, {'saving_collected': SavingCollection.amount}),
+    (Loan.loan_date, Loan.staff_id, {'loan_given': Loan.amount,
+                                     # rounded to the paisa per loan, like add_loan does
+                                     'interest': db.func.round(Loan.amount * Loan.interest / 100, type_=Money),
+                                     'service_charge': Loan.service_charge}),
+    (Customer.created_date, Customer.staff_id, {'admission_fee': Customer.admission_fee}),
+    (Expense.date, None, {'expenses': Expense.amount}),
+    (Withdrawal.date, None, {'withdrawals': Withdrawal.amount}),
+    (Investment.date, None, {'investments': Investment.amount}),
+]
+
+
+def _as_date(value):
+    # SQLite returns DATE() as 'YYYY-MM-DD' text, Postgres as a date object
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def record(staff_id=None, when=None, **amounts):
+    """Add ``amounts`` to the summary row of (day, staff) in the current transaction.
+
+    One ``INSERT ... ON CONFLICT DO UPDATE`` that adds in SQL, so concurrent
+    writers neither lose each other's increments nor race to create the
+    day's row. ``when`` defaults to now in UTC, matching the
+    ``datetime.utcnow`` defaults of the transaction tables. The caller is
+    responsible for committing.
+    """
+    day = (when or datetime.utcnow()).date()
+    values = {field: amount or 0 for field, amount in amounts.items()}
+    insert = (postgresql if db.engine.dialect.name == 'postgresql' else sqlite).insert(DailyLedgerSummary).values(
+        date=day, staff_id=staff_id, updated_date=datetime.utcnow(), **{**dict.fromkeys(LEDGER_FIELDS, 0), **values})
+    if staff_id is None:
+        target = dict(index_elements=['date'], index_where=DailyLedgerSummary.staff_id.is_(None))
+    else:
+        target = dict(index_elements=['date', 'staff_id'])
+    increments = {field: db.func.coalesce(getattr(DailyLedgerSummary, field), 0) + getattr(insert.excluded, field)
+                  for field in values}
+    db.session.execute(insert.on_conflict_do_update(**target, set_=dict(increments, updated_date=insert.excluded.updated_date)))
+
+
+def rebuild(start=None, end=None):
+    """Recompute the summary rows from the transaction tables.
+
+    ``start``/``end`` are dates bounding a half-open [start, end) range; without
+    them the whole history is rebuilt. Returns the number of rows written.
+    """
+    buckets = {}
+    for date_column, staff_column, fields in LEDGER_SOURCES:
+        day = db.func.date(date_column)
+        group = [day] + ([staff_column] if staff_column is not None else [])
+        sums = [db.func.coalesce(db.func.sum(expr), 0) for expr in fields.values()]
+        query = db.session.query(*group, *sums)
+        if start:
+            query = query.filter(date_column >= datetime.combine(start, datetime.min.time()))
+        if end:
+            query = query.filter(date_column < datetime.combine(end, datetime.min.time()))
+        for row in query.group_by(*group).all():
+            staff_id = row[1] if staff_column is not None else None
+            values = row[len(group):]
+            bucket = buckets.setdefault((_as_date(row[0]), staff_id), dict.fromkeys(LEDGER_FIELDS, 0))
+            for field, value in zip(fields, values):
+                bucket[field] += value
+
+    delete_query = DailyLedgerSummary.query
+    if start:
+        delete_query = delete_query.filter(DailyLedgerSummary.date >= start)
+    if end:
+        delete_query = delete_query.filter(DailyLedgerSummary.date < end)
+    delete_query.delete(synchronize_session=False)
+
+    db.session.bulk_insert_mappings(DailyLedgerSummary, [
+        dict(date=day, staff_id=staff_id, **values) for (day, staff_id), values in buckets.items()
+    ])
+    db.session.commit()
+    return len(buckets)
+
+
+def daily_totals(start, end, staff_id=None):
+    """Sum the summary rows per day for the half-open date range [start, end).
+
+    Returns ``{date: {field: amount}}`` for the days that have activity.
+    """
+    sums = [db.func.coalesce(db.func.sum(getattr(DailyLedgerSummary, field)), 0) for field in LEDGER_FIELDS]
+    query = db.session.query(DailyLedgerSummary.date, *sums).filter(
+        DailyLedgerSummary.date >= start, DailyLedgerSummary.date < end)
+    if staff_id:
+        query = query.filter_by(staff_id=staff_id)
+    rows = query.group_by(DailyLedgerSummary.date).all()
+    return {_as_date(row[0]): dict(zip(LEDGER_FIELDS, row[1:])) for row in rows}
+
+
+def period_totals(start, end, staff_id=None):
+    """Sum the summary rows over the half-open date range [start, end)."""
+    sums = [db.func.coalesce(db.func.sum(getattr(DailyLedgerSummary, field)), 0) for field in LEDGER_FIELDS]
+    query = db.session.query(*sums).filter(DailyLedgerSummary.date >= start, DailyLedgerSummary.date < end)
+    if staff_id:
+        query = query.filter_by(staff_id=staff_id)
+    return dict(zip(LEDGER_FIELDS, query.one()))
+
+
+def monthly_totals(start, end, staff_id=None):
+    """Sum the summary rows per calendar month over [start, end).
+
+    Returns ``{(year, month): {field: amount}}`` for the months with activity.
+    """
+    year = db.extract('year', DailyLedgerSummary.date)
+    month = db.extract('month', DailyLedgerSummary.date)
+    sums = [db.func.coalesce(db.func.sum(getattr(DailyLedgerSummary, field)), 0) for field in LEDGER_FIELDS]
+    query = db.session.query(year, month, *sums).filter(DailyLedgerSummary.date >= start, DailyLedgerSummary.date < end)
+    if staff_id:
+        query = query.filter_by(staff_id=staff_id)
+    rows = query.group_by(year, month).all()
+    return {(int(row[0]), int(row[1])): dict(zip(LEDGER_FIELDS, row[2:])) for row in rows}
@@ -0,0 +1,176 @@
+"""Per-loan balances and the link between loans, customers and collections.
+
+``Loan.outstanding`` starts at the loan total and is decremented by every
+collection with an in-database ``outstanding - amount`` UPDATE, so balances
+are maintained incrementally rather than recomputed from the history.
+"""
+from models.user_model import db
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.loan_installment_model import LoanInstallment
+from services import cash_service, ledger_service, schedule_service
+from models.money import to_money, percent
+from datetime import datetime
+
+BACKFILL_BATCH = 500
+
+
+def loan_total(loan):
+    """Principal plus interest plus service charge: what the customer repays."""
+    return to_money(loan.amount) + percent(loan.amount, loan.interest) + to_money(loan.service_charge)
+
+
+def open_loans(customer_ids):
+    """Pending loans with a balance, per customer, oldest first (one query)."""
+    loans = {}
+    for loan in Loan.query.filter(Loan.customer_id.in_(customer_ids), Loan.status == 'Pending',
+                                  Loan.outstanding > 0).order_by(Loan.customer_id, Loan.loan_date, Loan.id):
+        loans.setdefault(loan.customer_id, []).append(loan)
+    return loans
+
+
+def apply_collections(amounts_by_customer, when=None):
+    """Book loan collections against each customer's oldest open loans.
+
+    Decrements ``Loan.outstanding`` (spilling over into the next loan when
+    one is paid off), marks fully repaid loans as Paid and allocates the
+    amounts to the installment schedules. Returns ``{customer_id: loan_id}``
+    of the loan each collection belongs to (the first one it was applied
+    to; None for customers without an open loan). The caller commits.
+    """
+    amounts = {customer_id: amount for customer_id, amount in amounts_by_customer.items() if amount > 0}
+    if not amounts:
+        return {}
+    loans = open_loans(list(amounts))
+    loan_ids, touched = {}, []
+    for customer_id, amount in amounts.items():
+        left = amount
+        loan_ids[customer_id] = None
+        for loan in loans.get(customer_id, []):
+            if left <= 0:
+                break
+            applied = min(left, loan.outstanding)
+            if loan_ids[customer_id] is None:
+                loan_ids[customer_id] = loan.id
+            loan.outstanding = Loan.outstanding - applied
+            touched.append(loan.id)
+            left -= applied
+    if touched:
+        # Decide Paid on the balance after this allocation, which a concurrent
+        # collection may have lowered since the loans were read
+        db.session.flush()
+        Loan.query.filter(Loan.id.in_(touched), Loan.outstanding <= 0).update(
+            {Loan.status: 'Paid'}, synchronize_session='fetch')
+    schedule_service.allocate(amounts, when=when)
+    return loan_ids
+
+
+def apply_collection(customer_id, amount, when=None):
+    """Single-customer apply_collections; returns the loan id or None."""
+    return apply_collections({customer_id: amount}, when=when).get(customer_id)
+
+
+def update_terms(loan, amount, interest):
+    """Change a loan's amount/interest, keeping what was already repaid.
+
+    The change in what the customer repays goes to the customer's totals and
+    the open installments, the change in principal and interest to the cash
+    ledger and the daily ledger summary of the loan date, as add_loan books
+    them. The caller commits.
+    """
+    old_total, old_amount, old_interest = loan_total(loan), to_money(loan.amount), percent(loan.amount, loan.interest)
+    repaid = old_total - (loan.outstanding or 0)
+    loan.amount = amount
+    loan.interest = interest
+    loan.outstanding = max(loan_total(loan) - repaid, 0)
+    change = loan_total(loan) - old_total
+    if change and loan.customer:
+        loan.customer.total_loan += change
+        loan.customer.remaining_loan += change
+    if change or old_amount != to_money(amount):
+        cash_service.record(old_amount - to_money(amount), 'loan_disbursement', staff_id=loan.staff_id,
+                            note=f'{loan.customer_name} (loan edited)')
+        ledger_service.record(loan.staff_id, when=loan.loan_date, loan_given=to_money(amount) - old_amount,
+                              interest=percent(amount, interest) - old_interest)
+    schedule_service.resize(loan)
+
+
+def settle(loan):
+    """Mark a loan as paid by hand and close its schedule."""
+    loan.status = 'Paid'
+    loan.outstanding = 0
+    schedule_service.close_loan(loan.id)
+
+
+def _link_customers_by_name():
+    # Legacy loans only carry customer_name: link those whose name matches
+    # exactly one customer, then those unique within the loan's staff.
+    same_name = db.select(Customer.id).where(Customer.name == Loan.customer_name)
+    db.session.query(Loan).filter(
+        Loan.customer_id.is_(None),
+        db.select(db.func.count(Customer.id)).where(Customer.name == Loan.customer_name).scalar_subquery() == 1,
+    ).update({Loan.customer_id: same_name.scalar_subquery()}, synchronize_session=False)
+    same_staff = db.and_(Customer.name == Loan.customer_name, Customer.staff_id == Loan.staff_id)
+    db.session.query(Loan).filter(
+        Loan.customer_id.is_(None),
+        db.select(db.func.count(Customer.id)).where(same_staff).scalar_subquery() == 1,
+    ).update({Loan.customer_id: db.select(Customer.id).where(same_staff).scalar_subquery()}, synchronize_session=False)
+    db.session.commit()
+
+
+def backfill():
+    """Link legacy loans to customers and collections to loans.
+
+    Per customer, the collections are replayed oldest first against the
+    loans oldest first, which sets ``LoanCollection.loan_id`` and
+    ``Loan.outstanding``. Loans without an installment schedule get one,
+    with the replayed amounts allocated to it. Runs in batches of customers.
+    Returns the number of loans linked to a customer.
+    """
+    _link_customers_by_name()
+    customer_ids = [cid for (cid,) in db.session.query(Loan.customer_id).filter(
+        Loan.customer_id.isnot(None)).distinct().order_by(Loan.customer_id)]
+    scheduled = {loan_id for (loan_id,) in db.session.query(LoanInstallment.loan_id).distinct()}
+
+    for offset in range(0, len(customer_ids), BACKFILL_BATCH):
+        batch = customer_ids[offset:offset + BACKFILL_BATCH]
+        customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(batch))}
+        loans = {}
+        for loan in Loan.query.filter(Loan.customer_id.in_(batch)).order_by(Loan.customer_id, Loan.loan_date, Loan.id):
+            loan.outstanding = loan_total(loan)
+            loans.setdefault(loan.customer_id, []).append(loan)
+            if loan.id not in scheduled:
+                schedule_service.generate(loan, customers[loan.customer_id], loan_total(loan))
+                if loan.status == 'Paid':
+                    schedule_service.close_loan(loan.id)
+
+        # Amounts that went to pending loans whose schedules were just generated
+        collected = {}
+        for collection in LoanCollection.query.filter(LoanCollection.customer_id.in_(batch)).order_by(
+                LoanCollection.customer_id, LoanCollection.collection_date, LoanCollection.id):
+            left = collection.amount
+            collection.loan_id = None
+            for loan in loans.get(collection.customer_id, []):
+                if left <= 0:
+                    break
+                if loan.outstanding <= 0:
+                    continue
+                applied = min(left, loan.outstanding)
+                if collection.loan_id is None:
+                    collection.loan_id = loan.id
+                loan.outstanding -= applied
+                left -= applied
+                if loan.status != 'Paid' and loan.id not in scheduled:
+                    collected[collection.customer_id] = collected.get(collection.customer_id, 0) + applied
+            if collection.loan_id is None and loans.get(collection.customer_id):
+                collection.loan_id = loans[collection.customer_id][-1].id
+        for customer_loans in loans.values():
+            for loan in customer_loans:
+                if loan.status == 'Paid':
+                    loan.outstanding = 0
+
+        db.session.flush()
+        schedule_service.allocate(collected, when=datetime.utcnow())
+        db.session.commit()
+    return db.session.query(db.func.count(Loan.id)).filter(Loan.customer_id.isnot(None)).scalar()
@@ -0,0 +1,252 @@
+"""Per-request SQL and timing instrumentation.
+
+Every request records its latency in a per-endpoint histogram, together
+with the number of SQL statements it ran and the time spent in them
+(SQLAlchemy cursor events). Requests slower than ``METRICS_SLOW_REQUEST_MS``
+are kept in a bounded slow log with their most expensive statements,
+grouped by SQL text so an N+1 loop shows up as one statement run N times.
+Endpoints listed in ``METRICS_PROFILE_ENDPOINTS`` are run under cProfile
+for a sample of their requests; the last profile of each is kept.
+
+The numbers live in the process, so under gunicorn each worker reports its
+own share of the traffic.
+"""
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import deque
+from datetime import datetime
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import config
+
+# Upper bounds (seconds) of the latency histogram buckets, as in Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PROFILE_LINES = 40
+
+_lock = threading.Lock()
+_endpoints = {}
+_slow_log = deque(maxlen=config.METRICS_SLOW_LOG_SIZE)
+_profiles = {}
+# cProfile can only trace one request at a time
+_profile_lock = threading.Lock()
+_started = datetime.now()
+
+
+class _RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = {}
+        self.status = 500
+        self.profiler = None
+
+    def add_statement(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        entry = self.statements.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def _current():
+    return g.get('_metrics') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get('_query_started')
+    if not stack:
+        return
+    started = stack.pop()
+    metrics = _current()
+    if metrics is not None:
+        metrics.add_statement(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_query_started'):
+        conn.info['_query_started'].pop()
+
+
+def _start_request():
+    metrics = g._metrics = _RequestMetrics()
+    if (request.endpoint in config.METRICS_PROFILE_ENDPOINTS
+            and random.random() < config.METRICS_PROFILE_SAMPLE_RATE
+            and _profile_lock.acquire(blocking=False)):
+        metrics.profiler = cProfile.Profile()
+        try:
+            metrics.profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, say) is active in this process
+            metrics.profiler = None
+            _profile_lock.release()
+
+
+def _set_status(response):
+    metrics = _current()
+    if metrics is not None:
+        metrics.status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    metrics = g.pop('_metrics', None)
+    if metrics is None:
+        return
+    elapsed = time.perf_counter() - metrics.started
+    endpoint = request.endpoint or 'unknown'
+    if metrics.profiler is not None:
+        metrics.profiler.disable()
+        _profile_lock.release()
+        _store_profile(endpoint, metrics.profiler, elapsed)
+    _record(endpoint, metrics, elapsed, error=exc is not None or metrics.status >= 500)
+    if elapsed * 1000 >= config.METRICS_SLOW_REQUEST_MS:
+        _log_slow(endpoint, metrics, elapsed)
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_set_status)
+    # Teardown runs after a streamed response has been fully sent
+    app.teardown_request(_finish_request)
+
+
+def _record(endpoint, metrics, elapsed, error):
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                            'queries': 0, 'max_queries': 0, 'db_seconds': 0.0,
+                                            'buckets': [0] * len(BUCKETS)}
+        stats['count'] += 1
+        stats['errors'] += bool(error)
+        stats['seconds'] += elapsed
+        stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+        stats['queries'] += metrics.queries
+        stats['max_queries'] = max(stats['max_queries'], metrics.queries)
+        stats['db_seconds'] += metrics.db_time
+        for index, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                stats['buckets'][index] += 1
+                break
+
+
+def _log_slow(endpoint, metrics, elapsed):
+    top = sorted(metrics.statements.items(), key=lambda item: item[1][1], reverse=True)[:config.METRICS_TOP_STATEMENTS]
+    entry = {
+        'time': datetime.now(),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': endpoint,
+        'status': metrics.status,
+        'ms': elapsed * 1000,
+        'queries': metrics.queries,
+        'db_ms': metrics.db_time * 1000,
+        'statements': [{'count': count, 'ms': seconds * 1000, 'sql': statement}
+                       for statement, (count, seconds) in top],
+    }
+    with _lock:
+        _slow_log.appendleft(entry)
+
+
+def _store_profile(endpoint, profiler, elapsed):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    with _lock:
+        _profiles[endpoint] = {'time': datetime.now(), 'path': request.full_path.rstrip('?'),
+                               'ms': elapsed * 1000, 'report': out.getvalue()}
+
+
+def quantile(stats, q):
+    """Upper bound (seconds) of the bucket holding the ``q`` quantile, or
+    None when it is above the last bucket."""
+    rank, seen = q * stats['count'], 0
+    for bound, count in zip(BUCKETS, stats['buckets']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return None
+
+
+def endpoint_stats():
+    """Per-endpoint totals, slowest on average first."""
+    with _lock:
+        rows = [dict(stats, endpoint=endpoint, buckets=list(stats['buckets'])) for endpoint, stats in _endpoints.items()]
+    for row in rows:
+        row['mean_ms'] = row['seconds'] / row['count'] * 1000
+        row['mean_queries'] = row['queries'] / row['count']
+        row['mean_db_ms'] = row['db_seconds'] / row['count'] * 1000
+        row['p50'], row['p95'] = quantile(row, 0.5), quantile(row, 0.95)
+    return sorted(rows, key=lambda row: row['mean_ms'], reverse=True)
+
+
+def slow_requests():
+    with _lock:
+        return list(_slow_log)
+
+
+def profiles():
+    with _lock:
+        return dict(_profiles)
+
+
+def started():
+    return _started
+
+
+def reset():
+    global _started
+    with _lock:
+        _endpoints.clear()
+        _slow_log.clear()
+        _profiles.clear()
+        _started = datetime.now()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(caches=None):
+    """The metrics in the Prometheus text exposition format."""
+    with _lock:
+        endpoints = {endpoint: dict(stats, buckets=list(stats['buckets'])) for endpoint, stats in _endpoints.items()}
+    lines = ['# HELP ngo_request_duration_seconds Request latency by endpoint.',
+             '# TYPE ngo_request_duration_seconds histogram']
+    for endpoint, stats in sorted(endpoints.items()):
+        label, cumulative = _label(endpoint), 0
+        for bound, count in zip(BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(f'ngo_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'ngo_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'ngo_request_duration_seconds_sum{{endpoint="{label}"}} {stats["seconds"]:.6f}')
+        lines.append(f'ngo_request_duration_seconds_count{{endpoint="{label}"}} {stats["count"]}')
+
+    counters = [('ngo_request_errors_total', 'Requests that failed with a 5xx status.', 'errors', '{}'),
+                ('ngo_db_queries_total', 'SQL statements run by requests.', 'queries', '{}'),
+                ('ngo_db_seconds_total', 'Time requests spent in SQL statements.', 'db_seconds', '{:.6f}')]
+    for name, help_text, key, number in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{{endpoint="{_label(endpoint)}"}} {number.format(stats[key])}'
+                  for endpoint, stats in sorted(endpoints.items())]
+
+    if caches:
+        cache_stats = {name: cache.stats() for name, cache in caches.items()}
+        for key, kind in (('hits', 'counter'), ('misses', 'counter'), ('invalidations', 'counter'), ('size', 'gauge')):
+            name = f'ngo_cache_{key}' + ('_total' if kind == 'counter' else '')
+            lines += [f'# HELP {name} Cache {key}.', f'# TYPE {name} {kind}']
+            lines += [f'{name}{{cache="{_label(cache)}"}} {stats[key]}' for cache, stats in sorted(cache_stats.items())]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,217 @@
+from models.user_model import db
+from models.schema_migration_model import SchemaMigration
+from models.money import Money
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from models.cash_balance_model import CashBalance
+from models.cash_ledger_entry_model import CashLedgerEntry
+from services import cash_service, ledger_service, loan_service, reconcile_service, search_service
+from datetime import timedelta
+import contextlib
+from sqlalchemy import Integer, inspect, text
+
+
+def _create_declared_indexes():
+    # Indexes declared in the models' __table_args__; create_all() only adds
+    # them for brand-new tables, so existing databases need this step.
+    # Indexes on columns a later migration adds are skipped until it runs.
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {column.name for column in index.columns} <= existing:
+                index.create(db.engine, checkfirst=True)
+
+
+def _add_column(table, column, ddl):
+    # create_all() never alters existing tables; add the column if it is missing
+    if column not in {c['name'] for c in inspect(db.engine).get_columns(table)}:
+        with db.engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def _add_cash_checkpoint():
+    # The existing CashBalance.balance becomes the checkpoint of an empty ledger
+    _add_column('cash_balance', 'last_entry_id', 'INTEGER DEFAULT 0')
+    with db.engine.begin() as conn:
+        conn.execute(text('UPDATE cash_balance SET last_entry_id = 0 WHERE last_entry_id IS NULL'))
+
+
+def _require(version):
+    # For a migration that needs a later one applied first; reported like
+    # the ones run_migrations applies in order
+    if version not in applied_versions():
+        _apply(version, _echo)
+
+
+def _link_loans():
+    # The backfill computes in paisa and loads customers, loans and
+    # collections through the ORM, so older databases get those migrations first
+    _require(MONEY_VERSION)
+    _require(SYNC_VERSION)
+    _require(LOAN_STAMP_VERSION)
+    _add_column('loans', 'customer_id', 'INTEGER REFERENCES customers(id)')
+    _add_column('loans', 'outstanding', 'BIGINT DEFAULT 0')
+    _add_column('loan_collections', 'loan_id', 'INTEGER REFERENCES loans(id)')
+    _create_declared_indexes()
+    loan_service.backfill()
+
+
+def _install_search():
+    _create_declared_indexes()
+    search_service.install()
+
+
+def _add_sync_columns():
+    _add_column('customers', 'updated_at', 'TIMESTAMP')
+    _add_column('loan_collections', 'client_ref', 'VARCHAR(36)')
+    _add_column('saving_collections', 'client_ref', 'VARCHAR(36)')
+    _create_declared_indexes()
+
+
+def _unique_office_ledger_rows():
+    # Racing first writes of a day could add a second office row; rebuild
+    # those days from the transactions before the unique index goes on
+    days = [day for (day,) in db.session.query(DailyLedgerSummary.date).filter(
+        DailyLedgerSummary.staff_id.is_(None)).group_by(DailyLedgerSummary.date).having(db.func.count() > 1)]
+    for day in days:
+        ledger_service.rebuild(day, day + timedelta(days=1))
+    _create_declared_indexes()
+
+
+def _open_cash_ledger():
+    # Before the cash ledger, add_loan took the welfare fee into cash without
+    # storing it on the loan, and 'subtract' only lowered cash_balance. No row
+    # explains that part of the balance the migration 2 checkpoint carries, so
+    # it is booked as one opening entry the checkpoint gives up; the cash in
+    # hand stays the same. Databases started on the ledger carry no legacy
+    # balance and get nothing.
+    _require(CHECKPOINT_FLAG_VERSION)
+    record_row = CashBalance.query.order_by(CashBalance.id).first()
+    if not record_row:
+        return
+    folded = db.session.query(db.func.coalesce(db.func.sum(CashLedgerEntry.amount), 0)).filter(
+        CashLedgerEntry.checkpointed).scalar()
+    if record_row.balance == folded:
+        return
+    recorded, expected = reconcile_service.cash_drift()
+    opening = recorded - expected
+    if opening:
+        cash_service.record(opening, reconcile_service.OPENING_BALANCE, note='Cash history from before the cash ledger')
+        record_row.balance -= opening
+        db.session.commit()
+
+
+def _add_loan_updated_at():
+    _add_column('loans', 'updated_at', 'TIMESTAMP')
+
+
+def _flag_checkpointed_entries():
+    # Entries a transaction commits after the checkpoint passed their id were
+    # never folded; each entry now says whether it is in the checkpoint.
+    # What the id-based checkpoint folded is marked as such.
+    _add_column('cash_ledger_entries', 'checkpointed', 'BOOLEAN NOT NULL DEFAULT FALSE')
+    with db.engine.begin() as conn:
+        conn.execute(text('UPDATE cash_ledger_entries SET checkpointed = TRUE WHERE id <= '
+                          '(SELECT coalesce(max(last_entry_id), 0) FROM cash_balance)'))
+    _create_declared_indexes()
+
+
+def _convert_money():
+    # Float taka -> integer paisa in every Money column. Postgres also gets
+    # BIGINT columns; SQLite keeps the declared FLOAT and stores whole numbers
+    # in it. Columns already created as BIGINT (new tables) hold paisa.
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {c['name']: c['type'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if not isinstance(column.type, Money) or column.name not in existing or isinstance(existing[column.name], Integer):
+                    continue
+                if db.engine.dialect.name == 'postgresql':
+                    conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BIGINT '
+                                      f'USING CAST(round({column.name} * 100) AS BIGINT)'))
+                else:
+                    conn.execute(text(f'UPDATE {table.name} SET {column.name} = round({column.name} * 100)'))
+
+
+# (version, description, upgrade function) in the order they must run.
+# Append new entries at the end; never renumber or edit applied ones.
+MIGRATIONS = [
+    (1, 'Add composite indexes on hot filter columns', _create_declared_indexes),
+    (2, 'Turn cash_balance into a checkpoint of the cash ledger', _add_cash_checkpoint),
+    (3, 'Link loans to customers and collections to loans, backfill per-loan balances', _link_loans),
+    (4, 'Add the member search index', _install_search),
+    (5, 'Store money amounts as integer paisa', _convert_money),
+    (6, 'Add idempotency keys and change tracking for offline sync', _add_sync_columns),
+    (7, 'Allow one office row per day in the daily ledger summary', _unique_office_ledger_rows),
+    (8, 'Book the cash history from before the cash ledger as an opening entry', _open_cash_ledger),
+    (9, 'Track when loans change, for the report data version', _add_loan_updated_at),
+    (10, 'Mark the cash ledger entries folded into the checkpoint', _flag_checkpointed_entries),
+]
+MONEY_VERSION = 5
+SYNC_VERSION = 6
+LOAN_STAMP_VERSION = 9
+CHECKPOINT_FLAG_VERSION = 10
+
+# Postgres advisory lock key held while migrating; any constant unique to this app
+MIGRATION_LOCK_KEY = 4270513
+
+# The reporting function of the run in progress, for migrations applied early
+_echo = None
+
+
+def applied_versions():
+    return {version for (version,) in db.session.query(SchemaMigration.version).all()}
+
+
+def _apply(version, echo=None):
+    description, upgrade = next((d, u) for v, d, u in MIGRATIONS if v == version)
+    if echo:
+        echo(f'Applying migration {version}: {description}')
+    upgrade()
+    db.session.add(SchemaMigration(version=version, description=description))
+    db.session.commit()
+
+
+@contextlib.contextmanager
+def _migration_lock():
+    # The web service and the report worker both migrate on start. On
+    # Postgres the second waits here and then finds nothing left to apply.
+    # A SQLite database is local to one machine and its app.
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            conn.commit()
+
+
+def run_migrations(echo=None):
+    """Bring the database schema up to date.
+
+    New tables are created from the models, then every migration that has
+    not been recorded in ``schema_migrations`` runs once, in order. Processes
+    migrating the same Postgres database at once take turns. Returns the
+    list of versions that were applied.
+    """
+    global _echo
+    with _migration_lock():
+        db.create_all()
+        before = applied_versions()
+        _echo = echo
+        try:
+            for version, description, upgrade in MIGRATIONS:
+                # Re-read each time: a migration may apply one it depends on
+                if version not in applied_versions():
+                    _apply(version, echo)
+        finally:
+            _echo = None
+        return sorted(applied_versions() - before)
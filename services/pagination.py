@@ -0,0 +1,103 @@
+from flask import request, url_for
+from sqlalchemy import and_, or_
+from datetime import datetime
+import base64
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list, newest rows first."""
+
+    def __init__(self, items, per_page, cursor, next_cursor, cursor_arg):
+        self.items = items
+        self.per_page = per_page
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.cursor_arg = cursor_arg
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def _url(self, cursor):
+        args = request.args.to_dict()
+        args.pop(self.cursor_arg, None)
+        if cursor:
+            args[self.cursor_arg] = cursor
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.has_next else None
+
+    @property
+    def first_url(self):
+        return self._url(None)
+
+
+def encode_cursor(date_value, id_value):
+    # A row without a date has an empty date part
+    raw = f'{date_value.isoformat() if date_value is not None else ""}|{id_value}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(date or None, id)`` from a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date_part, id_part = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(date_part) if date_part else None), int(id_part)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def page_size(value=None):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def keyset_paginate(query, date_column, id_column, cursor=None, per_page=None, cursor_arg='cursor'):
+    """Fetch one page of ``query`` ordered by ``(date_column, id_column)`` descending.
+
+    Instead of an OFFSET the next page starts strictly after the last row of
+    the current one, so every page is an indexed range scan no matter how
+    deep the user browses. Rows without a date (legacy or imported) come
+    after all dated ones, newest id first, on every database.
+    """
+    per_page = page_size(per_page)
+    query = query.order_by(None)
+    undated = query.filter(date_column.is_(None)).order_by(id_column.desc())
+    position = decode_cursor(cursor) if cursor else None
+    last_date, last_id = position or (None, None)
+    if position and last_date is None:
+        rows = undated.filter(id_column < last_id).limit(per_page + 1).all()
+    else:
+        dated = query.filter(date_column.isnot(None)).order_by(date_column.desc(), id_column.desc())
+        if position:
+            dated = dated.filter(or_(date_column < last_date,
+                                     and_(date_column == last_date, id_column < last_id)))
+        # The undated rows are always asked for, so a page runs the same
+        # statements however many rows come back
+        rows = dated.limit(per_page + 1).all()
+        rows += undated.limit(per_page + 1 - len(rows)).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, date_column.key), getattr(last, id_column.key))
+    return KeysetPage(rows, per_page, cursor if position else None, next_cursor, cursor_arg)
+
+
+def paginate_request(query, date_column, id_column, cursor_arg='cursor'):
+    """Paginate ``query`` with the cursor and ``per_page`` taken from the request."""
+    return keyset_paginate(query, date_column, id_column,
+                           cursor=request.args.get(cursor_arg),
+                           per_page=request.args.get('per_page', type=int),
+                           cursor_arg=cursor_arg)
@@ -0,0 +1,168 @@
+"""Reconciliation of the denormalized balances against the transaction tables.
+
+``Customer.total_loan``, ``remaining_loan`` and ``savings_balance`` and the
+cash in hand are updated in place by the routes. This recomputes them from
+the rows that should explain them, with one GROUP BY per source table joined
+onto the customers, and lists every balance that disagrees:
+
+* ``total_loan``      - sum of the customer's loans (principal, interest
+  rounded to the paisa per loan, service charge)
+* ``remaining_loan``  - that total minus the customer's loan collections
+* ``savings_balance`` - saving collections plus legacy ``savings`` deposits
+  minus savings withdrawals
+* cash in hand        - investments, collections and fees minus
+  disbursements, withdrawals and expenses, plus the manual adjustments
+  of the cash ledger and its opening entry for the history before it
+
+Legacy ``savings`` rows only carry a customer name; they are attributed when
+the name belongs to exactly one customer. Loans the link migration could not
+tie to a customer are not attributed at all. The balances of customers whose
+name matches such rows are reported as uncertain and never repaired.
+"""
+from models.user_model import db
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.saving_model import Saving
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from models.investment_model import Investment
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.money import Money
+from services import cash_service
+
+BALANCE_FIELDS = ('total_loan', 'remaining_loan', 'savings_balance')
+DIFF_HEADER = ['Member No', 'Name', 'Balance', 'Recorded', 'Expected', 'Difference']
+BATCH_SIZE = 1000
+
+# Cash in hand from before the cash ledger that no row explains, booked once by
+# the migration that opens the ledger on an existing balance
+OPENING_BALANCE = 'opening_balance'
+# Cash ledger entry types with no source row of their own
+ADJUSTMENT_TYPES = ('adjustment', OPENING_BALANCE)
+
+
+def _sums(column, key, *filters):
+    return db.session.query(key.label('customer_id'), db.func.sum(column).label('amount')).filter(
+        key.isnot(None), *filters).group_by(key).subquery()
+
+
+def _unique_names():
+    return db.select(Customer.name).group_by(Customer.name).having(db.func.count(Customer.id) == 1)
+
+
+def _ambiguous_deposits():
+    # Legacy deposits whose name matches several customers
+    return db.select(Saving.customer_name).where(Saving.customer_name.in_(
+        db.select(Customer.name).group_by(Customer.name).having(db.func.count(Customer.id) > 1)))
+
+
+def _unlinked_loans():
+    return db.select(Loan.customer_name).where(Loan.customer_id.is_(None))
+
+
+def expected_balances():
+    """Subquery of ``(customer_id, total_loan, remaining_loan, savings_balance,
+    loans_uncertain, savings_uncertain)`` recomputed for every customer."""
+    loan_total = Loan.amount + db.func.round(Loan.amount * Loan.interest / 100, type_=Money) + db.func.coalesce(Loan.service_charge, 0)
+    loans = _sums(loan_total, Loan.customer_id)
+    collected = _sums(LoanCollection.amount, LoanCollection.customer_id)
+    saved = _sums(SavingCollection.amount, SavingCollection.customer_id)
+    withdrawn = _sums(Withdrawal.amount, Withdrawal.customer_id, Withdrawal.withdrawal_type == 'savings')
+    deposited = db.session.query(Customer.id.label('customer_id'), db.func.sum(Saving.amount).label('amount')).join(
+        Saving, Saving.customer_name == Customer.name).filter(Customer.name.in_(_unique_names())).group_by(Customer.id).subquery()
+
+    zero = lambda column: db.func.coalesce(column, 0)
+    return db.session.query(
+        Customer.id.label('customer_id'),
+        zero(loans.c.amount).label('total_loan'),
+        (zero(loans.c.amount) - zero(collected.c.amount)).label('remaining_loan'),
+        (zero(saved.c.amount) + zero(deposited.c.amount) - zero(withdrawn.c.amount)).label('savings_balance'),
+        Customer.name.in_(_unlinked_loans()).label('loans_uncertain'),
+        Customer.name.in_(_ambiguous_deposits()).label('savings_uncertain'),
+    ).outerjoin(loans, loans.c.customer_id == Customer.id
+    ).outerjoin(collected, collected.c.customer_id == Customer.id
+    ).outerjoin(saved, saved.c.customer_id == Customer.id
+    ).outerjoin(withdrawn, withdrawn.c.customer_id == Customer.id
+    ).outerjoin(deposited, deposited.c.customer_id == Customer.id).subquery()
+
+
+def _off(expected, field):
+    return db.func.coalesce(getattr(Customer, field), 0) != getattr(expected.c, field)
+
+
+def _drifted(expected):
+    return db.or_(*[_off(expected, field) for field in BALANCE_FIELDS])
+
+
+def _repairable(expected):
+    return db.or_(db.and_(db.or_(_off(expected, 'total_loan'), _off(expected, 'remaining_loan')), db.not_(expected.c.loans_uncertain)),
+                  db.and_(_off(expected, 'savings_balance'), db.not_(expected.c.savings_uncertain)))
+
+
+def customer_drift():
+    """Query of the customers with at least one balance off, with the
+    recorded and the expected value of each balance."""
+    expected = expected_balances()
+    recorded = [db.func.coalesce(getattr(Customer, field), 0) for field in BALANCE_FIELDS]
+    return db.session.query(
+        Customer.id, Customer.member_no, Customer.name, *recorded,
+        *[getattr(expected.c, field) for field in BALANCE_FIELDS], expected.c.loans_uncertain, expected.c.savings_uncertain,
+    ).join(expected, expected.c.customer_id == Customer.id).filter(_drifted(expected)).order_by(Customer.id)
+
+
+def expected_cash():
+    """Cash in hand recomputed from the transaction tables, in one SELECT."""
+    total = lambda column, *filters: db.select(db.func.coalesce(db.func.sum(column), 0)).where(*filters).scalar_subquery()
+    inflow = (total(Investment.amount) + total(LoanCollection.amount) + total(SavingCollection.amount)
+              + total(Customer.admission_fee) + total(db.func.coalesce(Loan.service_charge, 0) + db.func.coalesce(Loan.welfare_fee, 0)))
+    outflow = total(Loan.amount) + total(Withdrawal.amount) + total(Expense.amount)
+    adjustments = total(CashLedgerEntry.amount, CashLedgerEntry.entry_type.in_(ADJUSTMENT_TYPES))
+    return db.session.query(inflow - outflow + adjustments).scalar()
+
+
+def cash_drift():
+    """``(recorded, expected)`` cash in hand."""
+    return cash_service.current_balance(), expected_cash()
+
+
+def diff_rows():
+    """Stream the diff report: one row per balance that is off, the cash
+    in hand first. Customers are read from a server-side cursor."""
+    recorded, expected = cash_drift()
+    if recorded != expected:
+        yield ['', 'Cash in hand', 'cash_balance', recorded, expected, expected - recorded]
+    width = len(BALANCE_FIELDS)
+    for row in customer_drift().yield_per(BATCH_SIZE):
+        _, member_no, name = row[:3]
+        loans_uncertain, savings_uncertain = row[-2:]
+        for index, field in enumerate(BALANCE_FIELDS):
+            recorded, expected = row[3 + index], row[3 + width + index]
+            if recorded != expected:
+                uncertain = savings_uncertain if field == 'savings_balance' else loans_uncertain
+                yield [member_no or '', name, f'{field} (uncertain)' if uncertain else field,
+                       recorded, expected, expected - recorded]
+
+
+def repair():
+    """Overwrite the drifted customer balances with the expected ones and
+    book the cash difference as a 'reconciliation' cash ledger entry.
+
+    One UPDATE ... FROM for all customers; uncertain balances keep their
+    recorded value. Returns ``(customers updated, cash correction)``.
+    """
+    expected = expected_balances()
+    keep = lambda field, uncertain: db.case((uncertain, getattr(Customer, field)), else_=getattr(expected.c, field))
+    values = {Customer.total_loan: keep('total_loan', expected.c.loans_uncertain),
+              Customer.remaining_loan: keep('remaining_loan', expected.c.loans_uncertain),
+              Customer.savings_balance: keep('savings_balance', expected.c.savings_uncertain)}
+    updated = db.session.execute(
+        db.update(Customer).where(Customer.id == expected.c.customer_id, _repairable(expected)).values(values)
+        .execution_options(synchronize_session=False)).rowcount
+
+    recorded, expected_total = cash_drift()
+    correction = expected_total - recorded
+    cash_service.record(correction, 'reconciliation', note='Balance reconciliation')
+    db.session.commit()
+    return updated, correction
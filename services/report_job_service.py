@@ -0,0 +1,239 @@
+"""Background report jobs queued in the ``report_jobs`` table.
+
+Web requests only insert a job row; ``flask --app app report-worker`` claims
+queued jobs one at a time, renders the artifact and stores it on the row.
+Finished artifacts are reused for any later request with the same report,
+format and parameters as long as the data they were built from is unchanged.
+"""
+from flask import current_app, render_template
+from models.user_model import db
+from models.loan_model import Loan
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.saving_model import Saving
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from models.investment_model import Investment
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.cash_balance_model import CashBalance
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from models.report_job_model import ReportJob
+from services import export_service, reconcile_service
+from services.report_service import monthly_report_context, profit_loss_context
+from datetime import datetime, timedelta
+import hashlib
+import json
+import time
+import config
+
+PENDING = ('queued', 'running')
+
+# Seconds between the worker's stale-job and retention sweeps
+MAINTENANCE_INTERVAL = 600
+
+# report -> (title, formats, admin only)
+PAGE_REPORTS = {
+    'monthly_report': ('Monthly Report', ('html', 'csv', 'xlsx'), True),
+    'profit_loss': ('Profit & Loss', ('html',), True),
+    'reconciliation': ('Balance Reconciliation', ('csv', 'xlsx'), True),
+}
+
+HTML_MIMETYPE = 'text/html; charset=utf-8'
+
+_VERSIONED_MODELS = (Customer, Loan, LoanCollection, SavingCollection, Saving, Withdrawal, Expense, Investment, CashLedgerEntry)
+_UPDATE_STAMPS = (DailyLedgerSummary.updated_date, Customer.updated_at, Loan.updated_at, CashBalance.updated_date)
+
+
+def report_title(report):
+    if report in PAGE_REPORTS:
+        return PAGE_REPORTS[report][0]
+    return export_service.DATASETS[report].title
+
+
+def report_formats(report):
+    if report in PAGE_REPORTS:
+        return PAGE_REPORTS[report][1]
+    return tuple(export_service.EXPORT_MIMETYPES)
+
+
+def is_admin_only(report):
+    if report in PAGE_REPORTS:
+        return PAGE_REPORTS[report][2]
+    return export_service.DATASETS[report].admin_only
+
+
+def is_known(report):
+    return report in PAGE_REPORTS or report in export_service.DATASETS
+
+
+def params_key(params):
+    """Canonical JSON of the non-empty ``params`` (the cache key part)."""
+    return json.dumps({k: v for k, v in params.items() if v not in (None, '')}, sort_keys=True)
+
+
+def data_version():
+    """Fingerprint of everything a report reads, in one SELECT.
+
+    Every money movement inserts rows (collections, cash ledger entries) and
+    touches the daily ledger summary, and deletes lower a count. Edits in
+    place (loan terms, customer balances, the cash checkpoint) move the
+    update stamp of their table. So any write a report could show changes
+    the fingerprint.
+    """
+    columns = [db.select(db.func.max(column)).scalar_subquery() for column in _UPDATE_STAMPS]
+    for model in _VERSIONED_MODELS:
+        columns.append(db.select(db.func.count(model.id)).scalar_subquery())
+        columns.append(db.select(db.func.max(model.id)).scalar_subquery())
+    row = db.session.query(*columns).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()
+
+
+def can_access(job, user):
+    if user.role == 'admin':
+        return True
+    return json.loads(job.params).get('staff_id') == user.id
+
+
+def enqueue(report, fmt, params, user):
+    """Return a job for ``report``: a finished one for the current data if it
+    exists, an identical job that is already waiting, or a new queued job."""
+    key = params_key(params)
+    same = ReportJob.query.filter_by(report=report, format=fmt, params=key)
+    cached = same.filter_by(status='done', data_version=data_version()).order_by(ReportJob.id.desc()).first()
+    if cached:
+        return cached
+    pending = same.filter(ReportJob.status.in_(PENDING)).order_by(ReportJob.id).first()
+    if pending:
+        return pending
+    job = ReportJob(report=report, format=fmt, params=key, requested_by=user.id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _render_page(report, params):
+    if report == 'monthly_report':
+        path, template, context = '/monthly_report', 'monthly_report.html', monthly_report_context(params['year'], params['month'])
+    else:
+        # from/to are the resolved range; a month or year to date is rendered as of its last day
+        from_date = datetime.strptime(params['from'], '%Y-%m-%d').date() if params.get('from') else None
+        to_date = datetime.strptime(params['to'], '%Y-%m-%d').date() if params.get('to') else None
+        if params.get('period') == 'custom':
+            context = profit_loss_context('custom', from_date, to_date)
+        else:
+            context = profit_loss_context(params.get('period', 'monthly'), today=to_date)
+            params = {'period': params.get('period', 'monthly')}
+        path, template = '/profit_loss', 'profit_loss.html'
+    # Templates call url_for and read request.args, so render inside a request
+    with current_app.test_request_context(path, query_string=params):
+        return render_template(template, **context).encode('utf-8')
+
+
+def _rows(report, params):
+    if report == 'reconciliation':
+        return 'Balance Reconciliation', reconcile_service.DIFF_HEADER, reconcile_service.diff_rows()
+    if report == 'monthly_report':
+        return (f"Monthly Report {params['year']}-{params['month']:02d}", export_service.MONTHLY_REPORT_HEADER,
+                export_service.monthly_report_rows(params['year'], params['month']))
+    export = export_service.DATASETS[report]
+    start = datetime.strptime(params['from'], '%Y-%m-%d') if params.get('from') else None
+    end = datetime.strptime(params['to'], '%Y-%m-%d') + timedelta(days=1) if params.get('to') else None
+    return export.title, export.header, export.rows(start, end, params.get('staff_id'))
+
+
+def render(job):
+    """Build the artifact bytes of ``job``."""
+    params = json.loads(job.params)
+    if job.format == 'html':
+        return _render_page(job.report, params)
+    title, header, rows = _rows(job.report, params)
+    chunks = export_service.stream_rows(job.format, title, header, rows)
+    return b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+
+
+def mimetype(job):
+    if job.format == 'html':
+        return HTML_MIMETYPE
+    return export_service.EXPORT_MIMETYPES[job.format]
+
+
+def filename(job):
+    return f'{job.report}_{job.id}.{job.format}'
+
+
+def _requeue_stale():
+    # Jobs whose worker died mid-run go back to the queue
+    cutoff = datetime.utcnow() - timedelta(seconds=config.REPORT_JOB_TIMEOUT)
+    ReportJob.query.filter(ReportJob.status == 'running', ReportJob.started_date < cutoff).update(
+        {ReportJob.status: 'queued', ReportJob.progress: 0}, synchronize_session=False)
+    db.session.commit()
+
+
+def purge_expired():
+    """Delete finished jobs (and their artifacts) past the retention period."""
+    cutoff = datetime.utcnow() - timedelta(days=config.REPORT_JOB_RETENTION_DAYS)
+    count = ReportJob.query.filter(ReportJob.status.in_(('done', 'failed')), ReportJob.finished_date < cutoff).delete(
+        synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def claim_next():
+    """Mark the oldest queued job as running and return it, or None.
+
+    The status check in the UPDATE makes the claim safe with several workers:
+    only one of them moves a given job out of 'queued'.
+    """
+    while True:
+        job_id = db.session.query(ReportJob.id).filter_by(status='queued').order_by(ReportJob.id).limit(1).scalar()
+        if job_id is None:
+            return None
+        claimed = ReportJob.query.filter_by(id=job_id, status='queued').update(
+            {ReportJob.status: 'running', ReportJob.progress: 10, ReportJob.started_date: datetime.utcnow()},
+            synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(ReportJob, job_id)
+
+
+def run(job):
+    """Render ``job`` and store the artifact, or record why it failed."""
+    try:
+        # Taken before rendering: a write during the run makes the next request rebuild
+        job.data_version = data_version()
+        job.progress = 30
+        db.session.commit()
+        artifact = render(job)
+        job.artifact = artifact
+        job.artifact_size = len(artifact)
+        job.status = 'done'
+    except Exception as exc:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(exc)[:500]
+    job.progress = 100
+    job.finished_date = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def work(interval=2.0, once=False, echo=None):
+    """Process queued jobs until stopped (or until the queue is empty with ``once``)."""
+    next_maintenance = 0
+    while True:
+        if time.monotonic() >= next_maintenance:
+            _requeue_stale()
+            purge_expired()
+            next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        job = claim_next()
+        if job is None:
+            if once:
+                return
+            db.session.remove()
+            time.sleep(interval)
+            continue
+        run(job)
+        if echo:
+            echo(f'Report job {job.id} ({job.report}.{job.format}): {job.status}')
+        db.session.remove()
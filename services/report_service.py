@@ -0,0 +1,228 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.expense_model import Expense
+from services import ledger_service
+from datetime import datetime, date, timedelta
+import calendar
+
+
+def day_bounds(day):
+    """Return the half-open [start, next day) datetime range of a date."""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def day_scoped(column, day, *filters):
+    """Build ``filters`` plus the indexable ``[day, next day)`` range on ``column``."""
+    start, end = day_bounds(day)
+    return (column >= start, column < end) + filters
+
+
+def month_bounds(year, month):
+    """Return the half-open [start, end) datetime range of a month."""
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def monthly_daily_totals(year, month):
+    """Build the per-day rows of the monthly report.
+
+    Reads the pre-aggregated ledger summary (at most one grouped row per day),
+    fills in the days without activity and accumulates the running balance in
+    a single pass.
+    """
+    start, end = month_bounds(year, month)
+    last_day = calendar.monthrange(year, month)[1]
+    totals_by_day = ledger_service.daily_totals(start.date(), end.date())
+
+    daily_data = {}
+    running_balance = 0
+    for day in range(1, last_day + 1):
+        totals = totals_by_day.get(date(year, month, day)) or dict.fromkeys(ledger_service.LEDGER_FIELDS, 0)
+        installments = totals['loan_collected']
+        savings = totals['saving_collected']
+        loan_given = totals['loan_given']
+        interest = totals['interest']
+        service_charge = totals['service_charge']
+        savings_return = totals['withdrawals']
+        expenses_total = totals['expenses']
+        admission_fee = totals['admission_fee']
+        welfare_fee = 0
+
+        total_income = installments + savings + service_charge + admission_fee + welfare_fee
+        total_expense = loan_given + savings_return + expenses_total
+        running_balance += total_income - total_expense
+
+        daily_data[day] = {
+            'savings': savings,
+            'installments': installments,
+            'welfare_fee': welfare_fee,
+            'admission_fee': admission_fee,
+            'service_charge': service_charge,
+            'capital_savings': installments + savings,
+            'loan_given': loan_given,
+            'interest': interest,
+            'loan_with_interest': loan_given + interest,
+            'savings_return': savings_return,
+            'expenses': expenses_total,
+            'total_expense': total_expense,
+            'balance': running_balance
+        }
+    return daily_data, last_day
+
+
+MONTH_NAMES = ['', 'জানুয়ারি', 'ফেব্রুয়ারি', 'মার্চ', 'এপ্রিল', 'মে', 'জুন', 'জুলাই', 'আগস্ট', 'সেপ্টেম্বর', 'অক্টোবর', 'নভেম্বর', 'ডিসেম্বর']
+
+
+def monthly_report_context(year, month):
+    """Template context of the monthly report page."""
+    daily_data, last_day = monthly_daily_totals(year, month)
+
+    total_capital_savings = sum(d['capital_savings'] for d in daily_data.values())
+    total_loan_distributed = sum(d['loan_given'] for d in daily_data.values())
+    total_interest = sum(d['interest'] for d in daily_data.values())
+    current_remaining = db.session.query(db.func.sum(Customer.remaining_loan)).scalar() or 0
+    prev_remaining = current_remaining + total_capital_savings - total_loan_distributed
+    total_monthly_expenses = sum(d['expenses'] for d in daily_data.values())
+
+    return dict(month_name=MONTH_NAMES[month], year=year, daily_data=daily_data, last_day=last_day,
+                total_capital_savings=total_capital_savings, total_loan_distributed=total_loan_distributed,
+                total_interest=total_interest, prev_remaining=prev_remaining, current_remaining=current_remaining,
+                total_monthly_expenses=total_monthly_expenses)
+
+
+# (template key, Expense.category value) of the profit/loss outflow breakdown
+EXPENSE_CATEGORIES = (('salary_exp', 'Salary'), ('office_exp', 'Office'), ('transport_exp', 'Transport'), ('other_exp', 'Other'))
+
+
+def shift_months(day, months):
+    """Move ``day`` by ``months`` calendar months, clamping to the month's last day."""
+    index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def profit_loss_range(period, from_date=None, to_date=None, today=None):
+    """Resolve the half-open [start, end) date range of the profit/loss page
+    and the range it is compared against.
+
+    ``from_date``/``to_date`` (inclusive) select a custom range, compared with
+    the equally long range right before it. Otherwise the month or year to
+    date is compared with the same span one month or one year earlier.
+    """
+    today = today or date.today()
+    if from_date or to_date:
+        start = from_date or date(today.year, 1, 1)
+        end = (to_date or today) + timedelta(days=1)
+        return start, end, start - (end - start), start
+    months = 1 if period == 'monthly' else 12
+    start = today.replace(day=1) if period == 'monthly' else today.replace(month=1, day=1)
+    end = today + timedelta(days=1)
+    return start, end, shift_months(start, -months), shift_months(end, -months)
+
+
+def expense_categories(start, end):
+    """Expense totals per category over [start, end), pivoted in one SELECT."""
+    row = db.session.query(*[
+        db.func.coalesce(db.func.sum(db.case((Expense.category == category, Expense.amount), else_=0)), 0)
+        for _, category in EXPENSE_CATEGORIES
+    ]).filter(Expense.date >= datetime.combine(start, datetime.min.time()),
+              Expense.date < datetime.combine(end, datetime.min.time())).one()
+    return {key: amount for (key, _), amount in zip(EXPENSE_CATEGORIES, row)}
+
+
+def _profit_loss(totals):
+    # Income: Loan Collections + Savings Collections
+    # Net Profit/Loss = Income - (Expenses + Withdrawals + Loans Given)
+    income = totals['loan_collected'] + totals['saving_collected']
+    outflow = totals['expenses'] + totals['withdrawals'] + totals['loan_given']
+    return income, outflow, income - outflow
+
+
+def profit_loss_totals(start, end):
+    """Income, outflow and category figures of the profit/loss page over [start, end)."""
+    totals = ledger_service.period_totals(start, end)
+    income, outflow, net_profit = _profit_loss(totals)
+    return dict(total_income=income,
+                total_loan_collected=totals['loan_collected'],
+                total_savings_collected=totals['saving_collected'],
+                total_expenses=totals['expenses'],
+                total_withdrawals=totals['withdrawals'],
+                total_loans_given=totals['loan_given'],
+                total_outflow=outflow,
+                net_profit=net_profit,
+                **expense_categories(start, end))
+
+
+def monthly_profit_loss(start, end):
+    """Per-month income/outflow/net over [start, end), each with the net of
+    the same month a year earlier. Reads both years in one grouped query."""
+    by_month = ledger_service.monthly_totals(shift_months(start.replace(day=1), -12), end)
+    empty = dict.fromkeys(ledger_service.LEDGER_FIELDS, 0)
+    rows = []
+    month = start.replace(day=1)
+    while month < end:
+        income, outflow, net = _profit_loss(by_month.get((month.year, month.month), empty))
+        _, _, previous_net = _profit_loss(by_month.get((month.year - 1, month.month), empty))
+        rows.append(dict(label=f'{MONTH_NAMES[month.month]} {month.year}', income=income, outflow=outflow,
+                         net=net, previous_net=previous_net))
+        month = shift_months(month, 1)
+    return rows
+
+
+def profit_loss_context(period, from_date=None, to_date=None, today=None):
+    """Template context of the profit/loss page (as of ``today``).
+
+    A bounded number of aggregate queries whatever the range: the ledger
+    summary and the expense pivot for the range and its comparison range,
+    plus one grouped query for the monthly breakdown.
+    """
+    if from_date or to_date:
+        period = 'custom'
+    start, end, previous_start, previous_end = profit_loss_range(period, from_date, to_date, today)
+    current = profit_loss_totals(start, end)
+    previous = profit_loss_totals(previous_start, previous_end)
+    breakdown = monthly_profit_loss(start, end) if (end - start).days > 31 else []
+
+    return dict(period=period,
+                start_date=start,
+                end_date=end - timedelta(days=1),
+                previous_start=previous_start,
+                previous_end=previous_end - timedelta(days=1),
+                current=current,
+                previous=previous,
+                monthly_breakdown=breakdown,
+                **current)
+
+
+def member_collections(day):
+    """Per-member loan and saving collections of one day, ordered by member_no.
+
+    Each source table is summed per customer once and LEFT JOINed onto the
+    member list, loading only the columns the report prints. Returns a query
+    of ``(member_no, name, loan_amount, saving_amount)`` rows.
+    """
+    loan_sums = db.session.query(
+        LoanCollection.customer_id.label('customer_id'),
+        db.func.sum(LoanCollection.amount).label('amount')
+    ).filter(*day_scoped(LoanCollection.collection_date, day)).group_by(LoanCollection.customer_id).subquery()
+    saving_sums = db.session.query(
+        SavingCollection.customer_id.label('customer_id'),
+        db.func.sum(SavingCollection.amount).label('amount')
+    ).filter(*day_scoped(SavingCollection.collection_date, day)).group_by(SavingCollection.customer_id).subquery()
+
+    return db.session.query(
+        Customer.member_no,
+        Customer.name,
+        db.func.coalesce(loan_sums.c.amount, 0).label('loan_amount'),
+        db.func.coalesce(saving_sums.c.amount, 0).label('saving_amount')
+    ).outerjoin(loan_sums, loan_sums.c.customer_id == Customer.id
+    ).outerjoin(saving_sums, saving_sums.c.customer_id == Customer.id
+    ).order_by(Customer.member_no, Customer.id)
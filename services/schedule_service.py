@@ -0,0 +1,154 @@
+"""Loan installment schedules and the arrears (overdue) queries built on them.
+
+``add_loan`` materializes one ``loan_installments`` row per installment.
+Loan collections are allocated to a customer's oldest open installments, so
+the overdue list of a field officer is a single range scan over the
+(staff_id, status, due_date) index.
+"""
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_installment_model import LoanInstallment
+from models.money import to_money
+from services.report_service import shift_months
+from datetime import datetime, timedelta
+
+# installment_type -> (days, months) between two installments
+INTERVALS = {
+    'দৈনিক': (1, 0), 'daily': (1, 0),
+    'সাপ্তাহিক': (7, 0), 'weekly': (7, 0),
+    'মাসিক': (0, 1), 'monthly': (0, 1),
+}
+
+def due_dates(loan):
+    """Due date of every installment of ``loan``.
+
+    Known installment types step from the loan date by their interval; any
+    other type spreads the installments evenly up to the loan's due date.
+    """
+    count = max(loan.installment_count or 0, 1)
+    start = loan.loan_date.date()
+    if loan.installment_type in INTERVALS and loan.installment_count:
+        days, months = INTERVALS[loan.installment_type]
+        return [shift_months(start, months * n) + timedelta(days=days * n) for n in range(1, count + 1)]
+    span = max((loan.due_date.date() - start).days, 0)
+    return [start + timedelta(days=round(span * n / count)) for n in range(1, count + 1)]
+
+
+def generate(loan, customer, total):
+    """Insert the installment schedule of a freshly added ``loan`` for ``total``
+    (principal, interest and service charge). Flushes to get the loan id;
+    the caller commits."""
+    dates = due_dates(loan)
+    each = loan.installment_amount if loan.installment_amount and loan.installment_count else to_money(total / len(dates))
+    db.session.flush()
+    rows, remaining = [], to_money(total)
+    for number, due_date in enumerate(dates, 1):
+        amount = remaining if number == len(dates) else min(each, remaining)
+        if amount <= 0:
+            break
+        rows.append({'loan_id': loan.id, 'customer_id': customer.id, 'staff_id': customer.staff_id, 'number': number,
+                     'due_date': due_date, 'amount': amount, 'paid_amount': 0, 'status': 'open'})
+        remaining -= amount
+    if rows:
+        db.session.execute(db.insert(LoanInstallment), rows)
+    return len(rows)
+
+
+def allocate(amounts_by_customer, when=None):
+    """Apply loan collections to the oldest open installments of each customer.
+
+    ``amounts_by_customer`` maps customer id to the amount collected. All the
+    open installments involved are loaded with one query. Amounts beyond the
+    schedule (e.g. loans issued before schedules existed) are left unallocated.
+    The caller commits.
+    """
+    amounts = {customer_id: amount for customer_id, amount in amounts_by_customer.items() if amount > 0}
+    if not amounts:
+        return
+    when = when or datetime.utcnow()
+    installments = LoanInstallment.query.filter(
+        LoanInstallment.customer_id.in_(amounts), LoanInstallment.status == 'open'
+    ).order_by(LoanInstallment.customer_id, LoanInstallment.due_date, LoanInstallment.number).all()
+    for installment in installments:
+        left = amounts[installment.customer_id]
+        if left <= 0:
+            continue
+        applied = min(left, installment.amount - (installment.paid_amount or 0))
+        installment.paid_amount = (installment.paid_amount or 0) + applied
+        amounts[installment.customer_id] = left - applied
+        if installment.paid_amount >= installment.amount:
+            installment.status = 'paid'
+            installment.paid_date = when
+
+
+def resize(loan, when=None):
+    """Make the open installments of ``loan`` add up to its outstanding
+    balance after its terms changed: a rise goes to the last open
+    installment, a cut comes off the last ones first. Loans without a
+    schedule are left alone. The caller commits.
+    """
+    installments = LoanInstallment.query.filter_by(loan_id=loan.id).order_by(LoanInstallment.number).all()
+    if not installments:
+        return
+    open_ones = [i for i in installments if i.status == 'open']
+    change = to_money(loan.outstanding or 0) - sum(i.amount - (i.paid_amount or 0) for i in open_ones)
+    if change > 0:
+        if open_ones:
+            open_ones[-1].amount += change
+        else:
+            db.session.add(LoanInstallment(loan_id=loan.id, customer_id=loan.customer_id, staff_id=loan.staff_id,
+                                           number=installments[-1].number + 1, due_date=loan.due_date.date(),
+                                           amount=change, paid_amount=0, status='open'))
+        return
+    for installment in reversed(open_ones):
+        if change >= 0:
+            break
+        cut = min(-change, installment.amount - (installment.paid_amount or 0))
+        installment.amount -= cut
+        change += cut
+        if installment.paid_amount:
+            if installment.amount <= installment.paid_amount:
+                installment.status = 'paid'
+                installment.paid_date = when or datetime.utcnow()
+        elif not installment.amount:
+            db.session.delete(installment)
+
+
+def close_loan(loan_id, when=None):
+    """Mark every open installment of a loan as paid (loan settled by hand)."""
+    LoanInstallment.query.filter_by(loan_id=loan_id, status='open').update(
+        {LoanInstallment.status: 'paid', LoanInstallment.paid_date: when or datetime.utcnow()}, synchronize_session=False)
+
+
+def overdue(as_of, staff_id=None):
+    """Open installments due on or before ``as_of``, oldest first.
+
+    With ``staff_id`` this is one range scan of the (staff_id, status,
+    due_date) index; without it, of (status, due_date).
+    """
+    query = LoanInstallment.query.filter(LoanInstallment.status == 'open', LoanInstallment.due_date <= as_of)
+    if staff_id:
+        query = query.filter(LoanInstallment.staff_id == staff_id)
+    return query.order_by(LoanInstallment.due_date, LoanInstallment.id)
+
+
+def arrears_by_customer(as_of, staff_id=None):
+    """The field-visit list: one row per customer with overdue installments.
+
+    Rows carry ``customer_id``, ``member_no``, ``name``, ``phone``,
+    ``village``, ``installments`` (count overdue), ``oldest_due`` and
+    ``outstanding``, ordered by the oldest overdue date.
+    """
+    filters = [LoanInstallment.status == 'open', LoanInstallment.due_date <= as_of]
+    if staff_id:
+        filters.append(LoanInstallment.staff_id == staff_id)
+    late = db.session.query(
+        LoanInstallment.customer_id.label('customer_id'),
+        db.func.count(LoanInstallment.id).label('installments'),
+        db.func.min(LoanInstallment.due_date).label('oldest_due'),
+        db.func.sum(LoanInstallment.amount - db.func.coalesce(LoanInstallment.paid_amount, 0)).label('outstanding'),
+    ).filter(*filters).group_by(LoanInstallment.customer_id).subquery()
+    return db.session.query(
+        late.c.customer_id, Customer.member_no, Customer.name, Customer.phone, Customer.village,
+        late.c.installments, late.c.oldest_due, late.c.outstanding,
+    ).join(Customer, Customer.id == late.c.customer_id).order_by(late.c.oldest_due, Customer.member_no)
@@ -0,0 +1,136 @@
+"""Member search across name, member_no, phone, NID and village.
+
+Three backends, picked by what the database offers:
+
+* ``fts5``  - SQLite: a trigram FTS5 index over ``customers`` kept in sync by
+  triggers, so any 3+ character substring is an index lookup.
+* ``trgm``  - Postgres: a pg_trgm GIN index over the same columns, which
+  serves ``ILIKE '%term%'``.
+* ``prefix`` - anything else (or when the above could not be installed):
+  exact member_no/phone/NID matches and a name prefix range, all on B-tree
+  indexes.
+
+``install()`` is run by the migrations; ``backend()`` checks once per
+process which one is available.
+"""
+from models.user_model import db
+from models.customer_model import Customer
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+import re
+
+SEARCH_COLUMNS = ('name', 'member_no', 'phone', 'nid_no', 'village')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_FTS_TABLE = 'customer_search'
+_TRGM_INDEX = 'ix_customers_search_trgm'
+_TRGM_DOCUMENT = " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+
+_backend = None
+
+
+def _install_fts5(conn):
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5("
+                      f"{columns}, content='customers', content_rowid='id', tokenize='trigram')"))
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS customers_search_ai AFTER INSERT ON customers BEGIN "
+                      f"INSERT INTO {_FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS customers_search_ad AFTER DELETE ON customers BEGIN "
+                      f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"))
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS customers_search_au AFTER UPDATE OF {columns} ON customers BEGIN "
+                      f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                      f"INSERT INTO {_FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END"))
+    conn.execute(text(f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def _install_trgm(conn):
+    conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {_TRGM_INDEX} ON customers USING gin (({_TRGM_DOCUMENT}) gin_trgm_ops)'))
+
+
+def install():
+    """Create the search index this database supports; keep the prefix
+    fallback if it cannot (old SQLite without trigram, no extension rights)."""
+    global _backend
+    installer = {'sqlite': _install_fts5, 'postgresql': _install_trgm}.get(db.engine.dialect.name)
+    if installer:
+        try:
+            with db.engine.begin() as conn:
+                installer(conn)
+        except DBAPIError:
+            pass
+    _backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        dialect = db.engine.dialect.name
+        inspector = inspect(db.engine)
+        if dialect == 'sqlite' and _FTS_TABLE in inspector.get_table_names():
+            _backend = 'fts5'
+        elif dialect == 'postgresql' and _TRGM_INDEX in {i['name'] for i in inspector.get_indexes('customers')}:
+            _backend = 'trgm'
+        else:
+            _backend = 'prefix'
+    return _backend
+
+
+def _fts_query(term):
+    # Every whitespace-separated word must appear; quoting makes FTS5 treat
+    # the user's input as literal text rather than query syntax.
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in term.split())
+
+
+def _name_prefix(term):
+    # A plain range rather than LIKE 'term%', so the name B-tree index serves it
+    return db.and_(Customer.name >= term, Customer.name < term + '\uffff')
+
+
+def _prefix_filter(term):
+    return db.or_(Customer.member_no == term, Customer.phone == term, Customer.nid_no == term, _name_prefix(term))
+
+
+def matching_ids(term):
+    """Select of the ids of the customers matching ``term`` (for IN filters)."""
+    term = term.strip()
+    kind = backend()
+    # Trigram indexes need at least three characters per word
+    if kind == 'fts5' and min(len(word) for word in term.split() or ['']) >= 3:
+        return db.select(db.literal_column('rowid')).select_from(db.table(_FTS_TABLE)).where(
+            db.text(f'{_FTS_TABLE} MATCH :fts_query').bindparams(fts_query=_fts_query(term)))
+    if kind == 'trgm' and len(term) >= 3:
+        pattern = '%' + re.sub(r'([%_\\])', r'\\\1', term) + '%'
+        return db.select(Customer.id).where(db.literal_column(f'({_TRGM_DOCUMENT})').ilike(pattern))
+    return db.select(Customer.id).where(_prefix_filter(term))
+
+
+def search(term, limit=DEFAULT_LIMIT, staff_id=None, with_loan=False):
+    """Top ``limit`` customers matching ``term``, best matches first."""
+    term = (term or '').strip()
+    if not term:
+        return []
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+    query = Customer.query.filter(Customer.id.in_(matching_ids(term)))
+    if staff_id:
+        query = query.filter(Customer.staff_id == staff_id)
+    if with_loan:
+        query = query.filter(Customer.remaining_loan > 0)
+    # Exact member_no hits first, then names starting with the term
+    rank = db.case((Customer.member_no == term, 0), (_name_prefix(term), 1), else_=2)
+    return query.order_by(rank, Customer.name, Customer.id).limit(limit).all()
+
+
+def as_dict(customer):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'member_no': customer.member_no,
+        'phone': customer.phone,
+        'village': customer.village,
+        'remaining_loan': customer.remaining_loan,
+        'savings_balance': customer.savings_balance,
+    }
@@ -0,0 +1,274 @@
+"""Synthetic microfinance data for load tests and benchmarks.
+
+``generate()`` fills an empty database with field officers, members and
+``years`` of history: loans with their installment schedules, the weekly or
+monthly installments collected on (or shortly after) their due dates, some
+defaulters who stop paying, weekly savings, savings withdrawals, monthly
+expenses and the investments that fund the disbursements. Everything the
+routes keep denormalized is filled in consistently - customer balances,
+``Loan.outstanding``, installment status, the daily ledger summary and the
+cash ledger - so ``flask reconcile`` reports no drift.
+
+Rows are bulk-inserted per chunk of members with explicit ids. The cash
+ledger gets one entry per day, staff and entry type rather than one per
+transaction. The same ``seed`` always produces the same data.
+"""
+from models.user_model import db, User
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_installment_model import LoanInstallment
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from models.investment_model import Investment
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.money import to_money, percent
+from services import cash_service, ledger_service, schedule_service
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+import random
+
+CHUNK_SIZE = 500
+SEEDED_MODELS = (Customer, Loan, LoanInstallment, LoanCollection, SavingCollection, Withdrawal, Expense, Investment)
+
+FIRST_NAMES = ('Rahima', 'Karim', 'Amena', 'Jamal', 'Nasrin', 'Rafiq', 'Shirin', 'Habib', 'Salma', 'Kamal',
+               'Fatema', 'Abdul', 'Rokeya', 'Mizan', 'Shahana', 'Jahid', 'Morjina', 'Anwar', 'Hasina', 'Sumon')
+LAST_NAMES = ('Begum', 'Khatun', 'Hossain', 'Ahmed', 'Akter', 'Islam', 'Mia', 'Sarkar', 'Uddin', 'Rahman')
+VILLAGES = ('Charpara', 'Dakshinpur', 'Uttarpara', 'Purbagram', 'Paschimpara', 'Nayapara', 'Kalikapur',
+            'Madhupur', 'Shibganj', 'Rampur', 'Krishnapur', 'Baliadanga')
+PROFESSIONS = ('Farmer', 'Tailor', 'Shopkeeper', 'Day labourer', 'Fisher', 'Rickshaw puller', 'Housewife')
+
+# installment_type -> (installment count, share of the loans)
+LOAN_PLANS = {'সাপ্তাহিক': (46, 0.7), 'মাসিক': (12, 0.3)}
+LOAN_AMOUNTS = range(5000, 50001, 1000)
+INTEREST_RATES = (10, 12, 15)
+WELFARE_FEE = 50
+DEFAULT_RATE = 0.08      # share of loans whose borrower stops paying at some point
+LATE_RATE = 0.15         # share of installments paid a few days late
+SAVING_RATE = 0.35       # chance a member saves in a given week
+WITHDRAWAL_RATE = 0.1    # share of members who withdraw part of their savings once
+
+
+class _Ids:
+    """Next free id of every table, so rows can reference each other
+    before they are inserted."""
+
+    def __init__(self, *models):
+        self._next = {model: (db.session.query(db.func.max(model.id)).scalar() or 0) + 1 for model in models}
+
+    def take(self, model):
+        value = self._next[model]
+        self._next[model] += 1
+        return value
+
+
+def _at(day, rng):
+    # Office hours
+    return datetime.combine(day, time(rng.randint(9, 16), rng.randint(0, 59)))
+
+
+def _staff(count, hash_password):
+    # Same passwords as the default logins of run.py
+    if not User.query.filter_by(role='admin').first():
+        db.session.add(User(name='Admin', email='admin@example.com', password=hash_password('admin123'), role='admin'))
+    existing = {email for email, in db.session.query(User.email)}
+    password = hash_password('staff123')
+    for number in range(1, count + 1):
+        email = f'officer{number}@example.com'
+        if email not in existing:
+            db.session.add(User(name=f'Field Officer {number}', email=email, password=password, role='staff'))
+    db.session.commit()
+    staff = [user.id for user in User.query.filter(User.email.like('officer%@example.com')).order_by(User.id)]
+    return staff[:count]
+
+
+def _member(number, staff_id, created, rng, ids):
+    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+    return {
+        'id': ids.take(Customer), 'name': name, 'member_no': f'M{number:06d}',
+        'phone': f'01{rng.choice("3456789")}{number:08d}', 'father_husband': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'village': rng.choice(VILLAGES), 'post': rng.choice(VILLAGES), 'thana': 'Sadar', 'district': 'Rajshahi',
+        'profession': rng.choice(PROFESSIONS), 'nid_no': str(rng.randrange(10 ** 9, 10 ** 10)),
+        'admission_fee': to_money(rng.choice((50, 100))), 'staff_id': staff_id, 'created_date': created,
+        'total_loan': 0, 'remaining_loan': 0, 'savings_balance': 0,
+    }
+
+
+def _loan(customer, start, end, rng, ids, rows, cash):
+    """One loan of ``customer`` given on ``start`` and the installments paid
+    before ``end``. Returns the day of the last payment, or None when the
+    borrower defaulted or is still repaying."""
+    plan = 'সাপ্তাহিক' if rng.random() < LOAN_PLANS['সাপ্তাহিক'][1] else 'মাসিক'
+    count = LOAN_PLANS[plan][0]
+    amount = to_money(rng.choice(LOAN_AMOUNTS))
+    interest = rng.choice(INTEREST_RATES)
+    service_charge = percent(amount, 1)
+    total = amount + percent(amount, interest) + service_charge
+    loan = Loan(loan_date=_at(start, rng), installment_count=count, installment_type=plan)
+    dates = schedule_service.due_dates(loan)
+    each = to_money(total / count)
+    loan_id, staff_id = ids.take(Loan), customer['staff_id']
+    defaults_at = rng.randrange(count) if rng.random() < DEFAULT_RATE else None
+
+    paid, last_paid = to_money(0), None
+    for number, due in enumerate(dates, 1):
+        installment = total - each * (count - 1) if number == count else each
+        row = {'id': ids.take(LoanInstallment), 'loan_id': loan_id, 'customer_id': customer['id'], 'staff_id': staff_id,
+               'number': number, 'due_date': due, 'amount': installment, 'paid_amount': 0, 'status': 'open',
+               'paid_date': None, 'created_date': loan.loan_date}
+        pay_day = due + timedelta(days=rng.randint(1, 5) if rng.random() < LATE_RATE else 0)
+        if (defaults_at is None or number < defaults_at) and pay_day < end:
+            paid_at = _at(pay_day, rng)
+            row.update(paid_amount=installment, status='paid', paid_date=paid_at)
+            rows[LoanCollection].append({'id': ids.take(LoanCollection), 'customer_id': customer['id'], 'loan_id': loan_id,
+                                         'amount': installment, 'collection_date': paid_at, 'staff_id': staff_id})
+            cash[(pay_day, staff_id, 'loan_collection')] += installment
+            paid += installment
+            last_paid = pay_day
+        rows[LoanInstallment].append(row)
+
+    outstanding = total - paid
+    rows[Loan].append({'id': loan_id, 'customer_id': customer['id'], 'customer_name': customer['name'], 'amount': amount,
+                       'interest': interest, 'loan_date': loan.loan_date, 'due_date': datetime.combine(dates[-1], time()),
+                       'installment_count': count, 'installment_amount': each, 'service_charge': service_charge,
+                       'welfare_fee': to_money(WELFARE_FEE), 'installment_type': plan,
+                       'status': 'Paid' if outstanding == 0 else 'Pending', 'outstanding': outstanding, 'staff_id': staff_id})
+    cash[(start, staff_id, 'loan_disbursement')] -= amount
+    cash[(start, staff_id, 'loan_fees')] += service_charge + WELFARE_FEE
+    customer['total_loan'] += total
+    customer['remaining_loan'] += outstanding
+    return last_paid if outstanding == 0 else None
+
+
+def _history(customer, end, rng, ids, rows, cash):
+    joined = customer['created_date'].date()
+    staff_id = customer['staff_id']
+    cash[(joined, staff_id, 'admission_fee')] += customer['admission_fee']
+
+    # Back-to-back loans until one is still open or defaulted
+    day = joined + timedelta(days=rng.randint(0, 60))
+    while day < end - timedelta(days=30) and rng.random() < 0.85:
+        repaid = _loan(customer, day, end, rng, ids, rows, cash)
+        if repaid is None:
+            break
+        day = repaid + timedelta(days=rng.randint(7, 45))
+
+    savings, saved_by = to_money(0), []
+    day = joined + timedelta(days=7)
+    while day < end:
+        if rng.random() < SAVING_RATE:
+            amount = to_money(rng.choice((50, 100, 100, 200, 500)))
+            collected_at = _at(day, rng)
+            rows[SavingCollection].append({'id': ids.take(SavingCollection), 'customer_id': customer['id'], 'amount': amount,
+                                           'collection_date': collected_at, 'staff_id': staff_id})
+            cash[(day, staff_id, 'saving_collection')] += amount
+            savings += amount
+            saved_by.append((day, savings))
+        day += timedelta(days=7)
+
+    if saved_by and rng.random() < WITHDRAWAL_RATE:
+        day, balance = saved_by[rng.randrange(len(saved_by))]
+        amount = to_money(int(balance / 2 / 50) * 50)
+        if amount > 0:
+            rows[Withdrawal].append({'id': ids.take(Withdrawal), 'customer_id': customer['id'], 'amount': amount,
+                                     'date': _at(day, rng), 'note': 'Savings withdrawal', 'withdrawal_type': 'savings'})
+            cash[(day, None, 'withdrawal')] -= amount
+            savings -= amount
+    customer['savings_balance'] = savings
+
+
+def _insert(rows):
+    # Parents first, so the foreign keys hold on databases that enforce them
+    for model in (Customer, Loan, LoanInstallment, LoanCollection, SavingCollection, Withdrawal):
+        if rows[model]:
+            db.session.execute(db.insert(model), rows[model])
+        rows[model] = []
+    db.session.commit()
+
+
+def _office(staff, start, end, rng, ids, cash):
+    """Monthly salaries and office costs, weekly transport."""
+    expenses = []
+    day = start.replace(day=1)
+    while day < end:
+        month = [('Salary', to_money(rng.choice((12000, 15000))), f'Officer {n} salary') for n, _ in enumerate(staff, 1)]
+        month.append(('Office', to_money(6000), 'Office rent'))
+        month += [('Transport', to_money(rng.randint(3, 12) * 100), 'Field visits') for _ in range(4)]
+        for category, amount, description in month:
+            expenses.append({'id': ids.take(Expense), 'category': category, 'amount': amount,
+                             'description': description, 'date': _at(day, rng)})
+            cash[(day, None, 'expense')] -= amount
+        day = (day + timedelta(days=32)).replace(day=1)
+    db.session.execute(db.insert(Expense), expenses)
+
+
+def _fund(start, cash, rng, ids):
+    """Investments on the first day covering everything ever paid out, so the
+    cash in hand never goes negative."""
+    paid_out = -sum(amount for (_, _, kind), amount in cash.items() if amount < 0)
+    needed = to_money((int(paid_out / 100000) + 1) * 100000)
+    investors = ('Founding Trust', 'Partner Fund', 'Community Bank')
+    share = to_money(needed / len(investors))
+    amounts = [needed - share * (len(investors) - 1)] + [share] * (len(investors) - 1)
+    db.session.execute(db.insert(Investment), [{'id': ids.take(Investment), 'investor_name': investor, 'amount': amount,
+                                                'date': _at(start, rng), 'note': 'Seed capital'}
+                                               for investor, amount in zip(investors, amounts)])
+    cash[(start, None, 'investment')] += needed
+
+
+def _cash_ledger(cash):
+    entries = [{'amount': amount, 'entry_type': kind, 'staff_id': staff_id, 'note': 'Daily total',
+                'created_date': datetime.combine(day, time(18))}
+               for (day, staff_id, kind), amount in sorted(cash.items(), key=lambda item: (item[0][0], item[0][1] or 0, item[0][2]))
+               if amount]
+    for offset in range(0, len(entries), 10000):
+        db.session.execute(db.insert(CashLedgerEntry), entries[offset:offset + 10000])
+    db.session.commit()
+
+
+def _sync_sequences():
+    # Rows were inserted with explicit ids; move the Postgres sequences past them
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in SEEDED_MODELS:
+        table = model.__tablename__
+        db.session.execute(db.text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+    db.session.commit()
+
+
+def generate(customers, staff_count, years, hash_password, seed=1, echo=None):
+    """Fill an empty database; returns the number of rows of each table.
+
+    Field officers log in as ``officer<n>@example.com`` / ``staff123``; an
+    ``admin@example.com`` / ``admin123`` admin is added if there is none.
+    """
+    if db.session.query(Customer.id).first() is not None:
+        raise ValueError('The database already has customers; seed an empty database.')
+    rng = random.Random(seed)
+    end = datetime.now().date()
+    start = end - timedelta(days=int(365 * years))
+    staff = _staff(staff_count, hash_password)
+    ids = _Ids(*SEEDED_MODELS)
+    cash = defaultdict(int)
+    rows = {model: [] for model in (Customer, Loan, LoanInstallment, LoanCollection, SavingCollection, Withdrawal)}
+
+    # Members join during the first 60% of the period, so most have a history
+    join_days = max(int((end - start).days * 0.6), 1)
+    for number in range(1, customers + 1):
+        created = _at(start + timedelta(days=rng.randrange(join_days)), rng)
+        customer = _member(number, staff[number % len(staff)], created, rng, ids)
+        rows[Customer].append(customer)
+        _history(customer, end, rng, ids, rows, cash)
+        if number % CHUNK_SIZE == 0 or number == customers:
+            _insert(rows)
+            if echo:
+                echo(f'{number} / {customers} members')
+
+    _office(staff, start, end, rng, ids, cash)
+    _fund(start, cash, rng, ids)
+    _cash_ledger(cash)
+    _sync_sequences()
+    ledger_service.rebuild()
+    cash_service.checkpoint()
+    return {model.__tablename__: db.session.query(db.func.count(model.id)).scalar() for model in SEEDED_MODELS}
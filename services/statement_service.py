@@ -0,0 +1,112 @@
+"""Member statements shared by the customer details page and its print view.
+
+A statement is the collection/withdrawal totals for one customer, computed
+with SQL aggregates, plus the newest page of each history. History rows are
+plain column tuples (``amount``, date, ``staff_name``/``note``) rather than
+ORM objects, so they carry no lazy relationships and can be cached.
+
+Cached statements are keyed on the customer's ``updated_at``, which every
+collection bumps along with the balance it changes. A worker that did not
+make the write still misses on its next request, rather than serving
+totals older than the balance shown next to them.
+"""
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.user_model import db, User
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from services.cache import TTLCache
+from services.pagination import keyset_paginate
+import config
+
+statement_cache = TTLCache(ttl=config.STATEMENT_CACHE_TTL)
+
+# history name -> (model, date column, request arg holding its page cursor)
+HISTORIES = {
+    'loan_collections': (LoanCollection, LoanCollection.collection_date, 'loan_cursor'),
+    'saving_collections': (SavingCollection, SavingCollection.collection_date, 'saving_cursor'),
+    'withdrawals': (Withdrawal, Withdrawal.date, 'withdrawal_cursor'),
+}
+
+
+class Statement:
+    """Totals and newest history pages for one customer."""
+
+    def __init__(self, customer_id, totals, pages):
+        self.customer_id = customer_id
+        self.total_loan_collected = totals['loan_collected']
+        self.loan_collection_count = totals['loan_count']
+        self.total_saving_collected = totals['saving_collected']
+        self.total_withdrawn = totals['withdrawn']
+        self.pages = pages
+
+
+def history_query(name, customer_id):
+    model, date_column, _ = HISTORIES[name]
+    if model is Withdrawal:
+        return db.session.query(Withdrawal.id, Withdrawal.date, Withdrawal.amount, Withdrawal.note).filter(
+            Withdrawal.customer_id == customer_id)
+    return db.session.query(model.id, date_column, model.amount, User.name.label('staff_name')).outerjoin(
+        User, model.staff_id == User.id).filter(model.customer_id == customer_id)
+
+
+def history(name, customer_id):
+    """Every row of one history, newest first (used by the print view)."""
+    model, date_column, _ = HISTORIES[name]
+    return history_query(name, customer_id).order_by(date_column.desc(), model.id.desc()).all()
+
+
+def history_page(name, customer_id, cursor=None, per_page=None):
+    model, date_column, cursor_arg = HISTORIES[name]
+    return keyset_paginate(history_query(name, customer_id), date_column, model.id,
+                           cursor=cursor, per_page=per_page, cursor_arg=cursor_arg)
+
+
+def totals(customer_id):
+    """All statement totals for ``customer_id`` in one SELECT."""
+    def sum_of(model, *filters):
+        return db.select(db.func.coalesce(db.func.sum(model.amount), 0)).where(*filters).scalar_subquery()
+
+    row = db.session.query(
+        sum_of(LoanCollection, LoanCollection.customer_id == customer_id).label('loan_collected'),
+        db.select(db.func.count(LoanCollection.id)).where(LoanCollection.customer_id == customer_id).scalar_subquery().label('loan_count'),
+        sum_of(SavingCollection, SavingCollection.customer_id == customer_id).label('saving_collected'),
+        sum_of(Withdrawal, Withdrawal.customer_id == customer_id).label('withdrawn'),
+    ).one()
+    return dict(row._mapping)
+
+
+def build(customer_id):
+    pages = {name: history_page(name, customer_id) for name in HISTORIES}
+    return Statement(customer_id, totals(customer_id), pages)
+
+
+def get_statement(customer):
+    key = ('statement', customer.id, customer.updated_at)
+    return statement_cache.get_or_compute(key, lambda: build(customer.id))
+
+
+def request_pages(statement):
+    """The statement's history pages, re-queried where the request asks for a later page."""
+    pages = dict(statement.pages)
+    per_page = request.args.get('per_page', type=int)
+    for name, (_, _, cursor_arg) in HISTORIES.items():
+        cursor = request.args.get(cursor_arg)
+        if cursor or per_page:
+            pages[name] = history_page(name, statement.customer_id, cursor, per_page)
+    return pages
+
+
+def invalidate_on_commit(session, customer_ids):
+    for customer_id in customer_ids:
+        statement_cache.invalidate_on_commit(session, ('statement', customer_id))
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_on_history_writes(session, flush_context):
+    # Bulk INSERTs skip the flush; collection_service invalidates those itself.
+    customer_ids = {instance.customer_id for instance in (*session.new, *session.dirty, *session.deleted)
+                    if isinstance(instance, (LoanCollection, SavingCollection, Withdrawal)) and instance.customer_id}
+    invalidate_on_commit(session, customer_ids)
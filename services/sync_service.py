@@ -0,0 +1,151 @@
+"""Offline collection sync: idempotent uploads and balance deltas.
+
+A field officer's device records collections while offline, each with a
+client-generated UUID, and uploads the day's records in one request. A
+record is stored with its UUID in ``client_ref``, which has a unique index,
+so re-uploading a batch after a dropped connection reports the records as
+duplicates instead of collecting twice. Accepted records of a batch are
+written in one transaction through ``collection_service``.
+
+The response carries the balances of the officer's customers changed since
+the ``version`` the device sent last (``Customer.updated_at``), and the
+version to send next time.
+"""
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.money import to_money
+from services import collection_service
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
+import uuid
+import config
+
+KINDS = {'loan': LoanCollection, 'saving': SavingCollection}
+DELTA_FIELDS = ('id', 'member_no', 'name', 'remaining_loan', 'savings_balance')
+
+
+def parse_timestamp(value):
+    """ISO 8601 ``value`` as a naive UTC datetime (None stays None)."""
+    if value in (None, ''):
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid timestamp: {value!r}')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _parse(record, now):
+    if not isinstance(record, dict):
+        raise ValueError('Invalid record')
+    try:
+        ref = str(uuid.UUID(str(record.get('id'))))
+    except ValueError:
+        raise ValueError('id must be a UUID')
+    if record.get('type') not in KINDS:
+        raise ValueError("type must be 'loan' or 'saving'")
+    try:
+        customer_id = int(record['customer_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Invalid customer_id')
+    amount = to_money(record.get('amount'))
+    if amount <= 0:
+        raise ValueError('Amount must be positive')
+    # Device clocks run ahead; a collection cannot be later than its upload
+    collected_at = min(parse_timestamp(record.get('collected_at')) or now, now)
+    return ref, record['type'], customer_id, amount, collected_at
+
+
+def _existing_refs(refs):
+    found = set()
+    for model in KINDS.values():
+        found.update(ref for (ref,) in db.session.query(model.client_ref).filter(model.client_ref.in_(refs)))
+    return found
+
+
+def _apply(records, user):
+    now = datetime.utcnow()
+    parsed = []
+    for record in records:
+        try:
+            parsed.append(_parse(record, now))
+        except ValueError as error:
+            parsed.append(str(error))
+
+    valid = [entry for entry in parsed if not isinstance(entry, str)]
+    duplicates = _existing_refs({entry[0] for entry in valid}) if valid else set()
+    ids = {entry[2] for entry in valid}
+    customers = {c.id: c for c in Customer.query.filter(Customer.id.in_(ids))} if ids else {}
+
+    results, rows, seen = [], {'loan': [], 'saving': []}, set()
+    for record, entry in zip(records, parsed):
+        record_id = record.get('id') if isinstance(record, dict) else None
+        if isinstance(entry, str):
+            results.append({'id': record_id, 'status': 'rejected', 'error': entry})
+            continue
+        ref, kind, customer_id, amount, collected_at = entry
+        if ref in duplicates or ref in seen:
+            results.append({'id': record_id, 'status': 'duplicate'})
+            continue
+        customer = customers.get(customer_id)
+        error = None
+        if not customer:
+            error = 'Customer not found'
+        elif user.role == 'staff' and customer.staff_id != user.id:
+            error = 'Access denied'
+        elif kind == 'loan' and amount > customer.remaining_loan:
+            error = f'Loan amount exceeds remaining loan ({customer.remaining_loan})'
+        if error:
+            results.append({'id': record_id, 'status': 'rejected', 'error': error})
+            continue
+
+        seen.add(ref)
+        if kind == 'loan':
+            customer.remaining_loan -= amount
+        else:
+            customer.savings_balance += amount
+        rows[kind].append({'customer_id': customer_id, 'amount': amount, 'staff_id': user.id,
+                           'collection_date': collected_at, 'client_ref': ref})
+        results.append({'id': record_id, 'status': 'applied'})
+
+    collection_service.record_collections(rows['loan'], rows['saving'], user)
+    db.session.commit()
+    return results
+
+
+def apply(records, user):
+    """Apply a batch of uploaded collection records in one transaction.
+
+    Each record is ``{"id": uuid, "type": "loan" | "saving", "customer_id",
+    "amount", "collected_at"}``. Returns one ``{"id", "status", "error"}``
+    per record, status being ``applied``, ``duplicate`` (already uploaded)
+    or ``rejected``. Raises ValueError for a malformed batch.
+    """
+    if not isinstance(records, list):
+        raise ValueError('records must be a list')
+    if len(records) > config.SYNC_MAX_RECORDS:
+        raise ValueError(f'At most {config.SYNC_MAX_RECORDS} records per upload')
+    try:
+        return _apply(records, user)
+    except IntegrityError:
+        # The same records were uploaded concurrently and committed first;
+        # run again so they are reported as duplicates
+        db.session.rollback()
+        return _apply(records, user)
+
+
+def balance_delta(user, since=None):
+    """Balances of ``user``'s customers (every customer for an admin) changed
+    since ``since``, all of them without it, as compact rows of DELTA_FIELDS."""
+    version = datetime.utcnow() - timedelta(seconds=config.SYNC_OVERLAP)
+    query = db.session.query(*[getattr(Customer, field) for field in DELTA_FIELDS])
+    if user.role == 'staff':
+        query = query.filter(Customer.staff_id == user.id)
+    if since:
+        query = query.filter(Customer.updated_at >= since)
+    return {'version': version.isoformat(timespec='seconds') + 'Z', 'fields': DELTA_FIELDS,
+            'rows': [list(row) for row in query.order_by(Customer.id)]}
@@ -0,0 +1,142 @@
+"""Fixtures: the app against a throwaway database.
+
+``DATABASE_URL`` is pointed at a temporary SQLite file before ``app`` is
+imported (config reads it at import time); set ``TEST_DATABASE_URL`` to run
+against an empty Postgres database instead. Every test gets a freshly
+migrated database. On SQLite each kind of database is built once per session
+and copied into place for the tests that use it.
+"""
+import os
+import shutil
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix='ngo-tests-')
+DB_PATH = os.path.join(_TMP, 'test.db')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{DB_PATH}'
+# Cheap hashes; no statement timeout for the large fixtures
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+os.environ['DB_STATEMENT_TIMEOUT'] = '0'
+
+from app import app, CACHES
+from flask import g, request_started
+from models.user_model import db, User
+from services import auth_service, metrics_service, seed_service
+from services.migration_service import run_migrations
+from sqlalchemy import event, text
+import contextlib
+import pytest
+
+SQLITE = app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+# Members of the large fixture: about 100k loan and saving collections over two years
+SEEDED_CUSTOMERS = 1700
+
+_templates = {}
+
+
+def _drop():
+    db.session.remove()
+    db.engine.dispose()
+    if SQLITE:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
+    else:
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP SCHEMA public CASCADE'))
+            conn.execute(text('CREATE SCHEMA public'))
+
+
+def _build(name, fill):
+    """Replace the database with a migrated one filled by ``fill``."""
+    _drop()
+    if name in _templates:
+        shutil.copyfile(_templates[name], DB_PATH)
+    else:
+        run_migrations()
+        fill()
+        if SQLITE:
+            # Closing the last connection folds the WAL into the file
+            db.session.remove()
+            db.engine.dispose()
+            _templates[name] = os.path.join(_TMP, f'{name}.db')
+            shutil.copyfile(DB_PATH, _templates[name])
+    for cache in CACHES.values():
+        cache.invalidate_prefix()
+    metrics_service.reset()
+
+
+def _users():
+    password = auth_service.hash_password('secret')
+    db.session.add_all([User(name='Admin', email='admin@example.com', password=password, role='admin'),
+                        User(name='Staff One', email='staff1@example.com', password=password, role='staff'),
+                        User(name='Staff Two', email='staff2@example.com', password=password, role='staff')])
+    db.session.commit()
+
+
+def _seed():
+    seed_service.generate(SEEDED_CUSTOMERS, 10, 2, auth_service.hash_password)
+
+
+@pytest.fixture
+def database():
+    """An empty database with an admin and two staff members."""
+    with app.app_context():
+        _build('empty', _users)
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def seeded_database():
+    """``seed-demo`` data: about 100k collections, consistent balances."""
+    with app.app_context():
+        _build('seeded', _seed)
+        yield db
+        db.session.remove()
+
+
+def _forget_login(sender, **extra):
+    # Requests of a test share its app context, and Flask-Login keeps the
+    # user of the previous request in g; load each client's own
+    g.pop('_login_user', None)
+
+
+request_started.connect(_forget_login, app)
+
+
+@pytest.fixture
+def client_for():
+    """``client_for(user)``: a test client logged in as ``user``."""
+    def make(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return make
+
+
+@pytest.fixture
+def users(database):
+    """``{'admin': User, 'staff1': User, 'staff2': User}``"""
+    return {user.email.split('@')[0]: user for user in User.query}
+
+
+@contextlib.contextmanager
+def _counting():
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture
+def count_queries():
+    """``with count_queries() as statements:`` collects the SQL run inside."""
+    return _counting
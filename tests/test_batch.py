@@ -0,0 +1,37 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.money import to_money
+from services import collection_service
+
+
+def test_every_sheet_row_gets_a_result_in_order(users):
+    staff = users['staff1']
+    customers = [Customer(name=f'Member {n}', staff=staff, total_loan=to_money(500), remaining_loan=to_money(500))
+                 for n in range(3)]
+    db.session.add_all(customers)
+    db.session.commit()
+    first, second, third = (customer.id for customer in customers)
+    rows = [{'customer_id': first, 'loan_amount': '50', 'saving_amount': ''},
+            {'customer_id': second, 'loan_amount': '', 'saving_amount': '0'},
+            {'customer_id': 999999, 'loan_amount': '10'},
+            {'customer_id': third, 'loan_amount': '0', 'saving_amount': '20'},
+            {'customer_id': second}]
+
+    results = collection_service.apply_batch(rows, staff)
+    assert len(results) == len(rows)
+    assert [(r.customer_id, r.status) for r in results] == [
+        (first, 'ok'), (second, 'skipped'), (999999, 'rejected'), (third, 'ok'), (second, 'skipped')]
+    assert results[1].to_dict()['status'] == 'skipped'
+    assert results[1].remaining_loan == to_money(500)
+
+
+def test_batch_json_counts_skipped_rows(users, client_for):
+    staff = users['staff1']
+    customer = Customer(name='Member', staff=staff, total_loan=to_money(500), remaining_loan=to_money(500))
+    db.session.add(customer)
+    db.session.commit()
+    response = client_for(staff).post('/collection/batch', json={'rows': [
+        {'customer_id': customer.id, 'loan_amount': '25'}, {'customer_id': customer.id}]})
+    body = response.get_json()
+    assert (body['accepted'], body['rejected'], body['skipped']) == (1, 0, 1)
+    assert [row['status'] for row in body['rows']] == ['ok', 'skipped']
@@ -0,0 +1,82 @@
+from app import app
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.cash_balance_model import CashBalance
+from models.money import to_money
+from services import cash_service
+import threading
+
+THREADS = 8
+ROUNDS = 15
+
+
+def test_concurrent_collections_lose_no_cash(users, client_for):
+    staff = users['staff1']
+    customers = [Customer(name=f'Member {n}', staff=staff, total_loan=to_money(100000),
+                          remaining_loan=to_money(100000)) for n in range(THREADS)]
+    db.session.add_all(customers)
+    db.session.commit()
+    cash_service.record(to_money(1000), 'investment')
+    db.session.commit()
+    # The opening balance is already folded into the checkpoint row
+    assert cash_service.checkpoint() == 1
+    clients = {customer.id: client_for(staff) for customer in customers}
+
+    start, statuses = threading.Barrier(THREADS), []
+
+    def collect(customer_id, client):
+        start.wait()
+        for _ in range(ROUNDS):
+            for path, amount in (('/loan_collection/collect', '12.50'), ('/saving_collection/collect', '7.25')):
+                response = client.post(path, data={'customer_id': customer_id, 'amount': amount})
+                statuses.append(response.status_code)
+
+    done = threading.Event()
+
+    def fold():
+        # The checkpoint runs alongside, as from cron
+        with app.app_context():
+            while not done.is_set():
+                cash_service.checkpoint()
+            db.session.remove()
+
+    threads = [threading.Thread(target=collect, args=item) for item in clients.items()]
+    folder = threading.Thread(target=fold)
+    folder.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    folder.join()
+
+    assert statuses == [302] * (THREADS * ROUNDS * 2)
+    # Failed collections redirect too, with a flash; the totals tell them apart
+    db.session.expire_all()
+    collected = (to_money('12.50') + to_money('7.25')) * THREADS * ROUNDS
+    assert cash_service.current_balance() == to_money(1000) + collected
+    assert db.session.query(db.func.count(CashLedgerEntry.id)).scalar() == 1 + THREADS * ROUNDS * 2
+    assert db.session.query(db.func.sum(LoanCollection.amount)).scalar() == to_money('12.50') * THREADS * ROUNDS
+    assert db.session.query(db.func.sum(SavingCollection.amount)).scalar() == to_money('7.25') * THREADS * ROUNDS
+    for customer in Customer.query:
+        assert customer.remaining_loan == to_money(100000) - to_money('12.50') * ROUNDS
+        assert customer.savings_balance == to_money('7.25') * ROUNDS
+
+
+def test_entries_committed_after_a_checkpoint_are_not_lost(users):
+    for entry_id in (1, 2, 4):
+        db.session.add(CashLedgerEntry(id=entry_id, amount=to_money(100), entry_type='investment'))
+    db.session.commit()
+    assert cash_service.checkpoint() == 3
+
+    # Entry 3 got its id first but its transaction commits only now
+    db.session.add(CashLedgerEntry(id=3, amount=to_money(25), entry_type='investment'))
+    db.session.commit()
+    assert cash_service.current_balance() == to_money(325)
+    assert cash_service.checkpoint() == 1
+    assert cash_service.current_balance() == to_money(325)
+    assert CashBalance.query.one().balance == to_money(325)
+    assert cash_service.checkpoint() == 0
@@ -0,0 +1,38 @@
+from app import app
+from models.report_job_model import ReportJob
+import pytest
+
+BAD_DATES = ['2026-13-01', 'yesterday', '2026-02-30', '17/10/2026']
+
+PAGES = [
+    '/export?dataset=loan_collections&format=csv&from={date}',
+    '/export?dataset=expenses&format=csv&to={date}',
+    '/withdrawal_report?from_date={date}',
+    '/withdrawal_report?to_date={date}',
+    '/profit_loss?from={date}',
+    '/arrears?as_of={date}',
+]
+
+
+@pytest.mark.parametrize('page', PAGES)
+@pytest.mark.parametrize('date', BAD_DATES)
+def test_bad_dates_redirect_with_a_message(users, client_for, page, date):
+    client = client_for(users['admin'])
+    response = client.get(page.format(date=date))
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][-1][1].startswith('Invalid date')
+
+
+@pytest.mark.parametrize('form', [{'dataset': 'loan_collections', 'format': 'csv', 'from': '2026-13-01'},
+                                  {'dataset': 'profit_loss', 'format': 'html', 'to': 'yesterday'}])
+def test_bad_dates_queue_no_report_job(users, client_for, form):
+    response = client_for(users['admin']).post('/reports/jobs', data=form)
+    assert response.status_code == 302
+    assert ReportJob.query.count() == 0
+
+
+def test_rebuild_ledger_rejects_a_bad_date(database):
+    result = app.test_cli_runner().invoke(args=['rebuild-ledger', '--start', '2026-13-01'])
+    assert result.exit_code != 0
+    assert 'Invalid value' in result.output
@@ -0,0 +1,58 @@
+from app import CACHES
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.money import to_money
+from datetime import datetime, timedelta
+import statistics
+import time
+
+TODAY_ROWS = 20
+HISTORY_ROWS = 60000
+# (role, path); the daily report is the admin's
+PAGES = [('admin', '/daily_collections'), ('admin', '/daily_report'), ('admin', '/dashboard'),
+         ('staff', '/daily_collections'), ('staff', '/dashboard')]
+
+
+def add_collections(customer, staff, count, first, step):
+    rows = [{'customer_id': customer.id, 'staff_id': staff.id, 'amount': to_money(100),
+             'collection_date': first + step * number} for number in range(count)]
+    db.session.execute(db.insert(LoanCollection), rows)
+    db.session.execute(db.insert(SavingCollection), rows)
+    db.session.commit()
+
+
+def timed(client, path, repeat=15):
+    """Median milliseconds of ``path``, computed afresh each time."""
+    timings = []
+    for _ in range(repeat):
+        for cache in CACHES.values():
+            cache.invalidate_prefix()
+        started = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, path
+    return statistics.median(timings)
+
+
+def test_day_scoped_pages_do_not_slow_down_with_history(users, client_for):
+    staff = users['staff1']
+    customer = Customer(name='Member', staff=staff, remaining_loan=to_money(100000))
+    db.session.add(customer)
+    db.session.commit()
+    now = datetime.now()
+    add_collections(customer, staff, TODAY_ROWS, now.replace(hour=0, minute=1), timedelta(minutes=1))
+    clients = {'admin': client_for(users['admin']), 'staff': client_for(staff)}
+
+    def measure():
+        return {(role, path): timed(clients[role], path) for role, path in PAGES}
+
+    before = measure()
+    # Two years of earlier collections, a few minutes apart
+    add_collections(customer, staff, HISTORY_ROWS, now - timedelta(days=730), timedelta(minutes=17))
+    after = measure()
+    for key, median in after.items():
+        # A scan of the whole history would be many times slower
+        assert median < before[key] * 3 + 5, (key, before[key], median)
@@ -0,0 +1,99 @@
+"""The report and listing queries the indexes were added for use them.
+
+Every statement a page runs is captured with its parameters and explained
+on the same database: on SQLite no step of the plan may scan one of the hot
+tables without an index; on Postgres, with sequential scans disabled so the
+tables' size does not matter, none may be a ``Seq Scan`` of one.
+"""
+from models.user_model import db, User
+from models.customer_model import Customer
+from sqlalchemy import event
+import json
+import pytest
+
+HOT_TABLES = ('loan_collections', 'saving_collections', 'customers', 'loans', 'loan_installments',
+              'expenses', 'withdrawals', 'messages', 'cash_ledger_entries')
+
+# (role, path) whose queries filter or order the hot tables
+PAGES = [
+    ('staff', '/dashboard'),
+    ('staff', '/daily_collections'),
+    ('admin', '/daily_collections'),
+    ('staff', '/loan_collections_history'),
+    ('admin', '/loan_collections_history?staff_id={staff}'),
+    ('staff', '/collections'),
+    ('staff', '/customers'),
+    ('admin', '/loans?staff_id={staff}'),
+    ('staff', '/messages'),
+    ('staff', '/arrears'),
+    ('admin', '/daily_report'),
+    ('admin', '/withdrawal_report'),
+    ('admin', '/manage_withdrawals'),
+    ('admin', '/expenses'),
+    ('admin', '/customer_details/{customer}'),
+]
+
+
+def whole_table_aggregate(statement):
+    # Totals over every row have nothing to look up; a full pass is the plan
+    return ' WHERE ' not in statement and ' ORDER BY ' not in statement
+
+
+def captured_selects(client, path):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get(path)
+        response.get_data()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    assert response.status_code == 200, path
+    return statements
+
+
+def unindexed_scans(statement, parameters):
+    """Plan steps that read a hot table without an index."""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if db.engine.dialect.name == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            nodes, found = [plan[0]['Plan']], []
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get('Plans', []))
+                if node['Node Type'] == 'Seq Scan' and node['Relation Name'] in HOT_TABLES:
+                    found.append(f"Seq Scan on {node['Relation Name']}")
+            return found
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        details = [row[-1] for row in cursor.fetchall()]
+        return [detail for detail in details
+                if detail.split()[:1] == ['SCAN'] and detail.split()[1] in HOT_TABLES and ' USING ' not in detail]
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+@pytest.mark.parametrize('role,path', PAGES)
+def test_page_queries_use_indexes(seeded_database, client_for, role, path):
+    staff = User.query.filter(User.role == 'staff', User.customers.any()).first()
+    customer = Customer.query.filter_by(staff_id=staff.id).filter(Customer.total_loan > 0).first()
+    client = client_for(User.query.filter_by(role='admin').first() if role == 'admin' else staff)
+    path = path.format(staff=staff.id, customer=customer.id)
+
+    problems = []
+    for statement, parameters in captured_selects(client, path):
+        if whole_table_aggregate(' '.join(statement.split())):
+            continue
+        scans = unindexed_scans(statement, parameters)
+        if scans:
+            problems.append((' '.join(statement.split())[:300], scans))
+    assert problems == []
@@ -0,0 +1,63 @@
+from app import app
+from models.user_model import db
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from models.money import to_money
+from services import ledger_service
+import threading
+
+THREADS = 8
+WRITES = 25
+
+
+def record_concurrently(*writes):
+    """Each thread commits every ``(staff_id, amounts)`` of ``writes`` WRITES
+    times, all starting together on a day without a summary row."""
+    start, errors = threading.Barrier(THREADS), []
+
+    def work():
+        with app.app_context():
+            try:
+                start.wait()
+                for _ in range(WRITES):
+                    for staff_id, amounts in writes:
+                        ledger_service.record(staff_id, **amounts)
+                        db.session.commit()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=work) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_record_adds_to_the_day_row(users):
+    staff = users['staff1']
+    ledger_service.record(staff.id, loan_collected=to_money(1))
+    ledger_service.record(staff.id, loan_collected=to_money('10.25'), saving_collected=to_money(5))
+    ledger_service.record(expenses=to_money(3))
+    ledger_service.record(expenses=to_money(4))
+    db.session.commit()
+    rows = {row.staff_id: row for row in DailyLedgerSummary.query}
+    assert len(rows) == 2
+    assert rows[staff.id].loan_collected == to_money('11.25')
+    assert rows[staff.id].saving_collected == to_money(5)
+    assert rows[None].expenses == to_money(7)
+
+
+def test_concurrent_records_lose_no_increments(users):
+    staff_ids = [users['staff1'].id, users['staff2'].id]
+    record_concurrently((staff_ids[0], {'loan_collected': to_money(10)}),
+                        (staff_ids[1], {'saving_collected': to_money('2.50')}),
+                        (None, {'expenses': to_money(1)}))
+
+    db.session.expire_all()
+    rows = {row.staff_id: row for row in DailyLedgerSummary.query}
+    assert set(rows) == {staff_ids[0], staff_ids[1], None}
+    assert rows[staff_ids[0]].loan_collected == to_money(10) * THREADS * WRITES
+    assert rows[staff_ids[1]].saving_collected == to_money('2.50') * THREADS * WRITES
+    assert rows[None].expenses == to_money(1) * THREADS * WRITES
@@ -0,0 +1,75 @@
+from app import CACHES
+from models.user_model import db, User
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from models.money import to_money
+from datetime import datetime, timedelta
+import pytest
+
+LISTINGS = [
+    '/collections',
+    '/daily_collections',
+    '/loan_collections_history',
+    '/loans',
+    '/customers',
+    '/loan_customers',
+    '/manage_withdrawals',
+    '/customer_details/{customer}',
+    '/customer_details_print/{customer}',
+    '/export?dataset=loan_collections&format=csv',
+    '/export?dataset=saving_collections&format=csv',
+    '/export?dataset=loans&format=csv',
+    '/export?dataset=customers&format=csv',
+]
+
+
+def add_rows(count, member):
+    """``count`` staff members, each with a customer, a loan, collections and
+    a withdrawal, and a collection of ``member`` - so every new row points at
+    a customer and a staff member no earlier row did."""
+    now = datetime.utcnow()
+    for _ in range(count):
+        staff = User(name='Officer', email=f'officer{User.query.count()}@example.com', password='x', role='staff')
+        customer = Customer(name='Member', staff=staff, total_loan=to_money(1100), remaining_loan=to_money(1000),
+                            savings_balance=to_money(50))
+        loan = Loan(customer=customer, customer_name=customer.name, amount=to_money(1000), due_date=now + timedelta(days=90),
+                    installment_count=10, outstanding=to_money(1000), staff=staff)
+        db.session.add_all([
+            staff, customer, loan,
+            LoanCollection(customer=customer, loan=loan, amount=to_money(100), staff=staff, collection_date=now),
+            SavingCollection(customer=customer, amount=to_money(50), staff=staff, collection_date=now),
+            LoanCollection(customer=member, amount=to_money(10), staff=staff, collection_date=now),
+            SavingCollection(customer=member, amount=to_money(10), staff=staff, collection_date=now),
+            Withdrawal(customer=customer, amount=to_money(20), withdrawal_type='savings', date=now),
+        ])
+    db.session.commit()
+
+
+def page_queries(client, count_queries, path):
+    # The test client shares the test's app context and so its session
+    db.session.expire_all()
+    for cache in CACHES.values():
+        cache.invalidate_prefix()
+    with count_queries() as statements:
+        response = client.get(path)
+        response.get_data()
+    assert response.status_code == 200, path
+    return len(statements)
+
+
+@pytest.mark.parametrize('path', LISTINGS)
+def test_queries_per_page_do_not_grow_with_rows(users, client_for, count_queries, path):
+    member = Customer(name='Regular', staff=users['staff1'], total_loan=to_money(0))
+    db.session.add(member)
+    add_rows(3, member)
+    path = path.format(customer=member.id)
+    client = client_for(users['admin'])
+    # The first request also loads the logged-in user
+    client.get('/dashboard')
+
+    few = page_queries(client, count_queries, path)
+    add_rows(30, member)
+    assert page_queries(client, count_queries, path) == few
@@ -0,0 +1,86 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_installment_model import LoanInstallment
+from models.daily_ledger_summary_model import DailyLedgerSummary
+from models.money import to_money
+from services import ledger_service, loan_service, reconcile_service
+from datetime import datetime, timedelta
+
+
+def add_loans(staff, *outstanding):
+    customer = Customer(name='Member', staff=staff, total_loan=sum(outstanding), remaining_loan=sum(outstanding))
+    now = datetime.utcnow()
+    loans = [Loan(customer=customer, customer_name=customer.name, amount=amount, due_date=now + timedelta(days=90),
+                  loan_date=now - timedelta(days=len(outstanding) - number), outstanding=amount, staff=staff)
+             for number, amount in enumerate(outstanding)]
+    db.session.add_all([customer, *loans])
+    db.session.commit()
+    return customer, loans
+
+
+def test_collection_that_clears_a_loan_marks_it_paid(users):
+    customer, (first, second) = add_loans(users['staff1'], to_money(300), to_money(500))
+    assert loan_service.apply_collection(customer.id, to_money(400)) == first.id
+    db.session.commit()
+    assert (first.status, first.outstanding) == ('Paid', 0)
+    assert (second.status, second.outstanding) == ('Pending', to_money(400))
+
+    loan_service.apply_collection(customer.id, to_money(400))
+    db.session.commit()
+    assert (second.status, second.outstanding) == ('Paid', 0)
+
+
+def test_paid_follows_a_balance_lowered_concurrently(users, monkeypatch):
+    customer, (loan,) = add_loans(users['staff1'], to_money(500))
+    read_loans = loan_service.open_loans
+
+    def open_loans_then_concurrent_collection(customer_ids):
+        loans = read_loans(customer_ids)
+        # Another request collects 200 after these loans were read
+        with db.engine.begin() as conn:
+            conn.execute(db.update(Loan).where(Loan.id == loan.id).values(outstanding=Loan.outstanding - to_money(200)))
+        return loans
+
+    monkeypatch.setattr(loan_service, 'open_loans', open_loans_then_concurrent_collection)
+    loan_service.apply_collection(customer.id, to_money(300))
+    db.session.commit()
+    assert (loan.status, loan.outstanding) == ('Paid', 0)
+
+
+def ledger_rows():
+    rows = db.session.query(DailyLedgerSummary).order_by(DailyLedgerSummary.date, DailyLedgerSummary.staff_id)
+    return [(row.date, row.staff_id, *[getattr(row, field) or 0 for field in ledger_service.LEDGER_FIELDS]) for row in rows]
+
+
+def test_edited_loan_terms_leave_nothing_to_reconcile(users, client_for):
+    staff, admin = users['staff1'], client_for(users['admin'])
+    customer = Customer(name='Member', staff=staff)
+    db.session.add(customer)
+    db.session.commit()
+    admin.post('/cash_balance', data={'action': 'add', 'amount': '50000', 'investor_name': 'Investor'})
+    loan_date = datetime.utcnow() - timedelta(days=20)
+    admin.post('/loan/add', data={'customer_id': customer.id, 'amount': '10000', 'interest': '10', 'service_charge': '100',
+                                  'welfare_fee': '20', 'loan_date': loan_date.strftime('%Y-%m-%d'),
+                                  'due_date': (loan_date + timedelta(days=70)).strftime('%Y-%m-%d'),
+                                  'installment_count': '10', 'installment_amount': '1110', 'installment_type': 'weekly'})
+    client_for(staff).post('/loan_collection/collect', data={'customer_id': customer.id, 'amount': '1500'})
+    loan = Loan.query.one()
+    form = {'customer_name': 'Member', 'due_date': loan.due_date.strftime('%Y-%m-%d'), 'status': 'Pending'}
+
+    response = client_for(staff).post(f'/loan/edit/{loan.id}', data={**form, 'amount': '1', 'interest': '0'})
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert loan.amount == to_money(10000)
+
+    for amount, interest in (('12000', '12.5'), ('4000', '5'), ('9000.55', '10')):
+        assert admin.post(f'/loan/edit/{loan.id}', data={**form, 'amount': amount, 'interest': interest}).status_code == 302
+        db.session.expire_all()
+        assert list(reconcile_service.diff_rows()) == [], (amount, interest)
+        assert loan.outstanding == loan_service.loan_total(loan) - to_money(1500)
+        installments = LoanInstallment.query.filter_by(loan_id=loan.id).all()
+        assert sum(i.amount - i.paid_amount for i in installments if i.status == 'open') == loan.outstanding
+        assert sum(i.amount for i in installments) == loan_service.loan_total(loan)
+        before = ledger_rows()
+        ledger_service.rebuild()
+        assert ledger_rows() == before
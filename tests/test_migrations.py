@@ -0,0 +1,15 @@
+from services import migration_service
+from services.migration_service import run_migrations
+
+
+def test_migrations_applied_as_a_dependency_are_reported(database, monkeypatch):
+    ran = []
+    monkeypatch.setattr(migration_service, 'MIGRATIONS', migration_service.MIGRATIONS + [
+        (101, 'Needs 102 first', lambda: (migration_service._require(102), ran.append(101))),
+        (102, 'Applied early', lambda: ran.append(102)),
+    ])
+    messages = []
+    assert run_migrations(echo=messages.append) == [101, 102]
+    assert ran == [102, 101]
+    assert messages == ['Applying migration 101: Needs 102 first', 'Applying migration 102: Applied early']
+    assert run_migrations(echo=messages.append) == []
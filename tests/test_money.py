@@ -0,0 +1,96 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.money import Money, MAX_AMOUNT, PAISA, to_money
+from services import cash_service
+from decimal import Decimal
+import random
+import pytest
+
+TRANSACTIONS = 1000000
+
+
+def random_amount(rng, digits=None):
+    # Whole paisa from 0.01 up to MAX_AMOUNT, with any number of digits
+    digits = digits or rng.randint(1, len(str(int(MAX_AMOUNT / PAISA))))
+    paisa = rng.randint(1, min(10 ** digits - 1, int(MAX_AMOUNT / PAISA)))
+    return (Decimal(paisa) * PAISA) * rng.choice((1, -1))
+
+
+def test_to_money_round_trips_through_the_column():
+    rng = random.Random(18)
+    column = Money()
+    for _ in range(20000):
+        amount = random_amount(rng)
+        for value in (amount, str(amount), f'  {amount}  '):
+            assert to_money(value) == amount
+        assert column.process_result_value(column.process_bind_param(amount, None), None) == amount
+        # At most 15 significant digits, which a float keeps
+        assert to_money(float(amount)) == amount
+        # Half a paisa rounds away from zero, less than half towards it
+        sign = Decimal(1).copy_sign(amount)
+        assert to_money(amount - sign * Decimal('0.004')) == amount
+        if abs(amount) > PAISA:
+            assert to_money(amount - sign * Decimal('0.005')) == amount
+            assert to_money(amount - sign * Decimal('0.006')) == amount - sign * PAISA
+
+
+def test_to_money_rounds_half_up_to_the_paisa():
+    assert to_money('0.005') == Decimal('0.01')
+    assert to_money('0.004') == Decimal('0.00')
+    assert to_money('-0.005') == Decimal('-0.01')
+    assert to_money(0.1) + to_money(0.2) == to_money('0.3')
+    assert to_money('') == to_money(None) == Decimal('0.00')
+    assert to_money(MAX_AMOUNT) == MAX_AMOUNT
+
+
+@pytest.mark.parametrize('value', ['1e30', '1e19', '-1e19', str(MAX_AMOUNT + PAISA), 'nan', 'NaN', 'inf', '-Infinity',
+                                   'sNaN', 'abc', '1,000', '12.5.0', float('inf'), float('nan'), 1e300, 10 ** 20])
+def test_to_money_rejects_what_the_column_cannot_hold(value):
+    with pytest.raises(ValueError):
+        to_money(value)
+
+
+def test_routes_reject_oversized_amounts(users, client_for):
+    staff = users['staff1']
+    customer = Customer(name='Member', staff=staff, total_loan=to_money(100), remaining_loan=to_money(100))
+    db.session.add(customer)
+    db.session.commit()
+    client = client_for(staff)
+    for amount in ('1e30', '1e19', 'nan'):
+        response = client.post('/saving_collection/collect', data={'customer_id': customer.id, 'amount': amount})
+        assert response.status_code == 302
+        response = client.post('/loan_collection/collect', data={'customer_id': customer.id, 'amount': amount})
+        assert response.status_code == 302
+        response = client.post('/collection/batch', json={'rows': [{'customer_id': customer.id, 'saving_amount': amount}]})
+        assert response.status_code == 200
+        assert response.get_json()['rows'][0]['status'] == 'rejected'
+        record = {'id': '7a3c1c7e-5f6e-4c86-9a57-0d9f2b1b6a10', 'type': 'saving', 'customer_id': customer.id, 'amount': amount}
+        response = client.post('/sync/collections', json={'records': [record]})
+        assert response.status_code == 200
+        assert response.get_json()['results'][0]['status'] == 'rejected'
+    db.session.expire_all()
+    assert (customer.remaining_loan, customer.savings_balance) == (to_money(100), 0)
+    assert cash_service.current_balance() == 0
+
+
+def test_a_million_random_transactions_reconcile(database):
+    rng = random.Random(2018)
+    expected, by_type = Decimal(0), {'in': Decimal(0), 'out': Decimal(0)}
+    for offset in range(0, TRANSACTIONS, 50000):
+        rows = []
+        for _ in range(50000):
+            # Everyday amounts, with the fractions that drift as floats
+            amount = to_money(Decimal(rng.randint(1, 5000000)) / 100 / rng.choice((1, 3, 7)))
+            kind = rng.choice(('in', 'out'))
+            amount = amount if kind == 'in' else -amount
+            expected += amount
+            by_type[kind] += amount
+            rows.append({'amount': amount, 'entry_type': kind})
+        db.session.execute(db.insert(CashLedgerEntry), rows)
+    db.session.commit()
+
+    assert cash_service.current_balance() == expected
+    totals = dict(db.session.query(CashLedgerEntry.entry_type, db.func.sum(CashLedgerEntry.amount)).group_by(CashLedgerEntry.entry_type))
+    assert totals == by_type
+    assert db.session.query(db.func.count(CashLedgerEntry.id)).scalar() == TRANSACTIONS
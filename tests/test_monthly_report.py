@@ -0,0 +1,73 @@
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.withdrawal_model import Withdrawal
+from models.expense_model import Expense
+from services.report_service import monthly_report_context
+from datetime import date, datetime
+import calendar
+import pytest
+
+
+def per_day_report(year, month):
+    """The monthly report as it used to be computed: six queries per day,
+    summed in Python. Kept as the reference for correctness and speed."""
+    daily_data = {}
+    running_balance = 0
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        day_start = datetime(year, month, day)
+        day_end = datetime(year, month, day, 23, 59, 59)
+        loan_collections = LoanCollection.query.filter(LoanCollection.collection_date >= day_start, LoanCollection.collection_date <= day_end).all()
+        saving_collections = SavingCollection.query.filter(SavingCollection.collection_date >= day_start, SavingCollection.collection_date <= day_end).all()
+        loans_given = Loan.query.filter(Loan.loan_date >= day_start, Loan.loan_date <= day_end).all()
+        withdrawals = Withdrawal.query.filter(Withdrawal.date >= day_start, Withdrawal.date <= day_end).all()
+        expenses = Expense.query.filter(Expense.date >= day_start, Expense.date <= day_end).all()
+        customers_added = Customer.query.filter(Customer.created_date >= day_start, Customer.created_date <= day_end).all()
+
+        installments = sum(lc.amount for lc in loan_collections)
+        savings = sum(sc.amount for sc in saving_collections)
+        loan_given = sum(l.amount for l in loans_given)
+        service_charge = sum(l.service_charge for l in loans_given)
+        admission_fee = sum(c.admission_fee for c in customers_added)
+        savings_return = sum(w.amount for w in withdrawals)
+        expenses_total = sum(e.amount for e in expenses)
+        total_expense = loan_given + savings_return + expenses_total
+        running_balance += installments + savings + service_charge + admission_fee - total_expense
+        daily_data[day] = {'installments': installments, 'savings': savings, 'loan_given': loan_given,
+                           'service_charge': service_charge, 'admission_fee': admission_fee,
+                           'savings_return': savings_return, 'expenses': expenses_total, 'balance': running_balance}
+    return daily_data
+
+
+def busiest_month():
+    first = LoanCollection.query.order_by(LoanCollection.collection_date).first().collection_date
+    # A full month well inside the seeded history
+    month = date(first.year, first.month, 1)
+    year, month = divmod(month.year * 12 + month.month - 1 + 6, 12)
+    return year, month + 1
+
+
+def test_matches_per_day_queries(seeded_database):
+    year, month = busiest_month()
+    expected = per_day_report(year, month)
+    report = monthly_report_context(year, month)
+    assert report['last_day'] == len(expected)
+    assert sum(day['installments'] for day in expected.values()) > 0
+    for day, values in expected.items():
+        for field, amount in values.items():
+            assert report['daily_data'][day][field] == amount, (day, field)
+
+
+def test_query_count_does_not_depend_on_days(seeded_database, count_queries):
+    year, month = busiest_month()
+    with count_queries() as statements:
+        monthly_report_context(year, month)
+    assert len(statements) <= 3
+
+
+@pytest.mark.parametrize('implementation', [monthly_report_context, per_day_report], ids=['grouped', 'per_day'])
+def test_benchmark(seeded_database, benchmark, implementation):
+    benchmark.group = 'monthly_report'
+    year, month = busiest_month()
+    benchmark.pedantic(implementation, args=(year, month), rounds=5, warmup_rounds=1)
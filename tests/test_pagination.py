@@ -0,0 +1,50 @@
+from models.user_model import db
+from models.customer_model import Customer
+from services.pagination import decode_cursor, encode_cursor, keyset_paginate
+from datetime import datetime, timedelta
+import pytest
+
+
+def all_pages(per_page):
+    ids, cursor = [], None
+    while True:
+        page = keyset_paginate(Customer.query, Customer.created_date, Customer.id, cursor=cursor, per_page=per_page)
+        ids.extend(customer.id for customer in page.items)
+        if not page.has_next:
+            return ids
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize('per_page', [1, 2, 3, 4, 50])
+def test_rows_without_a_date_are_listed_last(users, per_page):
+    now = datetime.utcnow()
+    dates = [now, None, now - timedelta(days=1), None, now, None, now - timedelta(days=2)]
+    customers = [Customer(name=f'Member {n}', staff=users['staff1'], created_date=when) for n, when in enumerate(dates)]
+    db.session.add_all(customers)
+    db.session.commit()
+    # Imported rows: the column default does not apply
+    undated = [customer.id for customer, when in zip(customers, dates) if when is None]
+    db.session.query(Customer).filter(Customer.id.in_(undated)).update({Customer.created_date: None})
+    db.session.commit()
+
+    dated = sorted((c for c in customers if c.id not in undated), key=lambda c: (c.created_date, c.id), reverse=True)
+    assert all_pages(per_page) == [c.id for c in dated] + sorted(undated, reverse=True)
+
+
+def test_cursor_round_trips_a_missing_date():
+    assert decode_cursor(encode_cursor(None, 42)) == (None, 42)
+    when = datetime(2026, 10, 17, 8, 30)
+    assert decode_cursor(encode_cursor(when, 7)) == (when, 7)
+
+
+def test_listing_pages_with_undated_rows(users, client_for):
+    staff = users['staff1']
+    db.session.add_all([Customer(name=f'Member {n}', staff=staff) for n in range(3)])
+    db.session.commit()
+    db.session.query(Customer).update({Customer.created_date: None})
+    db.session.commit()
+    client = client_for(staff)
+    response = client.get('/customers?per_page=2')
+    assert response.status_code == 200
+    cursor = encode_cursor(None, max(c.id for c in Customer.query))
+    assert client.get(f'/customers?per_page=2&cursor={cursor}').status_code == 200
@@ -0,0 +1,113 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_collection_model import LoanCollection
+from models.saving_collection_model import SavingCollection
+from models.investment_model import Investment
+from models.cash_balance_model import CashBalance
+from models.cash_ledger_entry_model import CashLedgerEntry
+from models.schema_migration_model import SchemaMigration
+from models.money import to_money
+from services import cash_service, reconcile_service
+from services.migration_service import run_migrations
+from datetime import datetime, timedelta
+import time
+
+CUSTOMERS = 100000
+# Generous bound: the whole reconciliation is a handful of GROUP BY queries
+SECONDS = 60
+
+
+def test_seeded_database_has_no_drift(seeded_database):
+    assert list(reconcile_service.diff_rows()) == []
+    assert reconcile_service.repair() == (0, 0)
+    assert list(reconcile_service.diff_rows()) == []
+
+
+def test_reconciles_100k_customers(users):
+    staff = users['staff1']
+    now = datetime.utcnow()
+    loan, collected, saved = to_money(1000), to_money('99.95'), to_money('20.10')
+    db.session.execute(db.insert(Customer), [
+        {'name': f'Member {n}', 'member_no': str(n), 'staff_id': staff.id, 'total_loan': loan,
+         'remaining_loan': loan - collected, 'savings_balance': saved} for n in range(CUSTOMERS)])
+    ids = [id for (id,) in db.session.query(Customer.id).order_by(Customer.id)]
+    db.session.execute(db.insert(Loan), [
+        {'customer_id': id, 'customer_name': f'Member {n}', 'amount': loan, 'interest': 0, 'outstanding': loan - collected,
+         'due_date': now + timedelta(days=90), 'staff_id': staff.id} for n, id in enumerate(ids)])
+    db.session.execute(db.insert(LoanCollection), [
+        {'customer_id': id, 'amount': collected, 'staff_id': staff.id} for id in ids])
+    db.session.execute(db.insert(SavingCollection), [
+        {'customer_id': id, 'amount': saved, 'staff_id': staff.id} for id in ids])
+    # The investment all went out as the loans; the collections are the cash in hand
+    db.session.add(Investment(investor_name='Investor', amount=loan * CUSTOMERS))
+    cash_service.record(collected * CUSTOMERS, 'loan_collection')
+    cash_service.record(saved * CUSTOMERS, 'saving_collection')
+    db.session.commit()
+
+    started = time.monotonic()
+    assert list(reconcile_service.diff_rows()) == []
+    assert time.monotonic() - started < SECONDS
+
+    drifted = ids[::10000]
+    db.session.execute(db.update(Customer).where(Customer.id.in_(drifted)).values(remaining_loan=Customer.remaining_loan + 1))
+    cash_service.record(to_money('-0.35'), 'expense')
+    db.session.commit()
+    rows = list(reconcile_service.diff_rows())
+    assert rows[0][2:] == ['cash_balance', cash_service.current_balance(), cash_service.current_balance() + to_money('0.35'),
+                           to_money('0.35')]
+    assert [(row[0], row[2], row[5]) for row in rows[1:]] == [(str(ids.index(id)), 'remaining_loan', to_money(-1)) for id in drifted]
+
+    started = time.monotonic()
+    assert reconcile_service.repair() == (len(drifted), to_money('0.35'))
+    assert time.monotonic() - started < SECONDS
+    db.session.expire_all()
+    assert list(reconcile_service.diff_rows()) == []
+
+
+def test_upgrade_books_the_cash_history_before_the_ledger(users, client_for):
+    admin = users['admin']
+    client = client_for(admin)
+    client.post('/cash_balance', data={'action': 'add', 'amount': '100000', 'investor_name': 'Investor'})
+    client.post('/customer/add', data={'name': 'Rahim', 'phone': '017', 'member_no': '1', 'admission_fee': '50'})
+    customer = Customer.query.one()
+    due = (datetime.now() + timedelta(days=90)).strftime('%Y-%m-%d')
+    client.post('/loan/add', data={'customer_id': customer.id, 'amount': '10000', 'interest': '10', 'service_charge': '100',
+                                   'welfare_fee': '25', 'loan_date': datetime.now().strftime('%Y-%m-%d'), 'due_date': due,
+                                   'installment_count': '10', 'installment_amount': '1110', 'installment_type': 'weekly'})
+    client.post('/loan_collection/collect', data={'customer_id': customer.id, 'amount': '1110.10'})
+    db.session.expire_all()
+    assert list(reconcile_service.diff_rows()) == []
+
+    # What a database from before the cash ledger looks like once migration 2
+    # made its cash_balance the checkpoint: no entries, the welfare fee in the
+    # cash but not on the loan, and a manual 'subtract' nothing recorded
+    balance = cash_service.current_balance() - to_money(10)
+    db.session.query(CashLedgerEntry).delete()
+    db.session.query(CashBalance).delete()
+    db.session.add(CashBalance(balance=balance, last_entry_id=0))
+    db.session.query(Loan).update({Loan.welfare_fee: 0})
+    db.session.query(SchemaMigration).filter_by(version=8).delete()
+    db.session.commit()
+    assert list(reconcile_service.diff_rows())[0][5] == to_money(-15)
+
+    assert run_migrations() == [8]
+    db.session.expire_all()
+    assert cash_service.current_balance() == balance
+    assert list(reconcile_service.diff_rows()) == []
+    assert reconcile_service.repair() == (0, 0)
+    assert cash_service.current_balance() == balance
+    assert [(entry.entry_type, entry.amount) for entry in CashLedgerEntry.query] == [('opening_balance', to_money(15))]
+
+
+def test_databases_started_on_the_ledger_get_no_opening_entry(users):
+    cash_service.record(to_money(500), 'adjustment')
+    db.session.commit()
+    assert cash_service.checkpoint() == 1
+    # Drift from the ledger's own time stays in the report
+    db.session.add(Investment(investor_name='Investor', amount=to_money(40)))
+    db.session.query(SchemaMigration).filter_by(version=8).delete()
+    db.session.commit()
+    assert run_migrations() == [8]
+    assert [entry.entry_type for entry in CashLedgerEntry.query] == ['adjustment']
+    assert list(reconcile_service.diff_rows())[0][5] == to_money(40)
@@ -0,0 +1,57 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.cash_balance_model import CashBalance
+from models.report_job_model import ReportJob
+from models.money import to_money
+from services import report_job_service
+from datetime import date, datetime, timedelta
+import json
+
+
+def test_edits_in_place_change_the_data_version(users):
+    staff = users['staff1']
+    customer = Customer(name='Member', staff=staff, total_loan=to_money(1000), remaining_loan=to_money(1000))
+    loan = Loan(customer=customer, customer_name=customer.name, amount=to_money(1000), outstanding=to_money(1000),
+                due_date=datetime.utcnow() + timedelta(days=90), staff=staff)
+    balance = CashBalance(balance=0, last_entry_id=0)
+    db.session.add_all([customer, loan, balance])
+    db.session.commit()
+
+    versions = [report_job_service.data_version()]
+    for edit in (lambda: setattr(loan, 'interest', 12.0),
+                 lambda: setattr(customer, 'remaining_loan', to_money(900)),
+                 lambda: setattr(balance, 'balance', to_money(50))):
+        edit()
+        db.session.commit()
+        versions.append(report_job_service.data_version())
+    assert len(set(versions)) == len(versions)
+
+
+def test_profit_loss_jobs_are_keyed_on_their_dates(users, client_for):
+    client = client_for(users['admin'])
+    today = date.today()
+    # Month to date, as the same request made in the last days of the previous month
+    last_month = today.replace(day=1) - timedelta(days=1)
+    stale = {'period': 'monthly', 'from': last_month.replace(day=1).isoformat(), 'to': last_month.isoformat()}
+    db.session.add(ReportJob(report='profit_loss', format='html', params=report_job_service.params_key(stale), status='done',
+                             data_version=report_job_service.data_version(), requested_by=users['admin'].id))
+    db.session.commit()
+
+    client.post('/reports/jobs', data={'dataset': 'profit_loss', 'format': 'html', 'period': 'monthly'})
+    job = ReportJob.query.filter_by(status='queued').one()
+    assert json.loads(job.params) == {'period': 'monthly', 'from': today.replace(day=1).isoformat(), 'to': today.isoformat()}
+
+    client.post('/reports/jobs', data={'dataset': 'profit_loss', 'format': 'html', 'from': '2026-03-31', 'to': '2026-03-01'})
+    custom = ReportJob.query.filter_by(status='queued').order_by(ReportJob.id.desc()).first()
+    assert json.loads(custom.params) == {'period': 'custom', 'from': '2026-03-01', 'to': '2026-03-31'}
+
+    response = client.post('/reports/jobs', data={'dataset': 'profit_loss', 'format': 'html', 'from': '2026-13-01'})
+    assert response.status_code == 302
+    assert ReportJob.query.filter_by(status='queued').count() == 2
+
+    for queued in (job, custom):
+        report_job_service.run(queued)
+        assert queued.status == 'done', queued.error
+    assert today.replace(day=1).strftime('%d-%m-%Y') in job.artifact.decode()
+    assert '01-03-2026 — 31-03-2026' in custom.artifact.decode()
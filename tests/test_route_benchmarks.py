@@ -0,0 +1,44 @@
+"""Latency and query count of every report and listing route.
+
+The pytest-benchmark counterpart of ``benchmark.py``, over the same routes
+and the seeded database. Caches are cleared before every round, so each
+request does the work of a cold page. The statements a request runs are
+saved as ``extra_info.queries`` in the JSON of a saved run:
+
+    python -m pytest tests/test_route_benchmarks.py --benchmark-autosave
+    python -m pytest tests/test_route_benchmarks.py --benchmark-compare
+"""
+from app import CACHES
+from models.user_model import User
+from models.customer_model import Customer
+from benchmark import ROUTES
+import pytest
+
+
+def clear_caches():
+    for cache in CACHES.values():
+        cache.invalidate_prefix()
+
+
+@pytest.mark.parametrize('role,path', ROUTES, ids=[f'{role} {path}' for role, path in ROUTES])
+def test_route(seeded_database, client_for, count_queries, benchmark, role, path):
+    if role == 'admin':
+        user = User.query.filter_by(role='admin').first()
+    else:
+        user = User.query.filter(User.role == 'staff', User.customers.any()).first()
+    customer = Customer.query.filter(Customer.total_loan > 0).order_by(Customer.id).first()
+    client = client_for(user)
+    path = path.format(customer=customer.id)
+
+    def get():
+        response = client.get(path)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+    clear_caches()
+    with count_queries() as statements:
+        assert get() == 200
+    benchmark.group = path.split('?')[0]
+    benchmark.extra_info['queries'] = len(statements)
+    assert benchmark.pedantic(get, setup=clear_caches, rounds=5, warmup_rounds=1) == 200
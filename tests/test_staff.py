@@ -0,0 +1,27 @@
+from models.user_model import db, User
+from services import auth_service
+
+
+def busy(password):
+    raise auth_service.Busy()
+
+
+def test_busy_hashing_on_add_staff_asks_to_retry(users, client_for, monkeypatch):
+    monkeypatch.setattr(auth_service, 'hash_password', busy)
+    response = client_for(users['admin']).post('/admin/staff/add', data={
+        'name': 'New', 'email': 'new@example.com', 'password': 'secret'}, follow_redirects=True)
+    assert response.status_code == 200
+    assert 'Server is busy, please try again in a moment.' in response.get_data(as_text=True)
+    assert User.query.filter_by(email='new@example.com').first() is None
+
+
+def test_busy_hashing_on_edit_staff_changes_nothing(users, client_for, monkeypatch):
+    staff = users['staff1']
+    monkeypatch.setattr(auth_service, 'hash_password', busy)
+    response = client_for(users['admin']).post(f'/admin/staff/edit/{staff.id}', data={
+        'name': 'Renamed', 'email': 'renamed@example.com', 'password': 'new secret'}, follow_redirects=True)
+    assert response.status_code == 200
+    assert 'Server is busy, please try again in a moment.' in response.get_data(as_text=True)
+    db.session.expire_all()
+    assert (staff.name, staff.email) == ('Staff One', 'staff1@example.com')
+    assert auth_service.check_password(staff.password, 'secret')
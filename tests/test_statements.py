@@ -0,0 +1,27 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.money import to_money
+from services import statement_service
+
+
+def test_cached_statement_follows_writes_of_other_workers(users, client_for, monkeypatch):
+    staff = users['staff1']
+    customer = Customer(name='Member', staff=staff, total_loan=to_money(500), remaining_loan=to_money(500))
+    db.session.add(customer)
+    db.session.commit()
+    customer_id = customer.id
+    client = client_for(staff)
+    assert client.get(f'/customer_details/{customer_id}').status_code == 200
+    assert statement_service.statement_cache.stats()['size'] == 1
+
+    # A collection made through another worker: its commit hooks never
+    # reach this process's cache
+    monkeypatch.setattr(statement_service.statement_cache, 'invalidate_on_commit', lambda session, prefix=(): None)
+    client.post('/loan_collection/collect', data={'customer_id': customer_id, 'amount': '40'})
+    client.post('/saving_collection/collect', data={'customer_id': customer_id, 'amount': '15.50'})
+
+    db.session.expire_all()
+    statement = statement_service.get_statement(db.session.get(Customer, customer_id))
+    assert statement.total_loan_collected == to_money(40)
+    assert statement.total_saving_collected == to_money('15.50')
+    assert statement.loan_collection_count == 1
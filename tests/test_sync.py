@@ -0,0 +1,33 @@
+from models.user_model import db
+from models.customer_model import Customer
+from models.loan_model import Loan
+from models.loan_collection_model import LoanCollection
+from models.loan_installment_model import LoanInstallment
+from datetime import datetime, timedelta
+import uuid
+
+
+def test_backdated_records_are_allocated_as_of_their_collection_time(users, client_for):
+    staff = users['staff1']
+    client = client_for(users['admin'])
+    customer = Customer(name='Rahim', staff=staff)
+    db.session.add(customer)
+    db.session.commit()
+    client.post('/cash_balance', data={'action': 'add', 'amount': '1000', 'investor_name': 'Investor'})
+    loan_date = datetime.utcnow() - timedelta(days=30)
+    client.post('/loan/add', data={'customer_id': customer.id, 'amount': '1000', 'interest': '0', 'service_charge': '0',
+                                   'welfare_fee': '0', 'loan_date': loan_date.strftime('%Y-%m-%d'),
+                                   'due_date': (loan_date + timedelta(days=70)).strftime('%Y-%m-%d'),
+                                   'installment_count': '10', 'installment_amount': '100', 'installment_type': 'weekly'})
+
+    first, second = [(datetime.utcnow() - timedelta(days=days)).replace(microsecond=0) for days in (21, 14)]
+    records = [{'id': str(uuid.uuid4()), 'type': 'loan', 'customer_id': customer.id, 'amount': '100',
+                'collected_at': when.isoformat() + 'Z'} for when in (second, first)]
+    response = client_for(staff).post('/sync/collections', json={'records': records})
+    assert [result['status'] for result in response.get_json()['results']] == ['applied', 'applied']
+
+    db.session.expire_all()
+    installments = LoanInstallment.query.order_by(LoanInstallment.number).all()
+    assert [(i.status, i.paid_date) for i in installments[:3]] == [('paid', first), ('paid', second), ('open', None)]
+    loan = Loan.query.one()
+    assert {c.loan_id for c in LoanCollection.query} == {loan.id}